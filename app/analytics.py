@@ -0,0 +1,366 @@
+"""Order analytics: item popularity, revenue over time and basket size.
+
+Aggregates are updated as items are added to orders, so reading them never
+touches the sessions. Per-item counters are flat integer arrays indexed by
+menu item id, and recent activity is kept in a ring of fixed time buckets
+(by default 24 one-hour buckets). A report costs O(items) however many
+sessions exist.
+
+Ordered units and revenue are gross: items removed later still count.
+Each worker aggregates the orders it served, like /metrics.
+
+The same aggregates can be computed offline from exported transcripts
+(one {"message", "session_id", "timestamp"} JSON object per line), read as
+a stream in constant memory:
+
+    python -m app.analytics transcripts.jsonl > analytics.json
+
+Offline basket counting follows the live sessions: a session's order lasts
+until it has been idle for SESSION_TTL, a turn without a session ID is a
+session of its own, and a {"event": "clear", "session_id", "timestamp"}
+line (DELETE /session) empties the order. Removing items one by one is not
+in the transcripts, so an order emptied that way and refilled counts as one
+basket offline and two live.
+"""
+
+from array import array
+from collections import OrderedDict
+from contextlib import redirect_stdout
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import argparse
+import os
+import sys
+import time
+
+from app.routing import ORDER_INTENTS
+from app.serialization import dumps, loads
+
+# (item, size or None, quantity, unit cents), as priced by the menu
+Line = Tuple[str, Optional[str], int, int]
+
+
+def _zeros(n: int) -> array:
+    return array("q", bytes(8 * n))
+
+
+class OrderAnalytics:
+    """Running order aggregates, fed by every turn that adds items.
+
+    Attributes:
+        items: Item names; an item's position is its id in the arrays
+        units: Units ordered per item
+        revenue_cents: Revenue per item
+        baskets: Orders started (sessions whose order went from empty to
+            non-empty)
+        started: When aggregation began (epoch seconds)
+    """
+
+    def __init__(
+        self,
+        items: Iterable[str] = (),
+        bucket_seconds: float = 3600.0,
+        buckets: int = 24,
+        started: Optional[float] = None
+    ):
+        """Initialize empty aggregates.
+
+        Args:
+            items: Menu item names, in menu item id order; items first seen
+                later get the next ids
+            bucket_seconds: Width of one time bucket
+            buckets: Buckets in the rolling window
+            started: Start of aggregation (defaults to now)
+        """
+        if buckets < 1 or bucket_seconds <= 0:
+            raise ValueError("need at least one bucket of positive width")
+        self.items: List[str] = []
+        self._ids: Dict[str, int] = {}
+        self.units = _zeros(0)
+        self.revenue_cents = _zeros(0)
+        self.baskets = 0
+        self.started = started if started is not None else time.time()
+
+        self.bucket_seconds = bucket_seconds
+        self.buckets = buckets
+        # Bucket number held by each slot (-1: empty), and its totals
+        self._bucket_ids = array("q", [-1] * buckets)
+        self._bucket_units = _zeros(buckets)
+        self._bucket_revenue = _zeros(buckets)
+        self._bucket_baskets = _zeros(buckets)
+        # Units per item in each slot, and their sum over the live window
+        self._bucket_item_units = [_zeros(0) for _ in range(buckets)]
+        self._window_units = _zeros(0)
+        self._newest: Optional[int] = None
+
+        for item in items:
+            self._item_id(item)
+
+    def _item_id(self, item: str) -> int:
+        item_id = self._ids.get(item)
+        if item_id is None:
+            # An item added to the menu after startup
+            item_id = self._ids[item] = len(self.items)
+            self.items.append(item)
+            for counters in (self.units, self.revenue_cents, self._window_units,
+                             *self._bucket_item_units):
+                counters.append(0)
+        return item_id
+
+    def _clear_slot(self, slot: int, bucket: int):
+        item_units = self._bucket_item_units[slot]
+        if self._bucket_units[slot]:
+            window = self._window_units
+            for item_id, units in enumerate(item_units):
+                if units:
+                    window[item_id] -= units
+            self._bucket_item_units[slot] = _zeros(len(item_units))
+        self._bucket_ids[slot] = bucket
+        self._bucket_units[slot] = 0
+        self._bucket_revenue[slot] = 0
+        self._bucket_baskets[slot] = 0
+
+    def _advance(self, bucket: int):
+        """Make `bucket` the newest, expiring buckets that left the window."""
+        if self._newest is not None and bucket <= self._newest:
+            return
+        first = bucket - self.buckets + 1
+        if self._newest is not None:
+            first = max(first, self._newest + 1)
+        for expired in range(first, bucket + 1):
+            self._clear_slot(expired % self.buckets, expired)
+        self._newest = bucket
+
+    def _slot(self, now: float) -> Optional[int]:
+        """Slot for a time, or None if it is older than the window."""
+        bucket = int(now // self.bucket_seconds)
+        self._advance(bucket)
+        if bucket <= self._newest - self.buckets:
+            return None
+        slot = bucket % self.buckets
+        if self._bucket_ids[slot] != bucket:
+            self._clear_slot(slot, bucket)
+        return slot
+
+    def record(self, lines: Sequence[Line], new_basket: bool = False, now: Optional[float] = None):
+        """Count the lines added to an order by one turn.
+
+        Args:
+            lines: Priced lines that were added
+            new_basket: Whether they started the session's order
+            now: Time of the turn (defaults to now)
+        """
+        slot = self._slot(time.time() if now is None else now)
+        units = revenue = 0
+        for item, _, quantity, unit_cents in lines:
+            item_id = self._item_id(item)
+            cents = unit_cents * quantity
+            self.units[item_id] += quantity
+            self.revenue_cents[item_id] += cents
+            units += quantity
+            revenue += cents
+            if slot is not None:
+                self._bucket_item_units[slot][item_id] += quantity
+                self._window_units[item_id] += quantity
+
+        if new_basket:
+            self.baskets += 1
+        if slot is not None:
+            self._bucket_units[slot] += units
+            self._bucket_revenue[slot] += revenue
+            self._bucket_baskets[slot] += new_basket
+
+    def report(self, now: Optional[float] = None) -> Dict:
+        """Current aggregates.
+
+        Args:
+            now: End of the rolling window (defaults to now)
+
+        Returns:
+            Totals, average basket, per-item popularity (most ordered first)
+            and one entry per time bucket in the window, oldest first
+        """
+        newest = int((time.time() if now is None else now) // self.bucket_seconds)
+        self._advance(newest)
+        newest = self._newest
+
+        units = sum(self.units)
+        revenue = sum(self.revenue_cents)
+        baskets = self.baskets
+        items = sorted(
+            (
+                {
+                    "item": item,
+                    "units": self.units[i],
+                    "revenue": self.revenue_cents[i] / 100,
+                    "window_units": self._window_units[i],
+                }
+                for i, item in enumerate(self.items)
+                if self.units[i]
+            ),
+            key=lambda entry: -entry["units"]
+        )
+
+        buckets = []
+        for bucket in range(newest - self.buckets + 1, newest + 1):
+            slot = bucket % self.buckets
+            live = self._bucket_ids[slot] == bucket
+            buckets.append({
+                "start": bucket * self.bucket_seconds,
+                "units": self._bucket_units[slot] if live else 0,
+                "revenue": self._bucket_revenue[slot] / 100 if live else 0.0,
+                "baskets": self._bucket_baskets[slot] if live else 0,
+            })
+
+        return {
+            "since": self.started,
+            "baskets": baskets,
+            "units": units,
+            "revenue": revenue / 100,
+            "average_basket_units": units / baskets if baskets else 0.0,
+            "average_basket_value": revenue / baskets / 100 if baskets else 0.0,
+            "items": items,
+            "bucket_seconds": self.bucket_seconds,
+            "buckets": buckets,
+        }
+
+
+def create_order_analytics(items: Iterable[str] = ()) -> OrderAnalytics:
+    """Create the aggregator configured by environment variables.
+
+    ANALYTICS_BUCKET_SECONDS and ANALYTICS_BUCKETS size the rolling window.
+
+    Args:
+        items: Menu item names, in menu item id order
+
+    Returns:
+        Empty aggregates
+    """
+    return OrderAnalytics(
+        items,
+        bucket_seconds=float(os.getenv("ANALYTICS_BUCKET_SECONDS", "3600")),
+        buckets=int(os.getenv("ANALYTICS_BUCKETS", "24"))
+    )
+
+
+def _timestamp(value) -> Optional[float]:
+    """Epoch seconds from a number or an ISO 8601 string."""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    return datetime.fromisoformat(value).timestamp()
+
+
+def _read_turns(stream) -> Iterator[Tuple[Optional[str], Optional[str], Optional[float]]]:
+    """(message, session ID, timestamp) per transcript line; no message for a clear."""
+    for line in stream:
+        if not line.strip():
+            continue
+        row = loads(line)
+        message = None if row.get("event") == "clear" else row["message"]
+        yield message, row.get("session_id") or None, _timestamp(row.get("timestamp"))
+
+
+def _chunks(turns: Iterator, size: int) -> Iterator[list]:
+    chunk = []
+    for turn in turns:
+        chunk.append(turn)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def aggregate_transcripts(
+    turns: Iterable[Tuple[Optional[str], Optional[str], Optional[float]]],
+    chunk_size: int = 256,
+    max_sessions: int = 100000,
+    session_ttl: Optional[float] = None
+) -> Dict:
+    """Compute the live aggregates offline from a stream of transcript turns.
+
+    Turns are analysed and priced exactly as /chat would (without the LLM),
+    a chunk at a time. A turn adds a basket when its session has no order,
+    as live: the session is new (or has no ID), was cleared, or was idle
+    for `session_ttl`. Memory stays bounded: besides one chunk, only the
+    last `max_sessions` sessions holding an order are remembered; a session
+    forgotten beyond that counts a new basket when it orders again.
+
+    Args:
+        turns: (message, session ID or None, timestamp or None) in turn
+            order; a None message clears the session's order
+        chunk_size: Messages analysed together
+        max_sessions: Sessions with an order remembered
+        session_ttl: Idle seconds before an order is forgotten (if None,
+            reads SESSION_TTL)
+
+    Returns:
+        `OrderAnalytics.report` over every order turn, covering the span
+        from the oldest to the newest timestamp
+    """
+    from app.menu import MENU_STORE
+    from app.nlp.analysis import create_analysis_pipeline
+    from app.nlp.entities import EntityExtractor
+    from app.nlp.intent import create_intent_classifier
+
+    if session_ttl is None:
+        session_ttl = float(os.getenv("SESSION_TTL", "1800"))
+    classifier = create_intent_classifier()
+    pipeline = create_analysis_pipeline(classifier, EntityExtractor())
+    menu = MENU_STORE.current
+    analytics = create_order_analytics(menu.price_table.items)
+    # Session ID -> last turn time, for sessions holding an order, oldest first
+    ordering: "OrderedDict[str, float]" = OrderedDict()
+    earliest = latest = None
+
+    for chunk in _chunks(iter(turns), chunk_size):
+        analyses = iter(pipeline.analyze_many(
+            [message for message, _, _ in chunk if message is not None], menu
+        ))
+        for message, session_id, timestamp in chunk:
+            now = timestamp if timestamp is not None else time.time()
+            earliest = now if earliest is None else min(earliest, now)
+            latest = now if latest is None else max(latest, now)
+            last_seen = ordering.pop(session_id, None) if session_id is not None else None
+            has_order = last_seen is not None and now - last_seen < session_ttl
+            if message is None:
+                continue
+
+            analysis = next(analyses)
+            intent, _ = classifier.decide(analysis.scores)
+            if intent in ORDER_INTENTS:
+                lines, _ = menu.price_order(analysis.lines)
+                if lines:
+                    analytics.record(lines, not has_order, now)
+                    has_order = True
+            if has_order and session_id is not None:
+                ordering[session_id] = now
+                if len(ordering) > max_sessions:
+                    ordering.popitem(last=False)
+
+    if earliest is not None:
+        analytics.started = earliest
+    return analytics.report(latest)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Order analytics from exported transcripts")
+    parser.add_argument("input", help="JSONL of {message, session_id, timestamp} ('-' for stdin); "
+                                      "{event: clear, session_id, timestamp} clears an order")
+    parser.add_argument("--chunk-size", type=int, default=256, help="Messages analysed together")
+    parser.add_argument("--max-sessions", type=int, default=100000,
+                        help="Sessions with an order remembered to count baskets")
+    args = parser.parse_args()
+
+    # The report owns stdout; startup warnings go to stderr
+    out = sys.stdout
+    with open(args.input, encoding="utf-8") if args.input != "-" else sys.stdin as stream, \
+            redirect_stdout(sys.stderr):
+        report = aggregate_transcripts(_read_turns(stream), args.chunk_size, args.max_sessions)
+    out.write(dumps(report).decode() + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,154 +1,867 @@
 """FastAPI application and routes."""
 
-from fastapi import FastAPI, HTTPException
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from typing import Dict
+from contextlib import asynccontextmanager, nullcontext
+from time import perf_counter
+from typing import (
+    AsyncIterable, AsyncIterator, Dict, Iterable, List, Optional, Tuple, Union
+)
+import asyncio
+import json
 import uuid
 import os
 
-from app.models import ChatMessage, ChatResponse, Entity, Session, OrderItem
-from app.nlp.intent import IntentClassifier
-from app.nlp.entities import EntityExtractor
-from app.nlp.chatbot import Chatbot
-from app.menu import MenuService
+from app.startup import StartupReport
+
+# Created before the app's imports, so each subsystem's import is timed
+startup_report = StartupReport()
+
+with startup_report.phase("import framework"):
+    from fastapi import FastAPI, Header, HTTPException, Request, WebSocket, WebSocketDisconnect
+    from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+    from pydantic import ValidationError
+    from starlette.requests import ClientDisconnect
+    
+    from app.metrics import CHAT_LATENCY, REGISTRY, REQUESTS, STAGE_SECONDS, GaugeFunc
+    from app.models import ChatBatchRequest, ChatMessage, ChatResponse
+    from app.routing import FALLBACK, LLM, ORDER_INTENTS, ResponseRouter
+    from app.serialization import FastJSONResponse, PrecompressedStaticFiles, dumps
+with startup_report.phase("import menu"):
+    from app.menu import MENU_STORE, MenuService
+with startup_report.phase("import nlp"):
+    from app.nlp.admission import LLMUnavailable
+    from app.nlp.analysis import AnalysisPipeline, TextAnalysis, create_analysis_pipeline
+    from app.nlp.entities import EntityExtractor
+    from app.nlp.intent import create_intent_classifier
+with startup_report.phase("import orders"):
+    from app.analytics import OrderAnalytics, create_order_analytics
+    from app.orders import OrderLog, create_order_log
+    from app.state import SessionState
+with startup_report.phase("import sessions"):
+    from app.sessions import SessionStore, create_session_store
+
+# Intents whose replies depend only on the current turn and order state,
+# not on earlier messages, so they can be served from the response cache
+CACHEABLE_INTENTS = {"greeting", "order", "add_item", "farewell"}
+
+# WebSocket channel limits
+WS_IDLE_TIMEOUT = float(os.getenv("WS_IDLE_TIMEOUT", "300"))
+WS_MAX_PENDING = int(os.getenv("WS_MAX_PENDING", "8"))
+
+# Menu hot reload: file poll interval (0 disables) and admin endpoint token
+MENU_RELOAD_INTERVAL = float(os.getenv("MENU_RELOAD_INTERVAL", "5"))
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# /chat/batch: LLM calls in flight per batch, and messages analysed together
+CHAT_BATCH_MAX_CONCURRENCY = int(os.getenv("CHAT_BATCH_MAX_CONCURRENCY", "8"))
+CHAT_BATCH_CHUNK_SIZE = int(os.getenv("CHAT_BATCH_CHUNK_SIZE", "256"))
+
+# Services, built by `lifespan` when the server starts
+intent_classifier = None
+entity_extractor: Optional[EntityExtractor] = None
+analysis_pipeline: Optional[AnalysisPipeline] = None
+menu_service: Optional[MenuService] = None
+response_router: Optional[ResponseRouter] = None
+chatbot = None
+session_store: Optional[SessionStore] = None
+order_log: Optional[OrderLog] = None
+order_analytics: Optional[OrderAnalytics] = None
+
+
+# Per-stage latency histograms, resolved once so recording is a single call
+_stage = {
+    stage: STAGE_SECONDS.labels(stage)
+    for stage in (
+        "tokenize", "intent", "entities", "binding", "pricing", "llm", "serialization", "total"
+    )
+}
+
+
+def _observe_stage(stage: str, seconds: float):
+    """Record an analysis pipeline stage's latency."""
+    histogram = _stage.get(stage)
+    if histogram is None:
+        # Stages plugged in later get their histogram on first use
+        histogram = _stage[stage] = STAGE_SECONDS.labels(stage)
+    histogram.observe(seconds)
+
+
+REGISTRY.register(GaugeFunc(
+    "nopickles_sessions",
+    "Live sessions in the session store",
+    lambda: session_store.stats()["sessions"]
+))
+REGISTRY.register(GaugeFunc(
+    "nopickles_session_bytes",
+    "Estimated (memory) or stored (sqlite) bytes held by sessions",
+    lambda: _session_bytes()
+))
+REGISTRY.register(GaugeFunc(
+    "nopickles_menu_reloads_total",
+    "Menu versions published since startup",
+    lambda: MENU_STORE.reloads,
+    type="counter"
+))
+REGISTRY.register(GaugeFunc(
+    "nopickles_startup_seconds",
+    "Time from process start until the app was ready",
+    lambda: startup_report.total_ms / 1000
+))
+
+
+def _create_chatbot():
+    """Create the chatbot if an API key is configured.
+    
+    The OpenAI client library is only imported when it will be used.
+    """
+    if not os.getenv("OPENAI_API_KEY"):
+        print("Warning: OpenAI API key not found. Chatbot responses will be limited.")
+        return None
+    
+    from app.nlp.chatbot import Chatbot
+    
+    bot = Chatbot()
+    REGISTRY.register(GaugeFunc(
+        "nopickles_llm_cache_hits_total",
+        "LLM response cache hits",
+        lambda: bot.cache.hits,
+        type="counter"
+    ))
+    REGISTRY.register(GaugeFunc(
+        "nopickles_llm_cache_misses_total",
+        "LLM response cache misses",
+        lambda: bot.cache.misses,
+        type="counter"
+    ))
+    REGISTRY.register(GaugeFunc(
+        "nopickles_llm_cache_hit_ratio",
+        "LLM response cache hit rate since startup",
+        lambda: bot.cache.stats()["hit_rate"]
+    ))
+    REGISTRY.register(GaugeFunc(
+        "nopickles_llm_in_flight",
+        "LLM calls running",
+        lambda: bot.admission.in_flight
+    ))
+    REGISTRY.register(GaugeFunc(
+        "nopickles_llm_queued",
+        "LLM calls waiting for a slot",
+        lambda: bot.admission.queued
+    ))
+    REGISTRY.register(GaugeFunc(
+        "nopickles_llm_breaker_state",
+        "LLM circuit breaker state (0 closed, 1 half-open, 2 open)",
+        lambda: bot.admission.breaker.state
+    ))
+    REGISTRY.register(GaugeFunc(
+        "nopickles_llm_breaker_opens_total",
+        "Times the LLM circuit breaker opened",
+        lambda: bot.admission.breaker.opens,
+        type="counter"
+    ))
+    REGISTRY.register(GaugeFunc(
+        "nopickles_llm_coalesced_total",
+        "LLM requests that joined an identical request already in flight",
+        lambda: bot.single_flight.collapsed,
+        type="counter"
+    ))
+    return bot
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Build the services on startup and release them on shutdown.
+    
+    Each step is timed into `startup_report`, which is logged once ready
+    and served from /health.
+    """
+    global intent_classifier, entity_extractor, analysis_pipeline, menu_service
+    global response_router, chatbot, session_store, order_log, order_analytics
+    
+    startup_report.begin()
+    with startup_report.phase("menu"):
+        # Parsed, validated and indexed here rather than at import
+        MENU_STORE.load()
+    with startup_report.phase("intent"):
+        intent_classifier = create_intent_classifier()
+    with startup_report.phase("entities"):
+        entity_extractor = EntityExtractor()
+        analysis_pipeline = create_analysis_pipeline(
+            intent_classifier, entity_extractor, observe=_observe_stage
+        )
+        menu_service = MenuService()
+        response_router = ResponseRouter()
+    with startup_report.phase("llm client"):
+        # Imports the OpenAI client library when a key is configured
+        chatbot = _create_chatbot()
+    with startup_report.phase("orders"):
+        # Rebuilds open orders from the snapshot and log tail, if enabled
+        order_log = create_order_log()
+        order_log.recover()
+        order_analytics = create_order_analytics(MENU_STORE.current.price_table.items)
+    with startup_report.phase("sessions"):
+        session_store = create_session_store(order_log)
+    startup_report.log()
+    order_log.start()
+    
+    menu_watcher = None
+    if MENU_RELOAD_INTERVAL > 0:
+        menu_watcher = asyncio.create_task(MENU_STORE.watch(MENU_RELOAD_INTERVAL))
+    
+    try:
+        yield
+    finally:
+        # Stop the menu watcher and release pooled LLM connections
+        if menu_watcher:
+            menu_watcher.cancel()
+        if chatbot:
+            await chatbot.aclose()
+        await order_log.close()
+        session_store.close()
+
 
 # Initialize FastAPI app
 app = FastAPI(
     title="NoPickles.ai MVP",
     description="Conversational AI ordering system for fast food",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
-# Mount static files
-app.mount("/static", StaticFiles(directory="static"), name="static")
-
-# Initialize services
-intent_classifier = IntentClassifier()
-entity_extractor = EntityExtractor()
-menu_service = MenuService()
-
-# Initialize chatbot (only if API key is available)
-try:
-    chatbot = Chatbot()
-except ValueError:
-    print("Warning: OpenAI API key not found. Chatbot responses will be limited.")
-    chatbot = None
-
-# In-memory session storage (in production, use Redis or database)
-sessions: Dict[str, Session] = {}
+# Mount static files, served from memory (gzipped) with cache headers
+static_files = PrecompressedStaticFiles(directory="static")
+app.mount("/static", static_files, name="static")
 
 
 @app.get("/")
-async def root():
-    """Serve the main HTML page."""
-    return FileResponse("static/index.html")
+async def root(request: Request):
+    """Serve the main HTML page, with asset URLs pinned to their versions."""
+    return static_files.versioned_page(request, "index.html")
 
 
 @app.post("/chat", response_model=ChatResponse)
-async def chat(message: ChatMessage):
+async def chat(message: ChatMessage, idempotency_key: Optional[str] = Header(None)):
     """Process a chat message and return a response.
     
     Args:
         message: User's chat message
+        idempotency_key: Idempotency-Key header, an alternative to the
+            message's `idempotency_key`
         
     Returns:
         ChatResponse with bot reply, intent, entities, and price
     """
-    # Get or create session
-    session_id = message.session_id or str(uuid.uuid4())
+    start = perf_counter()
+    if idempotency_key and message.idempotency_key is None:
+        message = message.model_copy(update={"idempotency_key": idempotency_key})
+    reply = await _respond(message)
     
-    if session_id not in sessions:
-        sessions[session_id] = Session(
-            session_id=session_id,
-            messages=[],
-            order_items=[],
-            total_price=0.0
-        )
+    serialize_start = perf_counter()
+    response = Response(content=dumps(reply), media_type="application/json")
     
-    session = sessions[session_id]
+    end = perf_counter()
+    _stage["serialization"].observe(end - serialize_start)
+    _stage["total"].observe(end - start)
+    CHAT_LATENCY.record(end - start)
+    REQUESTS.labels("chat", reply["route"]).inc()
     
-    # Classify intent
-    intent = intent_classifier.classify(message.message)
+    return response
+
+
+@app.post("/chat/batch")
+async def chat_batch(request: Request):
+    """Process many messages across sessions and stream replies as NDJSON.
     
-    # Extract entities
-    entities_data = entity_extractor.extract(message.message)
-    entities = [Entity(**e) for e in entities_data]
+    Accepts either a JSON `{"messages": [...]}` body or, for large replays,
+    an `application/x-ndjson` body with one ChatMessage per line, parsed
+    lazily as the batch advances. Replies are written one JSON object per
+    line, in input order, each with the message's `index`; a message that
+    fails yields `{"index": ..., "error": ...}` instead.
     
-    # Process order if intent is order or add_item
-    if intent in ["order", "add_item"]:
-        items_with_sizes = entity_extractor.get_items_and_sizes(entities_data)
+    Args:
+        request: HTTP request carrying the messages
         
-        for item_name, size in items_with_sizes:
-            price = menu_service.get_item_price(item_name, size)
-            if price:
-                order_item = OrderItem(
-                    name=item_name,
-                    size=size,
-                    quantity=1,
-                    price=price
-                )
-                session.order_items.append(order_item)
-                session.total_price += price
+    Returns:
+        StreamingResponse of application/x-ndjson results
+    """
+    body_read = asyncio.Event()
+    if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+        messages = _ndjson_messages(request.stream(), body_read)
+    else:
+        try:
+            messages = ChatBatchRequest.model_validate_json(await request.body()).messages
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail=e.errors(include_url=False))
+        body_read.set()
     
-    # Generate conversational response
-    if chatbot:
-        # Build conversation history
-        conv_history = []
-        for msg in session.messages[-6:]:  # Last 3 exchanges
-            role = "user" if len(conv_history) % 2 == 0 else "assistant"
-            conv_history.append({"role": role, "content": msg})
-        
-        context = {
-            "intent": intent,
-            "entities": entities_data,
-            "total_price": session.total_price
-        }
+    async def lines():
+        async for result in process_batch(messages):
+            yield dumps(result) + b"\n"
+    
+    return _UploadStreamingResponse(lines(), body_read, media_type="application/x-ndjson")
+
+
+class _UploadStreamingResponse(StreamingResponse):
+    """StreamingResponse that may still be reading its request body.
+    
+    StreamingResponse watches `receive` for a disconnect while it streams,
+    which would swallow the body messages the NDJSON parser is waiting
+    for; the watch starts once the body has been read.
+    """
+    
+    def __init__(self, content, body_read: asyncio.Event, **kwargs):
+        super().__init__(content, **kwargs)
+        self.body_read = body_read
+    
+    async def listen_for_disconnect(self, receive):
+        await self.body_read.wait()
+        await super().listen_for_disconnect(receive)
+
+
+async def _ndjson_messages(
+    chunks: AsyncIterator[bytes],
+    body_read: asyncio.Event
+) -> AsyncIterator[Union[ChatMessage, str]]:
+    """Parse NDJSON lines as the body arrives, yielding an error string for bad lines.
+    
+    Only the line being received is buffered: a partial line at the end of
+    a chunk is carried over to the next one. A client that disconnects
+    mid-upload ends the batch.
+    
+    Args:
+        chunks: Request body chunks
+        body_read: Set once the body is consumed
+    """
+    pending = b""
+    try:
+        async for chunk in chunks:
+            lines = (pending + chunk).split(b"\n")
+            pending = lines.pop()
+            for line in lines:
+                if line.strip():
+                    yield _parse_batch_line(line)
+    except ClientDisconnect:
+        return
+    finally:
+        body_read.set()
+    if pending.strip():
+        yield _parse_batch_line(pending)
+
+
+def _parse_batch_line(line: bytes) -> Union[ChatMessage, str]:
+    try:
+        return ChatMessage.model_validate_json(line)
+    except ValidationError as e:
+        return f"Invalid message: {e.errors(include_url=False)[0]['msg']}"
+
+
+async def process_batch(
+    messages: Union[Iterable, AsyncIterable],
+    max_concurrency: Optional[int] = None,
+    chunk_size: Optional[int] = None
+) -> AsyncIterator[dict]:
+    """Process a batch of chat messages in-process.
+    
+    Messages are taken in chunks. Intent and entities for a whole chunk are
+    computed in one batched pass against a single menu snapshot; then each
+    session's turns run in order while different sessions run concurrently,
+    with at most `max_concurrency` LLM calls in flight. Results come back
+    in input order as each chunk completes, so memory stays bounded by the
+    chunk size however long the batch is.
+    
+    Needs the services built by `lifespan`; see `app.batch` for running
+    it outside the server.
+    
+    Args:
+        messages: ChatMessage objects (or error strings standing in for
+            unparseable ones), sync or async iterable
+        max_concurrency: LLM calls in flight (if None, reads
+            CHAT_BATCH_MAX_CONCURRENCY)
+        chunk_size: Messages analysed and buffered together (if None, reads
+            CHAT_BATCH_CHUNK_SIZE)
         
-        response_text = chatbot.generate_response(
-            message.message,
-            conversation_history=conv_history,
-            context=context
-        )
+    Yields:
+        ChatBatchResult dicts, or {"index", "error"} for failed messages
+    """
+    limit = asyncio.Semaphore(max_concurrency or CHAT_BATCH_MAX_CONCURRENCY)
+    chunk_size = chunk_size or CHAT_BATCH_CHUNK_SIZE
+    
+    index = 0
+    chunk = []
+    async for message in _aiter(messages):
+        chunk.append((index, message))
+        index += 1
+        if len(chunk) >= chunk_size:
+            for result in await _process_chunk(chunk, limit):
+                yield result
+            chunk = []
+    if chunk:
+        for result in await _process_chunk(chunk, limit):
+            yield result
+
+
+async def _aiter(items: Union[Iterable, AsyncIterable]) -> AsyncIterator:
+    if hasattr(items, "__aiter__"):
+        async for item in items:
+            yield item
     else:
-        # Fallback response when chatbot is not available
-        response_text = _generate_fallback_response(intent, entities, session.total_price)
+        for item in items:
+            yield item
+
+
+async def _process_chunk(
+    chunk: List[Tuple[int, Union[ChatMessage, str]]],
+    limit: asyncio.Semaphore
+) -> List[dict]:
+    """Run one chunk of a batch; see `process_batch`."""
+    results: List[Optional[dict]] = [None] * len(chunk)
+    valid = [(i, index, message) for i, (index, message) in enumerate(chunk)
+             if isinstance(message, ChatMessage)]
+    for i, (index, message) in enumerate(chunk):
+        if not isinstance(message, ChatMessage):
+            results[i] = {"index": index, "error": message}
+    
+    # One batched pass for the turn-independent analysis
+    analyses = analysis_pipeline.analyze_many(
+        (message.message for _, _, message in valid), MENU_STORE.current
+    )
+    
+    # Turns of one session run in order; sessions run concurrently.
+    # Messages without a session ID each start their own session.
+    sessions: Dict[str, list] = {}
+    for (i, index, message), analysis in zip(valid, analyses):
+        if message.session_id is None:
+            message = message.model_copy(update={"session_id": str(uuid.uuid4())})
+        sessions.setdefault(message.session_id, []).append((i, index, message, analysis))
+    
+    async def run_session(turns):
+        for i, index, message, analysis in turns:
+            try:
+                reply = await _respond(message, analysis, limit)
+            except Exception as e:
+                results[i] = {"index": index, "error": str(e) or type(e).__name__}
+                continue
+            REQUESTS.labels("chat_batch", reply["route"]).inc()
+            # Same fields as ChatBatchResult, without building the model
+            results[i] = {"index": index, **reply}
+    
+    await asyncio.gather(*(run_session(turns) for turns in sessions.values()))
+    return results
+
+
+async def _respond(
+    message: ChatMessage,
+    analysis: Optional[TextAnalysis] = None,
+    llm_limit: Optional[asyncio.Semaphore] = None
+) -> Dict:
+    """Process a message, generate the reply and record the exchange.
+    
+    A message whose idempotency key already has a logged reply is answered
+    with that reply, without touching the session. The reply is returned
+    once the turn's order changes are on disk.
+    
+    Args:
+        message: User's chat message
+        analysis: Precomputed message analysis (batch path)
+        llm_limit: Semaphore held around the LLM call, if any
+        
+    Returns:
+        Reply with the fields of ChatResponse
+    """
+    key = message.idempotency_key
+    if key is not None:
+        logged = order_log.reply(key)
+        if logged is not None:
+            return logged
+    
+    session, intent, entities_data, route = _process_message(message, analysis)
+    
+    # Generate conversational response
+    response_text = None
+    if route == LLM and chatbot:
+        llm_start = perf_counter()
+        try:
+            async with llm_limit or nullcontext():
+                response_text = await chatbot.acomplete(
+                    message.message,
+                    conversation_history=session.history,
+                    context=_build_context(intent, entities_data, session),
+                    use_cache=intent in CACHEABLE_INTENTS
+                )
+        except LLMUnavailable:
+            pass
+        _stage["llm"].observe(perf_counter() - llm_start)
+    
+    if response_text is None:
+        # Templated reply, or fallback when the chatbot is unavailable,
+        # overloaded or too slow
+        if route == LLM:
+            route = FALLBACK
+        response_text = _generate_fallback_response(intent, entities_data, session.total_price)
     
     # Update session
-    session.messages.append(message.message)
-    session.messages.append(response_text)
-    
-    return ChatResponse(
-        response=response_text,
-        intent=intent,
-        entities=entities,
-        total_price=session.total_price,
-        session_id=session_id
+    _record_exchange(session.session_id, message.message, response_text)
+    
+    reply = {
+        "response": response_text,
+        "intent": intent,
+        "entities": _wire_entities(entities_data),
+        "order": _wire_order(session),
+        "total_price": session.total_price,
+        "session_id": session.session_id,
+        "route": route
+    }
+    if key is not None:
+        order_log.record_reply(session.session_id, key, reply)
+    await order_log.sync()
+    return reply
+
+
+@app.post("/chat/stream")
+async def chat_stream(message: ChatMessage):
+    """Process a chat message and stream the reply as Server-Sent Events.
+    
+    Emits a `meta` event with intent, entities, price and session ID as soon
+    as the message is parsed, then one `token` event per reply fragment, and
+    finally a `done` event with the full reply once it is saved to the session.
+    
+    Args:
+        message: User's chat message
+        
+    Returns:
+        StreamingResponse of text/event-stream events
+    """
+    session, intent, entities_data, route = _process_message(message)
+    
+    async def events():
+        async for event, data in _reply_events(
+            "chat_stream", message, session, intent, entities_data, route
+        ):
+            yield _sse(event, data)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
 
+# Queued in place of a binary frame received on /ws/chat
+_BINARY_FRAME = object()
+
+
+@app.websocket("/ws/chat")
+async def chat_websocket(websocket: WebSocket, session_id: Optional[str] = None):
+    """Persistent kiosk channel bound to one session.
+    
+    The server first sends `{"type": "session", "session_id": ...}`. Each
+    client frame `{"message": "..."}` (or plain text) is answered with the same `meta`,
+    `token` and `done` events as /chat/stream, sent as JSON objects with a
+    `type` field. Messages may be pipelined; they are queued (up to
+    WS_MAX_PENDING, after which the socket is no longer read) and answered
+    in order. Binary frames get an `error` event and the connection stays
+    open. The connection is closed after WS_IDLE_TIMEOUT idle seconds.
+    
+    Args:
+        websocket: Client connection
+        session_id: Session to resume (a new one is created if omitted)
+    """
+    await websocket.accept()
+    session_id = session_id or str(uuid.uuid4())
+    await websocket.send_text(dumps({"type": "session", "session_id": session_id}).decode())
+    
+    pending: asyncio.Queue = asyncio.Queue(maxsize=WS_MAX_PENDING)
+    
+    async def receive():
+        while True:
+            try:
+                received = await asyncio.wait_for(websocket.receive(), timeout=WS_IDLE_TIMEOUT)
+            except asyncio.TimeoutError:
+                await pending.put(None)
+                return
+            if received["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(received.get("code", 1000))
+            text = received.get("text")
+            if text is None:
+                # Answered in turn, so it never interleaves with a reply
+                frame = _BINARY_FRAME
+            else:
+                try:
+                    frame = json.loads(text)
+                except ValueError:
+                    frame = text
+            # Blocks when the queue is full, which stops reading the socket
+            await pending.put(frame)
+    
+    receiver = asyncio.create_task(receive())
+    try:
+        while True:
+            get_frame = asyncio.create_task(pending.get())
+            await asyncio.wait({get_frame, receiver}, return_when=asyncio.FIRST_COMPLETED)
+            if not get_frame.done():
+                # Receiver ended because the client disconnected
+                get_frame.cancel()
+                receiver.result()
+                return
+            
+            frame = get_frame.result()
+            if frame is None:
+                await websocket.close(code=1000, reason="idle timeout")
+                return
+            if frame is _BINARY_FRAME:
+                await websocket.send_text(
+                    dumps({"type": "error", "detail": "expected a text frame"}).decode()
+                )
+                continue
+            
+            try:
+                message = ChatMessage(session_id=session_id, **_ws_payload(frame))
+            except (TypeError, ValidationError) as e:
+                await websocket.send_text(dumps({"type": "error", "detail": str(e)}).decode())
+                continue
+            
+            turn = _process_message(message)
+            async for event, data in _reply_events("ws_chat", message, *turn):
+                await websocket.send_text(dumps({"type": event, **data}).decode())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+
+
+def _ws_payload(frame) -> dict:
+    """Accept either {"message": ...} or a bare JSON string."""
+    if isinstance(frame, str):
+        return {"message": frame}
+    if not isinstance(frame, dict):
+        raise TypeError("expected a JSON object with a 'message' field")
+    return {"message": frame.get("message")}
+
+
+async def _reply_events(
+    endpoint: str,
+    message: ChatMessage,
+    session: SessionState,
+    intent: str,
+    entities_data: List[dict],
+    route: str
+) -> AsyncIterator[Tuple[str, dict]]:
+    """Produce the streamed reply for a processed message.
+    
+    Yields a `meta` event with intent, entities, order lines, price,
+    session ID and route, one `token` event per reply fragment, and a `done` event with
+    the full reply and final route once it is saved to the session. If the
+    LLM yields nothing before its deadline, the templated reply is streamed
+    instead and the final route is "fallback".
+    
+    Args:
+        endpoint: Endpoint label for request metrics
+        message: User's chat message
+        session, intent, entities_data, route: Output of
+            `_process_message`
+        
+    Yields:
+        (event name, payload) tuples
+    """
+    if route == LLM and not chatbot:
+        route = FALLBACK
+    
+    yield "meta", {
+        "intent": intent,
+        "entities": _wire_entities(entities_data),
+        "order": _wire_order(session),
+        "total_price": session.total_price,
+        "session_id": session.session_id,
+        "route": route
+    }
+    
+    parts = []
+    if route == LLM:
+        llm_start = perf_counter()
+        try:
+            async for delta in chatbot.astream_reply(
+                message.message,
+                conversation_history=session.history,
+                context=_build_context(intent, entities_data, session),
+                use_cache=intent in CACHEABLE_INTENTS
+            ):
+                parts.append(delta)
+                yield "token", {"text": delta}
+        except LLMUnavailable:
+            route = FALLBACK
+        _stage["llm"].observe(perf_counter() - llm_start)
+    
+    if not parts:
+        response_text = _generate_fallback_response(intent, entities_data, session.total_price)
+        parts.append(response_text)
+        yield "token", {"text": response_text}
+    
+    # Commit the reply only once it is complete
+    response_text = "".join(parts).strip()
+    _record_exchange(session.session_id, message.message, response_text)
+    REQUESTS.labels(endpoint, route).inc()
+    # Durable before the client sees the turn complete, as for /chat
+    await order_log.sync()
+    
+    yield "done", {"response": response_text, "route": route}
+
+
+def _process_message(
+    message: ChatMessage,
+    analysis: Optional[TextAnalysis] = None
+) -> Tuple[SessionState, str, List[dict], str]:
+    """Resolve the session, run intent/entity extraction and update the order.
+    
+    Args:
+        message: User's chat message
+        analysis: The message already run through the analysis pipeline
+            (by a batch); analyzed here if None
+        
+    Returns:
+        Tuple of (session, intent, entity dicts, route)
+    """
+    session_id = message.session_id or str(uuid.uuid4())
+    
+    if analysis is None:
+        # One snapshot for the whole turn, even if the menu reloads meanwhile.
+        # Tokenizes once, then scores intents, extracts entities and binds
+        # sizes and quantities to items, each stage timed separately.
+        analysis = analysis_pipeline.analyze(message.message, MENU_STORE.current)
+    analysis_done = perf_counter()
+    scores, entities_data, menu = analysis.scores, analysis.entities, analysis.menu
+    
+    intent, confidence = intent_classifier.decide(scores)
+    
+    # Get or create session and process order if intent is order or add_item
+    # (once per idempotency key: a retry must not add the items again)
+    items_added = 0
+    with session_store.transaction(session_id) as session:
+        if intent in ORDER_INTENTS and not order_log.applied(message.idempotency_key):
+            # Each item carries the size and quantity stated next to it;
+            # totals accumulate in integer cents so long orders never drift
+            lines, _ = menu.price_order(analysis.lines)
+            new_basket = not session.lines
+            for item_name, size, item_quantity, unit_cents in lines:
+                session.add(item_name, size, item_quantity, unit_cents)
+            items_added = len(lines)
+            if lines:
+                order_log.record_add(session_id, lines, message.idempotency_key)
+                order_analytics.record(lines, new_basket)
+    _stage["pricing"].observe(perf_counter() - analysis_done)
+    
+    items_mentioned = sum(1 for e in entities_data if e["type"] in ["beverage", "food"])
+    route = response_router.route(intent, confidence, scores, items_mentioned, items_added)
+    
+    return session, intent, entities_data, route
+
+
+def _record_exchange(session_id: str, user_message: str, response_text: str):
+    """Append a user message and its reply to the session history."""
+    with session_store.transaction(session_id) as session:
+        session.history.add_exchange(user_message, response_text)
+
+
+def _build_context(intent: str, entities_data: List[dict], session: SessionState) -> Dict:
+    """Build the chatbot context for the current turn."""
+    return {
+        "intent": intent,
+        "entities": entities_data,
+        "total_price": session.total_price
+    }
+
+
+def _wire_entities(entities_data: List[dict]) -> List[Dict[str, str]]:
+    """Entities as sent to clients (the fields of `Entity`)."""
+    return [{"value": e["value"], "type": e["type"]} for e in entities_data]
+
+
+def _wire_order(session: SessionState) -> List[dict]:
+    """Order lines as sent to clients (the fields of `OrderItem`)."""
+    return [
+        {"item": item, "size": size, "quantity": quantity, "unit_price": unit_cents / 100}
+        for item, size, quantity, unit_cents in session.lines
+    ]
+
+
+def _session_bytes() -> int:
+    """Session store footprint for metrics."""
+    stats = session_store.stats()
+    return stats.get("estimated_bytes", stats.get("stored_bytes", 0))
+
+
+def _sse(event: str, data: dict) -> str:
+    """Format a Server-Sent Event."""
+    return f"event: {event}\ndata: {dumps(data).decode()}\n\n"
+
+
 @app.get("/menu")
-async def get_menu():
-    """Get the full menu with prices."""
-    return menu_service.get_all_items()
+async def get_menu(request: Request):
+    """Get the full menu with prices.
+    
+    The menu version is sent as X-Menu-Version and as the ETag, so
+    clients can revalidate with If-None-Match. The body is encoded (and
+    gzipped) once per menu version.
+    """
+    menu = MENU_STORE.current
+    return menu.items_body.response(
+        request, "no-cache", headers={"X-Menu-Version": menu.version}
+    )
+
+
+@app.post("/admin/menu/reload")
+async def reload_menu(x_admin_token: Optional[str] = Header(None)):
+    """Reload the menu file now instead of waiting for the watcher.
+    
+    Only reloads the worker that serves the request; the others pick the
+    change up on their next poll. Disabled unless ADMIN_TOKEN is set.
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    
+    try:
+        changed = await asyncio.to_thread(MENU_STORE.reload)
+    except (OSError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"version": MENU_STORE.current.version, "changed": changed}
 
 
 @app.delete("/session/{session_id}")
 async def clear_session(session_id: str):
     """Clear a session (reset order)."""
-    if session_id in sessions:
-        del sessions[session_id]
+    # The log may hold an order for a session the store has evicted
+    logged = order_log.order(session_id) is not None
+    if session_store.delete(session_id) or logged:
+        order_log.record_clear(session_id)
+        await order_log.sync()
         return {"message": "Session cleared"}
     return {"message": "Session not found"}
 
 
+@app.delete("/session/{session_id}/items/{index}")
+async def remove_order_item(session_id: str, index: int):
+    """Remove one line, by position, from a session's order."""
+    # Look up first: a transaction would create the unknown session. The
+    # log may hold an order for a session the store has evicted
+    if session_store.get(session_id) is None and order_log.order(session_id) is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    with session_store.transaction(session_id) as session:
+        if not 0 <= index < len(session.lines):
+            raise HTTPException(status_code=404, detail="Order item not found")
+        session.remove(index)
+        order_log.record_remove(session_id, index)
+    await order_log.sync()
+    return {"message": "Item removed", "total_price": session.total_price}
+
+
 def _generate_fallback_response(intent: str, entities: list, total_price: float) -> str:
     """Generate a simple fallback response when chatbot is unavailable."""
     if intent == "greeting":
         return "Hello! Welcome to our kiosk. What would you like to order?"
     elif intent in ["order", "add_item"]:
         if entities:
-            items = [e.value for e in entities if e.type in ["beverage", "food"]]
+            items = [e["value"] for e in entities if e["type"] in ["beverage", "food"]]
             if items and total_price > 0:
                 return f"Got it! Added {', '.join(items)} to your order. Total: ${total_price:.2f}. Anything else?"
         return "What would you like to order?"
@@ -160,10 +873,40 @@ def _generate_fallback_response(intent: str, entities: list, total_price: float)
         return "I'm here to help you order. What would you like?"
 
 
+@app.get("/analytics")
+async def analytics():
+    """Item popularity, revenue per time bucket and average basket size.
+    
+    Maintained as orders are placed, so this costs O(menu items) however
+    many sessions are live. Figures cover the orders this worker served.
+    """
+    return FastJSONResponse(order_analytics.report())
+
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
-    return {
+    p50 = CHAT_LATENCY.percentile(50)
+    p99 = CHAT_LATENCY.percentile(99)
+    # Rendered directly, skipping FastAPI's generic jsonable_encoder pass
+    return FastJSONResponse({
         "status": "healthy",
-        "chatbot_available": chatbot is not None
-    }
+        "chatbot_available": chatbot is not None,
+        "menu_version": MENU_STORE.current.version,
+        "startup": startup_report.as_dict(),
+        "llm_cache": chatbot.cache.stats() if chatbot else None,
+        "llm_admission": chatbot.admission.stats() if chatbot else None,
+        "llm_single_flight": chatbot.single_flight.stats() if chatbot else None,
+        "sessions": session_store.stats(),
+        "order_log": order_log.stats(),
+        "latency_ms": {
+            "p50": round(p50 * 1000, 3) if p50 is not None else None,
+            "p99": round(p99 * 1000, 3) if p99 is not None else None
+        }
+    })
+
+
+@app.get("/metrics")
+async def metrics():
+    """Expose metrics in Prometheus text format."""
+    return PlainTextResponse(REGISTRY.expose(), media_type="text/plain; version=0.0.4")
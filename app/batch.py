@@ -0,0 +1,75 @@
+"""Run chat batches in-process, without an HTTP server.
+
+    python -m app.batch transcripts.jsonl > replies.ndjson
+
+Reads one ChatMessage JSON object per line ({"message", "session_id"}) and
+writes one reply per line, exactly as POST /chat/batch would. Sessions live
+in the configured session store, so SESSION_BACKEND=sqlite keeps the
+resulting orders.
+"""
+
+from contextlib import redirect_stdout
+from typing import AsyncIterator, Iterable, Optional, Union
+import argparse
+import asyncio
+import sys
+
+from app import api
+from app.models import ChatMessage
+from app.serialization import dumps
+
+
+async def replay(
+    messages: Iterable[Union[ChatMessage, dict]],
+    max_concurrency: Optional[int] = None,
+    chunk_size: Optional[int] = None
+) -> AsyncIterator[dict]:
+    """Start the app's services, process a batch, then shut them down.
+
+    Args:
+        messages: ChatMessage objects or dicts with the same fields
+        max_concurrency: LLM calls in flight (see `api.process_batch`)
+        chunk_size: Messages analysed and buffered together
+
+    Yields:
+        One result dict per message, in input order
+    """
+    def parsed():
+        for message in messages:
+            yield message if isinstance(message, ChatMessage) else ChatMessage(**message)
+
+    async with api.lifespan(api.app):
+        async for result in api.process_batch(parsed(), max_concurrency, chunk_size):
+            yield result
+
+
+def _read_lines(stream) -> Iterable[Union[ChatMessage, str]]:
+    for line in stream:
+        if line.strip():
+            yield api._parse_batch_line(line.encode("utf-8"))
+
+
+async def _run(args):
+    # Replies own stdout; startup and warning messages go to stderr
+    out = sys.stdout
+    with open(args.input, encoding="utf-8") if args.input != "-" else sys.stdin as stream, \
+            redirect_stdout(sys.stderr):
+        async with api.lifespan(api.app):
+            async for result in api.process_batch(
+                _read_lines(stream), args.concurrency, args.chunk_size
+            ):
+                out.write(dumps(result).decode() + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="JSONL file of chat messages ('-' for stdin)")
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help="LLM calls in flight (default: CHAT_BATCH_MAX_CONCURRENCY)")
+    parser.add_argument("--chunk-size", type=int, default=None,
+                        help="Messages analysed together (default: CHAT_BATCH_CHUNK_SIZE)")
+    asyncio.run(_run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
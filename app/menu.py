@@ -1,53 +1,371 @@
-"""Menu items and pricing logic."""
-
-from typing import Dict, Optional, Tuple
-
-# Menu based on the parent repository's structure
-MENU = {
-    "prices": {
-        "coffee": 1.50,
-        "cappuccino": 2.50,
-        "iced coffee": 2.00,
-        "iced capp": 2.25,
-        "latte": 2.00,
-        "tea": 1.50,
-        "hot chocolate": 2.25,
-        "french vanilla": 2.25,
-        "white chocolate": 2.25,
-        "mocha": 2.25,
-        "espresso": 1.00,
-        "americano": 2.25,
-        "extra shot": 0.25,
-        "soy milk": 0.30,
-        "whipped topping": 1.00,
-        "dark roast": 0.20,
-        "turkey bacon club": 3.00,
-        "blt": 2.90,
-        "grilled cheese": 4.00,
-        "chicken wrap": 3.50,
-        "soup": 2.80,
-        "donut": 1.50,
-        "chocolate donut": 1.50,
-        "glazed donut": 1.50,
-        "double double": 1.50,
-        "triple triple": 1.50,
-        "muffin": 2.40,
-        "bagel": 3.00,
-        "timbits": 3.00,
-        "panini": 2.40,
-        "croissant": 3.00,
-    },
-    "size_multiplier": {
-        "small": 1.0,
-        "medium": 1.2,
-        "large": 1.4,
-        "extra large": 1.6,
-    }
-}
+"""Menu items and pricing logic.
+
+The menu is read from a JSON (or YAML) file into an immutable, versioned
+`MenuSnapshot` holding the derived indexes: price table, phrase matcher,
+fuzzy search index and beverage set. `MENU_STORE` serves the current
+snapshot and swaps in a new one, fully built, when the file changes.
+"""
+
+from functools import cached_property
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import threading
+
+from app.nlp.matcher import PhraseMatcher
+from app.search import FuzzyIndex
+from app.serialization import EncodedBody, dumps
+
+# Bundled menu, based on the parent repository's structure
+DEFAULT_MENU_PATH = os.path.join(os.path.dirname(__file__), "menu.json")
+
+
+def load_menu(path: str) -> Dict:
+    """Read and validate a menu file.
+    
+    Args:
+        path: JSON file, or YAML if the name ends in .yaml/.yml (needs PyYAML)
+        
+    Returns:
+        Menu definition
+        
+    Raises:
+        ValueError: If the file cannot be parsed or is not a valid menu
+    """
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    
+    try:
+        if path.endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ImportError:
+                raise ValueError("PyYAML is required to load YAML menus")
+            menu = yaml.safe_load(text)
+        else:
+            menu = json.loads(text)
+    except ValueError as e:
+        raise ValueError(f"Could not parse menu {path}: {e}")
+    
+    validate_menu(menu)
+    return menu
+
+
+def validate_menu(menu: Any):
+    """Check a menu definition before any index is built from it.
+    
+    Raises:
+        ValueError: Describing the first problem found
+    """
+    if not isinstance(menu, dict):
+        raise ValueError("Menu must be a mapping")
+    prices = menu.get("prices")
+    if not isinstance(prices, dict) or not prices:
+        raise ValueError("Menu needs a non-empty \"prices\" mapping")
+    for item, price in prices.items():
+        if not isinstance(price, (int, float)) or isinstance(price, bool) or price < 0:
+            raise ValueError(f"Invalid price for {item!r}: {price!r}")
+    sizes = menu.get("size_multiplier")
+    if not isinstance(sizes, dict):
+        raise ValueError("Menu needs a \"size_multiplier\" mapping")
+    for size, multiplier in sizes.items():
+        if not isinstance(multiplier, (int, float)) or multiplier <= 0:
+            raise ValueError(f"Invalid multiplier for {size!r}: {multiplier!r}")
+    for key in ("beverages", "addons"):
+        unknown = [item for item in menu.get(key, []) if item not in prices]
+        if unknown:
+            raise ValueError(f"Unknown items in \"{key}\": {', '.join(unknown)}")
+    unknown = [alias for alias, item in menu.get("aliases", {}).items() if item not in prices]
+    if unknown:
+        raise ValueError(f"Aliases for unknown items: {', '.join(unknown)}")
+
+
+def _freeze(value: Any) -> Any:
+    """Recursively turn dicts into read-only views and lists into tuples."""
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+class PriceTable:
+    """Immutable item x size price matrix in integer cents.
+    
+    Built once from the menu. Items and sizes get dense integer ids (with
+    size id 0 meaning "no size"), and every combination is priced up front,
+    so a lookup is two dict hits and a tuple index with no float math.
+    """
+    
+    def __init__(self, menu: Dict):
+        """Precompute all prices.
+        
+        Args:
+            menu: Menu definition with "prices", "size_multiplier" and
+                optional "addons"
+        """
+        self.items: Tuple[str, ...] = tuple(sys.intern(item) for item in menu["prices"])
+        self.sizes: Tuple[Optional[str], ...] = (None,) + tuple(
+            sys.intern(size) for size in menu["size_multiplier"]
+        )
+        self.item_ids: Dict[str, int] = {item: i for i, item in enumerate(self.items)}
+        self.size_ids: Dict[Optional[str], int] = {size: i for i, size in enumerate(self.sizes)}
+        addons = set(menu.get("addons", ()))
+        
+        multipliers = [None] + list(menu["size_multiplier"].values())
+        rows = []
+        for item in self.items:
+            base = menu["prices"][item]
+            row = []
+            for multiplier in multipliers:
+                if multiplier is None or item in addons:
+                    price = base
+                else:
+                    # Same rounding as the float pricing this replaces
+                    price = round(base * multiplier, 2)
+                row.append(int(round(price * 100)))
+            rows.append(tuple(row))
+        self.cents: Tuple[Tuple[int, ...], ...] = tuple(rows)
+    
+    def item_id(self, item_name: str) -> Optional[int]:
+        """Resolve an item name to its id, or None if not on the menu."""
+        item_id = self.item_ids.get(item_name)
+        if item_id is None:
+            item_id = self.item_ids.get(item_name.lower().strip())
+        return item_id
+    
+    def size_id(self, size: Optional[str]) -> int:
+        """Resolve a size to its id; unknown sizes price as no size."""
+        if not size:
+            return 0
+        size_id = self.size_ids.get(size)
+        if size_id is None:
+            size_id = self.size_ids.get(size.lower().strip(), 0)
+        return size_id
+    
+    def price_cents(self, item_id: int, size_id: int = 0) -> int:
+        """Look up a price by item and size id."""
+        return self.cents[item_id][size_id]
+
+
+class MenuSnapshot:
+    """One immutable version of the menu with everything derived from it.
+    
+    All indexes are built in the constructor, so a snapshot is complete
+    before anyone can see it; readers grab `MENU_STORE.current` once per
+    request and use it throughout, even if a reload happens meanwhile.
+    """
+    
+    def __init__(self, menu: Dict, previous: Optional["MenuSnapshot"] = None):
+        """Build the derived indexes.
+        
+        Args:
+            menu: Validated menu definition
+            previous: Snapshot being replaced; its search index is reused
+                when the item names and aliases are unchanged, so price-only
+                edits skip the rebuild (seconds on very large menus)
+        """
+        canonical = json.dumps(menu, sort_keys=True, separators=(",", ":"))
+        digest = hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+        # Content-derived, so every worker agrees on the version of a file
+        self.version = digest[:12]
+        self.etag = f'"{self.version}"'
+        self.menu: Mapping[str, Any] = _freeze(menu)
+        
+        self.price_table = PriceTable(menu)
+        terms = FuzzyIndex.menu_terms(menu)
+        if previous is not None and previous.search_index.source == terms:
+            self.search_index = previous.search_index
+        else:
+            self.search_index = FuzzyIndex(terms)
+        
+        # Declared beverages, plus items naming one (e.g. "vanilla latte")
+        declared = menu.get("beverages", ())
+        self.beverages = frozenset(
+            item for item in menu["prices"]
+            if item in declared or any(bev in item for bev in declared)
+        )
+        addons = set(menu.get("addons", ()))
+        self.item_types: Mapping[str, str] = MappingProxyType({
+            item: "addon" if item in addons else "beverage" if item in self.beverages else "food"
+            for item in menu["prices"]
+        })
+        
+        phrases = {size: "size" for size in menu["size_multiplier"]}
+        phrases.update(self.item_types)
+        self.matcher = PhraseMatcher(phrases, aliases=menu.get("aliases"))
+    
+    def get_item_price_cents(self, item_name: str, size: Optional[str] = None) -> Optional[int]:
+        """Price of an item in integer cents, or None if not on the menu."""
+        table = self.price_table
+        item_id = table.item_id(item_name)
+        if item_id is None:
+            return None
+        return table.cents[item_id][table.size_id(size)]
+    
+    def price_order(
+        self,
+        items: Iterable[Tuple]
+    ) -> Tuple[List[Tuple[str, Optional[str], int, int]], int]:
+        """Price a whole order in one pass (see `MenuService.price_order`)."""
+        table = self.price_table
+        lines = []
+        total = 0
+        
+        for item_name, size, quantity, *rest in items:
+            item_id = table.item_id(item_name)
+            if item_id is None:
+                continue
+            size_id = table.size_id(size)
+            unit = table.cents[item_id][size_id]
+            name = table.items[item_id]
+            
+            counts: Dict[str, int] = {}
+            for addon in (rest[0] if rest else ()):
+                addon_id = table.item_id(addon)
+                if addon_id is not None:
+                    unit += table.cents[addon_id][0]
+                    addon = table.items[addon_id]
+                    counts[addon] = counts.get(addon, 0) + 1
+            if counts:
+                name = _with_addons(name, counts)
+            
+            lines.append((name, table.sizes[size_id], quantity, unit))
+            total += unit * quantity
+        
+        return lines, total
+    
+    def is_beverage(self, item_name: str) -> bool:
+        """Check if an item is a beverage."""
+        return item_name.lower() in self.beverages
+    
+    def get_all_items(self) -> Dict[str, float]:
+        """All menu items and their base prices."""
+        return dict(self.menu["prices"])
+    
+    @cached_property
+    def items_body(self) -> EncodedBody:
+        """`get_all_items` as JSON, encoded and gzipped once per snapshot."""
+        return EncodedBody(dumps(self.get_all_items()), "application/json", etag=self.etag)
+
+
+def _with_addons(item: str, counts: Dict[str, int]) -> str:
+    """Line name for an item with add-ons, e.g. "latte with extra shot x2 and soy milk"."""
+    names = [addon if count == 1 else f"{addon} x{count}" for addon, count in counts.items()]
+    if len(names) > 1:
+        names = [", ".join(names[:-1]), names[-1]]
+    return f"{item} with {' and '.join(names)}"
+
+
+class MenuStore:
+    """Holds the current menu snapshot and reloads it from its file.
+    
+    A reload parses, validates and indexes the new menu off to the side,
+    then publishes it with a single reference assignment. A file that
+    fails to load leaves the current snapshot in place.
+    """
+    
+    def __init__(self, path: Optional[str] = None):
+        """Initialize the store; the menu is read by `load()` or on first use.
+        
+        Args:
+            path: Menu file (if None, reads MENU_PATH, defaulting to the
+                bundled app/menu.json)
+        """
+        self.path = path or os.getenv("MENU_PATH", DEFAULT_MENU_PATH)
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._current: Optional[MenuSnapshot] = None
+        self.reloads = 0
+    
+    @property
+    def current(self) -> MenuSnapshot:
+        """The live snapshot, loaded on first use."""
+        current = self._current
+        return current if current is not None else self.load()
+    
+    def load(self) -> MenuSnapshot:
+        """Read the menu file unless a snapshot is already loaded.
+        
+        The server calls this during startup, so the cost is measured
+        there rather than paid at import.
+        
+        Returns:
+            The live snapshot
+            
+        Raises:
+            ValueError: If the file is not a valid menu
+            OSError: If the file cannot be read
+        """
+        with self._lock:
+            if self._current is None:
+                self._stamp = self._file_stamp()
+                self._current = MenuSnapshot(load_menu(self.path))
+            return self._current
+    
+    def _file_stamp(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+    
+    def reload(self) -> bool:
+        """Re-read the menu file and publish it if its content changed.
+        
+        Returns:
+            True if a new version was published
+            
+        Raises:
+            ValueError: If the file is not a valid menu
+            OSError: If the file cannot be read
+        """
+        with self._lock:
+            # Recorded even if loading fails, so a bad file is reported once
+            self._stamp = self._file_stamp()
+            snapshot = MenuSnapshot(load_menu(self.path), previous=self._current)
+            if self._current is not None and snapshot.version == self._current.version:
+                return False
+            self._current = snapshot
+            self.reloads += 1
+            return True
+    
+    def reload_if_modified(self) -> bool:
+        """Reload only if the file's mtime or size changed since last load."""
+        if self._file_stamp() == self._stamp:
+            return False
+        return self.reload()
+    
+    async def watch(self, interval: float):
+        """Poll the menu file and reload it when it changes.
+        
+        Runs until cancelled. Each worker process runs its own watcher,
+        so all of them converge on the file's content.
+        
+        Args:
+            interval: Seconds between checks
+        """
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if await asyncio.to_thread(self.reload_if_modified):
+                    print(f"Menu reloaded: version {self._current.version}")
+            except (OSError, ValueError) as e:
+                print(f"Warning: keeping menu {self._current.version}: {e}")
+
+
+MENU_STORE = MenuStore()
 
 
 class MenuService:
-    """Service for handling menu operations and pricing."""
+    """Service for handling menu operations and pricing.
+    
+    Every method reads the current snapshot of `MENU_STORE`.
+    """
 
     @staticmethod
     def get_item_price(item_name: str, size: Optional[str] = None) -> Optional[float]:
@@ -60,37 +378,53 @@ class MenuService:
         Returns:
             Price of the item, or None if item not found
         """
-        item_name = item_name.lower().strip()
-        base_price = MENU["prices"].get(item_name)
-        
-        if base_price is None:
-            return None
+        cents = MenuService.get_item_price_cents(item_name, size)
+        return None if cents is None else cents / 100
+    
+    @staticmethod
+    def get_item_price_cents(item_name: str, size: Optional[str] = None) -> Optional[int]:
+        """Get the price of a menu item in integer cents.
         
-        if size:
-            size = size.lower().strip()
-            multiplier = MENU["size_multiplier"].get(size, 1.0)
-            return round(base_price * multiplier, 2)
+        Args:
+            item_name: Name of the menu item
+            size: Optional size (small, medium, large, extra large)
+            
+        Returns:
+            Price in cents, or None if item not found
+        """
+        return MENU_STORE.current.get_item_price_cents(item_name, size)
+    
+    @staticmethod
+    def price_order(
+        items: Iterable[Tuple]
+    ) -> Tuple[List[Tuple[str, Optional[str], int, int]], int]:
+        """Price a whole order in one pass.
         
-        return base_price
+        Args:
+            items: (item name, size, quantity) for each line, optionally
+                followed by the add-ons ("extra shot", ...) on each unit
+            
+        Returns:
+            Tuple of (priced lines as (item, size, quantity, unit cents),
+            total cents). Each add-on's price is included in its item's
+            unit price and name ("latte with extra shot"). Items and add-ons
+            not on the menu are left out.
+        """
+        return MENU_STORE.current.price_order(items)
     
     @staticmethod
     def is_beverage(item_name: str) -> bool:
         """Check if an item is a beverage."""
-        beverages = [
-            "coffee", "cappuccino", "iced coffee", "iced capp", "latte",
-            "tea", "hot chocolate", "french vanilla", "white chocolate",
-            "mocha", "espresso", "americano", "double double", "triple triple"
-        ]
-        return item_name.lower() in beverages
+        return MENU_STORE.current.is_beverage(item_name)
     
     @staticmethod
     def get_all_items() -> Dict[str, float]:
         """Get all menu items and their base prices."""
-        return MENU["prices"].copy()
+        return MENU_STORE.current.get_all_items()
     
     @staticmethod
     def search_item(query: str) -> Optional[str]:
-        """Search for a menu item by partial name match.
+        """Search for a menu item by name, alias, typo or partial name.
         
         Args:
             query: Search query
@@ -98,15 +432,17 @@ class MenuService:
         Returns:
             Matched item name or None
         """
-        query = query.lower().strip()
-        
-        # Exact match
-        if query in MENU["prices"]:
-            return query
-        
-        # Partial match
-        for item in MENU["prices"]:
-            if query in item or item in query:
-                return item
+        return MENU_STORE.current.search_index.lookup(query)
+    
+    @staticmethod
+    def search_candidates(query: str, limit: int = 5) -> List[Tuple[str, int]]:
+        """Rank menu items by edit distance to the query.
         
-        return None
+        Args:
+            query: Search query
+            limit: Maximum candidates returned
+            
+        Returns:
+            (item name, edit distance) pairs, closest first
+        """
+        return MENU_STORE.current.search_index.search(query, limit=limit)
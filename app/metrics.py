@@ -0,0 +1,221 @@
+"""Lightweight in-process metrics with Prometheus text exposition.
+
+Recording is a few list/dict operations, cheap enough to leave on in
+production. Values are per worker process.
+"""
+
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from tens of microseconds to LLM round-trips
+DEFAULT_BUCKETS = (
+    0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01,
+    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+def _format_labels(labelnames: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+
+    def labels(self, *values: str):
+        """Get the child metric for a set of label values."""
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = self._new_child()
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def expose(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+
+class Counter(_Metric):
+    """Monotonically increasing count."""
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        if not self.labelnames:
+            self._default = self.labels()
+
+    def inc(self, amount: float = 1.0):
+        """Increment an unlabelled counter."""
+        self._default.value += amount
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, values)} {child.value}"
+            for values, child in self._children.items()
+        ]
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in fixed buckets."""
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+        if not self.labelnames:
+            self._default = self.labels()
+
+    def observe(self, value: float):
+        """Record a value in an unlabelled histogram."""
+        self._default.observe(value)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for values, child in self._children.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                labels = _format_labels(self.labelnames, values, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {child.sum}")
+            lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+class GaugeFunc(_Metric):
+    """Value read from a callback at scrape time."""
+
+    def __init__(self, name: str, help: str, fn: Callable[[], float], type: str = "gauge"):
+        super().__init__(name, help)
+        self.fn = fn
+        self.type = type
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name} {float(self.fn())}"]
+
+
+class LatencyWindow:
+    """Ring buffer of the most recent latencies for rolling percentiles."""
+
+    def __init__(self, size: int = 1024):
+        self.size = size
+        self._values: List[float] = []
+        self._next = 0
+
+    def record(self, value: float):
+        if len(self._values) < self.size:
+            self._values.append(value)
+        else:
+            self._values[self._next] = value
+            self._next = (self._next + 1) % self.size
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Return the q-th percentile (0-100) of the window, or None if empty."""
+        if not self._values:
+            return None
+        ordered = sorted(self._values)
+        index = min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+
+class Registry:
+    """Collection of metrics exposed together."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def expose(self) -> str:
+        """Render all metrics in Prometheus text format."""
+        return "\n".join(metric.expose() for metric in self._metrics.values()) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "nopickles_stage_seconds",
+    "Time spent in each /chat pipeline stage",
+    labelnames=("stage",)
+))
+REQUESTS = REGISTRY.register(Counter(
+    "nopickles_chat_requests_total",
+    "Chat turns served, by endpoint and response route",
+    labelnames=("endpoint", "route")
+))
+LLM_TOKENS = REGISTRY.register(Counter(
+    "nopickles_llm_tokens_total",
+    "LLM tokens used, by kind (prompt or completion)",
+    labelnames=("kind",)
+))
+LLM_ERRORS = REGISTRY.register(Counter(
+    "nopickles_llm_errors_total",
+    "LLM calls that failed or timed out"
+))
+LLM_SHED = REGISTRY.register(Counter(
+    "nopickles_llm_shed_total",
+    "LLM calls refused before running, by reason (queue_full, queue_timeout, breaker_open)",
+    labelnames=("reason",)
+))
+LLM_DEADLINE_MISSES = REGISTRY.register(Counter(
+    "nopickles_llm_deadline_misses_total",
+    "LLM replies that missed the reply deadline and were answered from a template"
+))
+
+# Rolling end-to-end /chat latency for /health
+CHAT_LATENCY = LatencyWindow()
@@ -1,14 +1,20 @@
-"""Data models for the application."""
+"""Request and response models of the HTTP API.
+
+Session and order state is kept in the compact classes of `app.state`;
+these models are only used to validate requests and document replies.
+"""
 
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict
-from datetime import datetime
+from typing import List, Optional
 
 
 class ChatMessage(BaseModel):
     """Incoming chat message from user."""
     message: str = Field(..., min_length=1, description="User message")
     session_id: Optional[str] = Field(None, description="Session ID for conversation continuity")
+    idempotency_key: Optional[str] = Field(
+        None, description="Unique per request; a retry with the same key gets the original reply"
+    )
 
 
 class Entity(BaseModel):
@@ -17,27 +23,30 @@ class Entity(BaseModel):
     type: str = Field(..., description="Entity type (e.g., 'beverage', 'size')")
 
 
+class OrderItem(BaseModel):
+    """One line of the session's order."""
+    item: str = Field(..., description="Item name, with any add-ons (e.g., 'latte with extra shot')")
+    size: Optional[str] = Field(None, description="Size, if any")
+    quantity: int = Field(..., description="Units ordered")
+    unit_price: float = Field(..., description="Price of one unit")
+
+
 class ChatResponse(BaseModel):
     """Response from the chatbot."""
     response: str = Field(..., description="Bot response message")
     intent: str = Field(..., description="Detected intent (e.g., 'order', 'question')")
     entities: List[Entity] = Field(default_factory=list, description="Extracted entities")
+    order: List[OrderItem] = Field(default_factory=list, description="Current order lines")
     total_price: float = Field(0.0, description="Current order total")
     session_id: str = Field(..., description="Session ID")
+    route: str = Field("llm", description="Path that produced the reply (template, llm or fallback)")
 
 
-class OrderItem(BaseModel):
-    """Single item in an order."""
-    name: str
-    size: Optional[str] = None
-    quantity: int = 1
-    price: float
-
-
-class Session(BaseModel):
-    """User session data."""
-    session_id: str
-    messages: List[str] = Field(default_factory=list)
-    order_items: List[OrderItem] = Field(default_factory=list)
-    total_price: float = 0.0
-    created_at: datetime = Field(default_factory=datetime.now)
+class ChatBatchRequest(BaseModel):
+    """Many chat messages, possibly across sessions, processed together."""
+    messages: List[ChatMessage] = Field(..., description="Messages in turn order")
+
+
+class ChatBatchResult(ChatResponse):
+    """Reply to one message of a batch."""
+    index: int = Field(..., description="Position of the message in the batch")
@@ -0,0 +1,229 @@
+"""Admission control for LLM calls: bounded concurrency, queue deadline and
+a circuit breaker.
+
+When the completion API slows down, callers should get a fast template
+reply rather than pile up behind it. `AdmissionController` admits at most
+`max_in_flight` calls, lets a bounded number wait for at most
+`queue_timeout` seconds, and refuses everything while its breaker is open.
+Refusals raise `LLMUnavailable`, which callers turn into a fallback.
+"""
+
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Optional, Tuple
+import asyncio
+import os
+import time
+
+from app.metrics import LLM_SHED
+
+# Breaker states, exported as gauge values
+CLOSED = 0
+HALF_OPEN = 1
+OPEN = 2
+
+STATE_NAMES = {CLOSED: "closed", HALF_OPEN: "half_open", OPEN: "open"}
+
+
+class LLMUnavailable(Exception):
+    """The LLM was not asked, or did not answer in time.
+
+    Attributes:
+        reason: "queue_full", "queue_timeout", "breaker_open", "deadline"
+            or "error"
+    """
+
+    def __init__(self, reason: str, detail: str = ""):
+        super().__init__(f"{reason}: {detail}" if detail else reason)
+        self.reason = reason
+
+
+class CircuitBreaker:
+    """Opens when recent calls fail or run slow too often.
+
+    Keeps the outcomes of the last `window` calls. Once at least
+    `min_calls` are recorded, the breaker opens if the error rate or the
+    share of calls slower than `slow_call_seconds` reaches its threshold.
+    After `cooldown` seconds it lets one probe call through (half-open);
+    the probe's outcome closes or re-opens it.
+
+    Each admitted call gets the breaker's generation, which changes on every
+    state change, so calls that finish after the breaker moved on (e.g. slow
+    calls admitted before it opened) are not counted against the new state.
+    """
+
+    def __init__(
+        self,
+        window: int = 20,
+        min_calls: int = 10,
+        error_threshold: float = 0.5,
+        slow_call_seconds: float = 5.0,
+        slow_threshold: float = 0.5,
+        cooldown: float = 30.0
+    ):
+        self.window = window
+        self.min_calls = min_calls
+        self.error_threshold = error_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_threshold = slow_threshold
+        self.cooldown = cooldown
+
+        self.state = CLOSED
+        self.opens = 0
+        self._generation = 0
+        self._outcomes: Deque[Tuple[bool, bool]] = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._probing = False
+
+    def allow(self) -> Optional[int]:
+        """Admit a call, returning its generation, or None if refused."""
+        if self.state == CLOSED:
+            return self._generation
+        if self.state == OPEN:
+            if time.monotonic() - self._opened_at < self.cooldown:
+                return None
+            self._set_state(HALF_OPEN)
+        # Half-open: a single probe at a time
+        if self._probing:
+            return None
+        self._probing = True
+        return self._generation
+
+    def record(self, generation: int, ok: bool, seconds: float):
+        """Record a finished call admitted in `generation`."""
+        if generation != self._generation:
+            return
+        slow = seconds > self.slow_call_seconds
+        if self.state == HALF_OPEN:
+            if ok and not slow:
+                self._set_state(CLOSED)
+            else:
+                self._open()
+            return
+
+        self._outcomes.append((ok, slow))
+        if len(self._outcomes) >= self.min_calls:
+            calls = len(self._outcomes)
+            errors = sum(1 for ok, _ in self._outcomes if not ok)
+            slow_calls = sum(1 for _, slow in self._outcomes if slow)
+            if errors / calls >= self.error_threshold or slow_calls / calls >= self.slow_threshold:
+                self._open()
+
+    def release(self, generation: int):
+        """Give back a probe that ended without an outcome (shed or abandoned)."""
+        if self.state == HALF_OPEN and generation == self._generation:
+            self._probing = False
+
+    def _open(self):
+        self._set_state(OPEN)
+        self.opens += 1
+        self._opened_at = time.monotonic()
+
+    def _set_state(self, state: int):
+        self.state = state
+        self._generation += 1
+        self._outcomes.clear()
+        self._probing = False
+
+
+class AdmissionController:
+    """Bounded in-flight LLM calls with a bounded, deadline-limited queue."""
+
+    def __init__(
+        self,
+        max_in_flight: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        queue_timeout: Optional[float] = None,
+        breaker: Optional[CircuitBreaker] = None
+    ):
+        """Initialize the controller.
+
+        Args:
+            max_in_flight: Calls running at once (if None, reads
+                LLM_MAX_CONCURRENCY)
+            max_queue: Callers allowed to wait for a slot (if None, reads
+                LLM_MAX_QUEUE, default 2x max_in_flight)
+            queue_timeout: Seconds a caller may wait for a slot (if None,
+                reads LLM_QUEUE_TIMEOUT)
+            breaker: Circuit breaker (if None, configured from LLM_BREAKER_*)
+        """
+        self.max_in_flight = max_in_flight or int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+        if max_queue is None:
+            max_queue = int(os.getenv("LLM_MAX_QUEUE", str(2 * self.max_in_flight)))
+        self.max_queue = max_queue
+        if queue_timeout is None:
+            queue_timeout = float(os.getenv("LLM_QUEUE_TIMEOUT", "1.0"))
+        self.queue_timeout = queue_timeout
+        self.breaker = breaker or CircuitBreaker(
+            window=int(os.getenv("LLM_BREAKER_WINDOW", "20")),
+            min_calls=int(os.getenv("LLM_BREAKER_MIN_CALLS", "10")),
+            error_threshold=float(os.getenv("LLM_BREAKER_ERROR_RATE", "0.5")),
+            slow_call_seconds=float(os.getenv("LLM_BREAKER_SLOW_SECONDS", "5")),
+            slow_threshold=float(os.getenv("LLM_BREAKER_SLOW_RATE", "0.5")),
+            cooldown=float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+        )
+
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        self.in_flight = 0
+        self.queued = 0
+
+    def _shed(self, reason: str):
+        LLM_SHED.labels(reason).inc()
+        raise LLMUnavailable(reason)
+
+    @asynccontextmanager
+    async def slot(self, timeout: Optional[float] = None) -> AsyncIterator[int]:
+        """Hold an in-flight slot for one call.
+
+        The caller must report the call's outcome with `record`, passing the
+        ticket this yields.
+
+        Args:
+            timeout: Cap on the wait for a slot, below the queue deadline
+                (e.g. what is left of the caller's own deadline)
+
+        Raises:
+            LLMUnavailable: If the breaker is open, the queue is full, or no
+                slot freed up within the queue deadline
+        """
+        ticket = self.breaker.allow()
+        if ticket is None:
+            self._shed("breaker_open")
+
+        try:
+            if self._semaphore.locked():
+                if self.queued >= self.max_queue:
+                    self._shed("queue_full")
+                wait = self.queue_timeout if timeout is None else min(timeout, self.queue_timeout)
+                self.queued += 1
+                try:
+                    await asyncio.wait_for(self._semaphore.acquire(), timeout=wait)
+                except asyncio.TimeoutError:
+                    self._shed("queue_timeout")
+                finally:
+                    self.queued -= 1
+            else:
+                await self._semaphore.acquire()
+
+            self.in_flight += 1
+            try:
+                yield ticket
+            finally:
+                self.in_flight -= 1
+                self._semaphore.release()
+        finally:
+            # No-op unless this was a half-open probe left without an outcome
+            self.breaker.release(ticket)
+
+    def record(self, ticket: int, ok: bool, seconds: float):
+        """Feed a finished call's outcome to the breaker."""
+        self.breaker.record(ticket, ok, seconds)
+
+    def stats(self) -> dict:
+        """Current load and breaker state, for /health."""
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "breaker": STATE_NAMES[self.breaker.state],
+            "breaker_opens": self.breaker.opens
+        }
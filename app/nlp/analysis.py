@@ -0,0 +1,224 @@
+"""Single-pass message analysis shared by the /chat NLP stages.
+
+A message is lowercased and tokenized once into a `TextAnalysis`; intent
+scoring, entity extraction and order binding then run as pluggable stages
+of an `AnalysisPipeline`, each reading the shared tokens and spans and
+storing its result on the analysis.
+"""
+
+from time import perf_counter
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.nlp.matcher import QUANTITY_WORDS, TOKEN_PATTERN, Match
+
+# (token, start, end) with offsets into the lowercased text
+Token = Tuple[str, int, int]
+
+# (item, size or None, quantity, add-ons per unit)
+OrderLine = Tuple[str, Optional[str], int, Tuple[str, ...]]
+
+
+class TextAnalysis:
+    """One message, normalized and tokenized once, plus the stage results.
+
+    Attributes:
+        text: Message as received
+        lower: Lowercased message; all offsets refer to it
+        tokens: Word tokens as (token, start, end)
+        numbers: Token index -> value for numerals and quantity words
+        menu: Menu snapshot the stages matched against
+        matches: Exact phrase matches (set by entity extraction)
+        fuzzy: Typo-tolerant item matches (set by entity extraction)
+        scores: Intent scores (set by the intent stage)
+        entities: Entity dicts (set by entity extraction)
+        lines: Ordered (item, size, quantity, add-ons) lines (set by binding)
+    """
+
+    __slots__ = (
+        "text", "lower", "tokens", "numbers", "menu",
+        "matches", "fuzzy", "scores", "entities", "lines",
+    )
+
+    def __init__(self, text: str, menu=None):
+        self.text = text
+        self.lower = text.lower()
+        self.tokens: List[Token] = [
+            (m.group(), m.start(), m.end()) for m in TOKEN_PATTERN.finditer(self.lower)
+        ]
+        self.numbers: Dict[int, int] = {}
+        for i, (token, _, _) in enumerate(self.tokens):
+            if token.isdecimal():
+                self.numbers[i] = int(token)
+            elif token in QUANTITY_WORDS:
+                self.numbers[i] = QUANTITY_WORDS[token][1]
+        self.menu = menu
+        self.matches: List[Match] = []
+        self.fuzzy: List[Match] = []
+        self.scores: Optional[Dict] = None
+        self.entities: List[Dict] = []
+        self.lines: List[OrderLine] = []
+
+
+class Stage:
+    """A named pipeline step that reads and annotates a `TextAnalysis`.
+
+    Subclasses implement `run`; `run_many` may be overridden when a batch
+    can be processed faster together.
+    """
+
+    name = "stage"
+
+    def run(self, analysis: TextAnalysis):
+        raise NotImplementedError
+
+    def run_many(self, analyses: Sequence[TextAnalysis]):
+        run = self.run
+        for analysis in analyses:
+            run(analysis)
+
+
+class IntentStage(Stage):
+    """Scores intents into `analysis.scores`."""
+
+    name = "intent"
+
+    def __init__(self, classifier):
+        self.classifier = classifier
+
+    def run(self, analysis: TextAnalysis):
+        analysis.scores = self.classifier.score_analysis(analysis)
+
+    def run_many(self, analyses: Sequence[TextAnalysis]):
+        # One call, so a vectorized classifier scores the batch together
+        scores = self.classifier.score_many([analysis.lower for analysis in analyses])
+        for analysis, score in zip(analyses, scores):
+            analysis.scores = score
+
+
+class EntityStage(Stage):
+    """Extracts menu items, sizes and quantities into `analysis.entities`."""
+
+    name = "entities"
+
+    def __init__(self, extractor):
+        self.extractor = extractor
+
+    def run(self, analysis: TextAnalysis):
+        analysis.entities = self.extractor.extract_analysis(analysis)
+
+
+class BindingStage(Stage):
+    """Binds sizes, quantities and add-ons to items by position into `analysis.lines`."""
+
+    name = "binding"
+
+    def __init__(self, extractor):
+        self.extractor = extractor
+
+    def run(self, analysis: TextAnalysis):
+        analysis.lines = self.extractor.bind(analysis)
+
+
+class AnalysisPipeline:
+    """Tokenizes a message once and runs the stages over it in order.
+
+    Each stage, and the tokenization itself ("tokenize"), is timed
+    separately and reported to `observe(stage name, seconds)`.
+    """
+
+    def __init__(
+        self,
+        stages: Iterable[Stage],
+        observe: Optional[Callable[[str, float], None]] = None
+    ):
+        """Initialize the pipeline.
+
+        Args:
+            stages: Stages to run, in order
+            observe: Called with each stage's name and seconds per message
+        """
+        self.stages: List[Stage] = list(stages)
+        self.observe = observe
+
+    def analyze(self, text: str, menu) -> TextAnalysis:
+        """Analyze one message.
+
+        Args:
+            text: User's message
+            menu: Menu snapshot for the whole turn
+
+        Returns:
+            The analysis with every stage's result filled in
+        """
+        observe = self.observe
+        start = perf_counter()
+        analysis = TextAnalysis(text, menu)
+        if observe is None:
+            for stage in self.stages:
+                stage.run(analysis)
+            return analysis
+
+        end = perf_counter()
+        observe("tokenize", end - start)
+        for stage in self.stages:
+            start = end
+            stage.run(analysis)
+            end = perf_counter()
+            observe(stage.name, end - start)
+        return analysis
+
+    def analyze_many(self, texts: Iterable[str], menu) -> List[TextAnalysis]:
+        """Analyze a batch of messages stage by stage.
+
+        Each stage sees the whole batch at once (see `Stage.run_many`); its
+        time is reported as the mean per message.
+
+        Args:
+            texts: User messages
+            menu: Menu snapshot shared by the batch
+
+        Returns:
+            Analyses in input order
+        """
+        start = perf_counter()
+        analyses = [TextAnalysis(text, menu) for text in texts]
+        if not analyses:
+            return analyses
+
+        timings = [("tokenize", perf_counter() - start)]
+        for stage in self.stages:
+            start = perf_counter()
+            stage.run_many(analyses)
+            timings.append((stage.name, perf_counter() - start))
+
+        if self.observe is not None:
+            for name, seconds in timings:
+                per_message = seconds / len(analyses)
+                for _ in analyses:
+                    self.observe(name, per_message)
+        return analyses
+
+
+def create_analysis_pipeline(
+    intent_classifier,
+    entity_extractor,
+    observe: Optional[Callable[[str, float], None]] = None
+) -> AnalysisPipeline:
+    """Build the default /chat pipeline: intent, entities, then binding.
+
+    Args:
+        intent_classifier: Classifier with `score_analysis` and `score_many`
+        entity_extractor: EntityExtractor
+        observe: Per-stage timing callback (see `AnalysisPipeline`)
+
+    Returns:
+        Configured pipeline
+    """
+    return AnalysisPipeline(
+        [
+            IntentStage(intent_classifier),
+            EntityStage(entity_extractor),
+            BindingStage(entity_extractor),
+        ],
+        observe=observe
+    )
@@ -0,0 +1,80 @@
+"""LRU/TTL cache for chatbot responses."""
+
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+import re
+import time
+
+_PUNCTUATION = re.compile(r"[^\w\s']+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Normalize a user message for cache lookups.
+
+    Lowercases, drops punctuation and collapses whitespace, so
+    "Large coffee!" and "large  coffee" share an entry.
+
+    Args:
+        text: User message
+
+    Returns:
+        Normalized text
+    """
+    text = _PUNCTUATION.sub(" ", text.lower())
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+class ResponseCache:
+    """Size-bounded LRU cache with a per-entry time to live."""
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 3600.0):
+        """Initialize the cache.
+
+        Args:
+            max_entries: Maximum cached responses (0 disables the cache)
+            ttl: Seconds a cached response stays valid
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[str, float]]" = OrderedDict()
+
+    @staticmethod
+    def make_key(user_message: str, context_info: str) -> Tuple[str, str]:
+        """Build a cache key from the user message and formatted context."""
+        return normalize_text(user_message), context_info
+
+    def get(self, key: Tuple[str, str]) -> Optional[str]:
+        """Look up a response, counting the hit or miss."""
+        entry = self._entries.get(key)
+        if entry is None or entry[1] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key: Tuple[str, str], response: str):
+        """Store a response, evicting the least recently used if full."""
+        if self.max_entries <= 0:
+            return
+
+        self._entries[key] = (response, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict:
+        """Report size, hit/miss counters and hit rate."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
@@ -1,8 +1,27 @@
 """GPT-based chatbot for conversational responses."""
 
+import asyncio
 import os
-from typing import List, Dict, Optional
-from openai import OpenAI
+from time import perf_counter
+from typing import AsyncIterator, Hashable, List, Dict, Optional, Set, Tuple, Union
+
+import httpx
+from openai import AsyncOpenAI, OpenAI
+
+from app.menu import MENU_STORE, MenuSnapshot
+from app.metrics import LLM_DEADLINE_MISSES, LLM_ERRORS, LLM_TOKENS
+from app.nlp.admission import AdmissionController, LLMUnavailable
+from app.nlp.cache import ResponseCache
+from app.nlp.history import ConversationHistory, count_tokens
+from app.nlp.singleflight import SingleFlight
+
+# Conversation history, as a ring buffer or OpenAI-format messages
+History = Union[ConversationHistory, List[Dict[str, str]]]
+
+ERROR_RESPONSE = "I'm sorry, I'm having trouble processing that. Could you try again?"
+
+_PROMPT_TOKENS = LLM_TOKENS.labels("prompt")
+_COMPLETION_TOKENS = LLM_TOKENS.labels("completion")
 
 
 class Chatbot:
@@ -12,56 +31,452 @@ class Chatbot:
     but using the base model with custom system prompts.
     """
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        timeout: Optional[float] = None,
+        max_concurrency: Optional[int] = None,
+        cache: Optional[ResponseCache] = None,
+        reply_deadline: Optional[float] = None,
+        admission: Optional[AdmissionController] = None,
+        history_tokens: Optional[int] = None
+    ):
         """Initialize the chatbot.
         
         Args:
             api_key: OpenAI API key (if None, reads from environment)
+            base_url: Completion API base URL (if None, reads OPENAI_BASE_URL)
+            timeout: Per-call deadline in seconds (if None, reads LLM_TIMEOUT)
+            max_concurrency: Maximum in-flight async completions
+                (if None, reads LLM_MAX_CONCURRENCY)
+            cache: Response cache (if None, sized by LLM_CACHE_SIZE and
+                LLM_CACHE_TTL)
+            reply_deadline: Seconds a caller of `acomplete` waits before
+                falling back (if None, reads LLM_REPLY_DEADLINE)
+            admission: Admission controller (if None, built from
+                LLM_MAX_CONCURRENCY, LLM_MAX_QUEUE, LLM_QUEUE_TIMEOUT and
+                LLM_BREAKER_*)
+            history_tokens: Token budget for conversation history in each
+                prompt (if None, reads LLM_HISTORY_TOKENS)
         """
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
         if not self.api_key:
             raise ValueError("OpenAI API key not provided")
         
-        self.client = OpenAI(api_key=self.api_key)
+        self.base_url = base_url or os.getenv("OPENAI_BASE_URL") or None
+        self.timeout = timeout or float(os.getenv("LLM_TIMEOUT", "10"))
+        self.max_concurrency = max_concurrency or int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+        self.reply_deadline = reply_deadline or float(os.getenv("LLM_REPLY_DEADLINE", "3"))
+        self.history_tokens = history_tokens or int(os.getenv("LLM_HISTORY_TOKENS", "96"))
+        self.menu_summary_tokens = int(os.getenv("LLM_MENU_SUMMARY_TOKENS", "48"))
+        
+        self.client = OpenAI(api_key=self.api_key, base_url=self.base_url)
+        
+        # Async client shares one pooled keep-alive connection set across
+        # all requests on the event loop
+        self.async_client = AsyncOpenAI(
+            api_key=self.api_key,
+            base_url=self.base_url,
+            timeout=self.timeout,
+            max_retries=0,
+            http_client=httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency,
+                    keepalive_expiry=30.0
+                )
+            )
+        )
+        self.admission = admission or AdmissionController(max_in_flight=self.max_concurrency)
+        # Running completions; they outlive callers that fell back
+        self._pending: Set[asyncio.Task] = set()
+        # Identical prompts in flight at the same time share one call
+        self.single_flight = SingleFlight()
         self.model = "gpt-3.5-turbo"
         
-        self.system_prompt = """You are a friendly AI assistant for a fast food ordering kiosk.
-Your role is to help customers order food and beverages in a natural, conversational way.
-
-Guidelines:
-- Be friendly, warm, and helpful
-- Keep responses concise (1-2 sentences)
-- Confirm orders clearly
-- Suggest items when appropriate
-- Use casual, conversational language
-- When mentioning prices, use format like "That'll be $X.XX"
-- Always be polite and patient
-
-Menu items include: coffee, cappuccino, latte, tea, donuts, bagels, sandwiches, wraps, and more.
-Available sizes: small, medium, large, extra large.
+        self.cache = cache or ResponseCache(
+            max_entries=int(os.getenv("LLM_CACHE_SIZE", "1024")),
+            ttl=float(os.getenv("LLM_CACHE_TTL", "3600"))
+        )
+        
+        # Sent with every call, so kept short; the menu summary is appended
+        self.system_prompt = """You are a friendly fast food kiosk assistant helping customers order food and drinks.
+- Be warm, polite, patient and casual
+- Reply in 1-2 sentences
+- Confirm orders clearly; suggest items when it fits
+- Quote prices like "That'll be $X.XX"
 """
+        # (menu version, system message, its tokens), rebuilt when the menu changes
+        self._system: Optional[Tuple[str, str, int]] = None
     
     def generate_response(
         self,
         user_message: str,
-        conversation_history: Optional[List[Dict[str, str]]] = None,
-        context: Optional[Dict] = None
+        conversation_history: Optional[History] = None,
+        context: Optional[Dict] = None,
+        use_cache: bool = True
     ) -> str:
         """Generate a conversational response.
         
+        Blocks the calling thread; use `agenerate_response` from async code.
+        
         Args:
             user_message: Current user message
             conversation_history: Previous messages in the conversation
             context: Additional context (intent, entities, price, etc.)
+            use_cache: Serve and store the reply in the response cache;
+                disable for turns whose reply depends on history
             
         Returns:
             Generated response text
         """
-        messages = [{"role": "system", "content": self.system_prompt}]
+        cache_key = self._cache_key(user_message, context) if use_cache else None
+        if cache_key:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        messages = self._build_messages(user_message, conversation_history, context)
+        return self.single_flight.call(
+            self._prompt_key(messages),
+            lambda: self._generate(messages, cache_key)
+        )
+    
+    def _generate(self, messages: List[Dict[str, str]], cache_key: Optional[str]) -> str:
+        """Run one blocking completion, or return the error response."""
+        try:
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=0.7,
+                max_tokens=150,
+                timeout=self.timeout
+            )
+            self._count_usage(response)
+            
+            response_text = response.choices[0].message.content.strip()
+            if cache_key:
+                self.cache.put(cache_key, response_text)
+            return response_text
+        
+        except Exception as e:
+            LLM_ERRORS.inc()
+            print(f"Error generating response: {e}")
+            return ERROR_RESPONSE
+    
+    async def agenerate_response(
+        self,
+        user_message: str,
+        conversation_history: Optional[History] = None,
+        context: Optional[Dict] = None,
+        timeout: Optional[float] = None,
+        use_cache: bool = True
+    ) -> str:
+        """Generate a conversational response without blocking the event loop.
         
-        # Add conversation history
+        Like `acomplete`, but returns the error response instead of raising.
+        
+        Args:
+            user_message: Current user message
+            conversation_history: Previous messages in the conversation
+            context: Additional context (intent, entities, price, etc.)
+            timeout: Deadline in seconds (defaults to the chatbot timeout)
+            use_cache: Serve and store the reply in the response cache;
+                disable for turns whose reply depends on history
+            
+        Returns:
+            Generated response text
+        """
+        try:
+            return await self.acomplete(
+                user_message,
+                conversation_history,
+                context,
+                deadline=timeout or self.timeout,
+                use_cache=use_cache
+            )
+        except LLMUnavailable:
+            return ERROR_RESPONSE
+    
+    async def acomplete(
+        self,
+        user_message: str,
+        conversation_history: Optional[History] = None,
+        context: Optional[Dict] = None,
+        deadline: Optional[float] = None,
+        use_cache: bool = True
+    ) -> str:
+        """Generate a response through admission control, or raise.
+        
+        The call is admitted by `admission` (bounded in-flight calls and
+        queue, circuit breaker). If no reply arrives within the deadline the
+        caller gets `LLMUnavailable("deadline")` right away, while the
+        completion keeps running, up to the chatbot timeout, so its reply
+        still lands in the cache for the next identical turn. Callers with
+        the same prompt at the same time share one completion.
+        
+        Args:
+            user_message: Current user message
+            conversation_history: Previous messages in the conversation
+            context: Additional context (intent, entities, price, etc.)
+            deadline: Seconds to wait for the reply, including any queueing
+                (defaults to the reply deadline)
+            use_cache: Serve and store the reply in the response cache;
+                disable for turns whose reply depends on history
+            
+        Returns:
+            Generated response text
+            
+        Raises:
+            LLMUnavailable: If the call was shed, failed or missed the deadline
+        """
+        cache_key = self._cache_key(user_message, context) if use_cache else None
+        if cache_key:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        messages = self._build_messages(user_message, conversation_history, context)
+        task, joined = self.single_flight.task(
+            self._prompt_key(messages),
+            lambda: self._admitted_completion(messages, cache_key)
+        )
+        if not joined:
+            self._pending.add(task)
+            task.add_done_callback(self._completion_done)
+        
+        # Shielded: a caller that gives up must not cancel a shared completion
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), timeout=deadline or self.reply_deadline)
+        except asyncio.TimeoutError:
+            LLM_DEADLINE_MISSES.inc()
+            raise LLMUnavailable("deadline")
+    
+    def _completion_done(self, task: asyncio.Task):
+        """Forget a finished completion, including ones nobody waits for."""
+        self._pending.discard(task)
+        if not task.cancelled():
+            task.exception()
+    
+    async def _admitted_completion(
+        self,
+        messages: List[Dict[str, str]],
+        cache_key: Optional[str]
+    ) -> str:
+        """Run one completion in an admission slot and report its outcome."""
+        async with self.admission.slot() as ticket:
+            start = perf_counter()
+            ok = False
+            try:
+                response_text = await asyncio.wait_for(
+                    self._complete(messages),
+                    timeout=self.timeout
+                )
+                ok = True
+            except Exception as e:
+                LLM_ERRORS.inc()
+                print(f"Error generating response: {e!r}")
+                raise LLMUnavailable("error", repr(e))
+            finally:
+                self.admission.record(ticket, ok, perf_counter() - start)
+        
+        if cache_key:
+            self.cache.put(cache_key, response_text)
+        return response_text
+    
+    async def _complete(self, messages: List[Dict[str, str]]) -> str:
+        """Run one completion."""
+        response = await self.async_client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=0.7,
+            max_tokens=150
+        )
+        self._count_usage(response)
+        
+        return response.choices[0].message.content.strip()
+    
+    async def astream_reply(
+        self,
+        user_message: str,
+        conversation_history: Optional[History] = None,
+        context: Optional[Dict] = None,
+        first_token_deadline: Optional[float] = None,
+        use_cache: bool = True
+    ) -> AsyncIterator[str]:
+        """Stream a response through admission control, or raise.
+        
+        The first fragment must arrive within `first_token_deadline`
+        (including any queueing); after that, each chunk may take up to the
+        chatbot timeout, so a slow consumer never trips it. Failures after
+        the first fragment end the stream early instead of raising.
+        
+        Args:
+            user_message: Current user message
+            conversation_history: Previous messages in the conversation
+            context: Additional context (intent, entities, price, etc.)
+            first_token_deadline: Seconds to wait for the first fragment
+                (defaults to the reply deadline)
+            use_cache: Serve and store the reply in the response cache;
+                disable for turns whose reply depends on history
+            
+        Yields:
+            Response text fragments in generation order (a cached reply
+            arrives as a single fragment)
+            
+        Raises:
+            LLMUnavailable: If the call was shed, or failed or missed the
+                deadline before producing anything
+        """
+        cache_key = self._cache_key(user_message, context) if use_cache else None
+        if cache_key:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                yield cached
+                return
+        
+        messages = self._build_messages(user_message, conversation_history, context)
+        first_by = asyncio.get_running_loop().time() + (first_token_deadline or self.reply_deadline)
+        # Callers with the same prompt at the same time share one stream,
+        # bound by the first caller's deadline
+        fragments = self.single_flight.stream(
+            self._prompt_key(messages, stream=True),
+            lambda: self._stream_completion(messages, cache_key, first_by)
+        )
+        try:
+            async for delta in fragments:
+                yield delta
+        except LLMUnavailable as e:
+            if e.reason == "deadline":
+                LLM_DEADLINE_MISSES.inc()
+            raise
+        finally:
+            await fragments.aclose()
+    
+    async def _stream_completion(
+        self,
+        messages: List[Dict[str, str]],
+        cache_key: Optional[str],
+        first_by: float
+    ) -> AsyncIterator[str]:
+        """Stream one completion in an admission slot and report its outcome.
+        
+        Raises:
+            LLMUnavailable: If the call was shed, or failed or missed
+                `first_by` (event loop time) before producing anything
+        """
+        loop = asyncio.get_running_loop()
+        produced = False
+        parts = []
+        
+        async def before_first(awaitable):
+            """Await within the first-token deadline, then the per-chunk timeout."""
+            timeout = self.timeout if produced else max(0.0, first_by - loop.time())
+            try:
+                return await asyncio.wait_for(awaitable, timeout=timeout)
+            except asyncio.TimeoutError:
+                if produced:
+                    raise
+                raise LLMUnavailable("deadline")
+        
+        async with self.admission.slot(timeout=max(0.0, first_by - loop.time())) as ticket:
+            start = perf_counter()
+            ok = False
+            try:
+                stream = await before_first(
+                    self.async_client.chat.completions.create(
+                        model=self.model,
+                        messages=messages,
+                        temperature=0.7,
+                        max_tokens=150,
+                        stream=True
+                    )
+                )
+                try:
+                    chunks = stream.__aiter__()
+                    while True:
+                        try:
+                            chunk = await before_first(chunks.__anext__())
+                        except StopAsyncIteration:
+                            break
+                        
+                        delta = chunk.choices[0].delta.content if chunk.choices else None
+                        if delta:
+                            # Drop leading whitespace so the joined text matches
+                            # the stripped non-streaming reply
+                            if not produced:
+                                delta = delta.lstrip()
+                                if not delta:
+                                    continue
+                            produced = True
+                            parts.append(delta)
+                            yield delta
+                finally:
+                    await stream.close()
+                ok = True
+            
+            except LLMUnavailable:
+                raise
+            except Exception as e:
+                LLM_ERRORS.inc()
+                print(f"Error streaming response: {e!r}")
+                if not produced:
+                    raise LLMUnavailable("error", repr(e))
+            except (GeneratorExit, asyncio.CancelledError):
+                # Every reader went away; that says nothing about the LLM
+                start = None
+                raise
+            finally:
+                if start is not None:
+                    self.admission.record(ticket, ok, perf_counter() - start)
+        
+        # Streamed chunks carry no usage, so count one token per chunk
+        _COMPLETION_TOKENS.inc(len(parts))
+        if ok and cache_key and parts:
+            self.cache.put(cache_key, "".join(parts).strip())
+    
+    @staticmethod
+    def _count_usage(response):
+        """Add a completion's token usage to the LLM token counters."""
+        if response.usage:
+            _PROMPT_TOKENS.inc(response.usage.prompt_tokens)
+            _COMPLETION_TOKENS.inc(response.usage.completion_tokens)
+    
+    def _prompt_key(self, messages: List[Dict[str, str]], stream: bool = False) -> Hashable:
+        """Identity of a completion request, for single-flight coalescing."""
+        return (self.model, stream, tuple((m["role"], m["content"]) for m in messages))
+    
+    async def aclose(self):
+        """Cancel completions nobody waits for and close the pooled connections."""
+        for task in list(self._pending):
+            task.cancel()
+        self.single_flight.cancel()
+        await self.async_client.close()
+    
+    def _build_messages(
+        self,
+        user_message: str,
+        conversation_history: Optional[History] = None,
+        context: Optional[Dict] = None
+    ) -> List[Dict[str, str]]:
+        """Assemble the chat completion message list.
+        
+        Args:
+            user_message: Current user message
+            conversation_history: Previous messages in the conversation
+            context: Additional context (intent, entities, price, etc.)
+            
+        Returns:
+            Messages in OpenAI chat format
+        """
+        system_message, _ = self.system_message()
+        messages = [{"role": "system", "content": system_message}]
+        
+        # Add the newest history that fits the token budget
         if conversation_history:
-            messages.extend(conversation_history[-6:])  # Last 3 exchanges
+            messages.extend(self._history_messages(conversation_history))
         
         # Add context information to system message if provided
         if context:
@@ -75,19 +490,63 @@ Available sizes: small, medium, large, extra large.
         # Add current user message
         messages.append({"role": "user", "content": user_message})
         
-        try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=0.7,
-                max_tokens=150
-            )
+        return messages
+    
+    def system_message(self, menu: Optional[MenuSnapshot] = None) -> Tuple[str, int]:
+        """The system prompt with the menu summary, and its token count.
+        
+        Built and counted once per menu version.
+        
+        Args:
+            menu: Menu snapshot (defaults to the current menu)
             
-            return response.choices[0].message.content.strip()
+        Returns:
+            Tuple of (system message, tokens)
+        """
+        menu = menu or MENU_STORE.current
+        cached = self._system
+        if cached is None or cached[0] != menu.version:
+            content = self.system_prompt + "\n" + self._menu_summary(menu)
+            cached = self._system = (menu.version, content, count_tokens(content))
+        return cached[1], cached[2]
+    
+    def _menu_summary(self, menu: MenuSnapshot) -> str:
+        """List menu items and sizes, within the menu summary token budget."""
+        addons = set(menu.menu.get("addons", ()))
+        sizes = "Available sizes: " + ", ".join(menu.menu["size_multiplier"]) + "."
         
-        except Exception as e:
-            print(f"Error generating response: {e}")
-            return "I'm sorry, I'm having trouble processing that. Could you try again?"
+        budget = self.menu_summary_tokens - count_tokens(sizes)
+        items = []
+        for item in menu.menu["prices"]:
+            if item in addons:
+                continue
+            cost = count_tokens(item) + 1
+            if cost > budget:
+                items.append("and more")
+                break
+            items.append(item)
+            budget -= cost
+        return f"Menu items include: {', '.join(items)}.\n{sizes}\n"
+    
+    def _history_messages(self, conversation_history: History) -> List[Dict[str, str]]:
+        """Newest history messages that fit `history_tokens`, oldest first."""
+        if not isinstance(conversation_history, ConversationHistory):
+            conversation_history = ConversationHistory(
+                max(len(conversation_history), 1),
+                [(m["role"], m["content"], count_tokens(m["content"])) for m in conversation_history]
+            )
+        return conversation_history.within_budget(self.history_tokens)
+    
+    def _cache_key(self, user_message: str, context: Optional[Dict]):
+        """Key a reply on the normalized message and the formatted context.
+        
+        The context carries intent, mentioned items and the exact order
+        total, so a cached reply never quotes a different price.
+        """
+        if self.cache.max_entries <= 0:
+            return None
+        context_info = self._format_context(context) if context else ""
+        return ResponseCache.make_key(user_message, context_info)
     
     def _format_context(self, context: Dict) -> str:
         """Format context information for the system message.
@@ -1,8 +1,18 @@
 """Named Entity Recognition for menu items and attributes."""
 
-from typing import List, Tuple, Dict
-import re
-from app.menu import MENU
+from typing import Iterable, List, Tuple, Dict, Optional
+from app.menu import MENU_STORE, MenuSnapshot, validate_menu
+from app.nlp.analysis import OrderLine, TextAnalysis
+from app.nlp.matcher import QUANTITY_WORDS, Match
+
+# Common words never fuzzy-matched to menu items (e.g. "late" -> "latte")
+FUZZY_STOPWORDS = frozenset({
+    "also", "another", "anything", "else", "from", "good", "have", "here",
+    "just", "late", "like", "make", "more", "much", "need", "please",
+    "some", "sure", "take", "than", "thank", "thanks", "that", "then",
+    "there", "this", "today", "want", "what", "when", "which", "with",
+    "would", "your",
+})
 
 
 class EntityExtractor:
@@ -12,99 +22,306 @@ class EntityExtractor:
     but for MVP we use pattern matching and menu lookup.
     """
     
-    def __init__(self):
-        self.sizes = list(MENU["size_multiplier"].keys())
-        self.menu_items = list(MENU["prices"].keys())
-        
-        # Common quantity patterns
-        self.quantity_patterns = [
-            (r"\b(\d+)\b", lambda m: int(m.group(1))),
-            (r"\b(a|an|one)\b", lambda m: 1),
-            (r"\btwo\b", lambda m: 2),
-            (r"\bthree\b", lambda m: 3),
-            (r"\bfour\b", lambda m: 4),
-            (r"\bfive\b", lambda m: 5),
-        ]
-    
-    def extract(self, text: str) -> List[Dict[str, str]]:
+    def __init__(self, menu: Optional[Dict] = None, fuzzy: bool = True):
+        """Initialize the extractor.
+        
+        Args:
+            menu: Fixed menu definition (if None, follows the live menu in
+                MENU_STORE, including reloads)
+            fuzzy: Fall back to typo-tolerant matching when no item
+                matches exactly
+        """
+        self.fuzzy = fuzzy
+        self.quantity_words = QUANTITY_WORDS
+        self._snapshot = None
+        if menu is not None:
+            self.rebuild(menu)
+    
+    def rebuild(self, menu: Dict):
+        """Pin the extractor to a menu, building its matcher and indexes.
+        
+        Args:
+            menu: Menu definition with "prices" and "size_multiplier"
+        """
+        validate_menu(menu)
+        self._snapshot = MenuSnapshot(menu)
+    
+    @property
+    def snapshot(self) -> MenuSnapshot:
+        """The menu snapshot used when extract() is not given one."""
+        return self._snapshot or MENU_STORE.current
+    
+    def extract(self, text: str, menu: Optional[MenuSnapshot] = None) -> List[Dict[str, str]]:
         """Extract entities from text.
         
         Args:
             text: User's message
+            menu: Snapshot to match against (defaults to `snapshot`)
             
         Returns:
-            List of entities with their types
+            List of entities (see `extract_analysis`)
         """
-        entities = []
-        text_lower = text.lower()
-        
-        # Extract sizes
-        for size in self.sizes:
-            if size in text_lower:
-                entities.append({
-                    "value": size,
-                    "type": "size"
-                })
+        return self.extract_analysis(TextAnalysis(text, menu or self.snapshot))
+    
+    def extract_analysis(self, analysis: TextAnalysis) -> List[Dict[str, str]]:
+        """Extract entities from an already tokenized message.
         
-        # Extract menu items (longest match first to handle multi-word items)
-        sorted_items = sorted(self.menu_items, key=len, reverse=True)
-        found_items = set()
-        
-        for item in sorted_items:
-            # Use word boundaries for better matching
-            pattern = r"\b" + re.escape(item) + r"\b"
-            if re.search(pattern, text_lower) and item not in found_items:
-                found_items.add(item)
-                
-                # Determine if it's a beverage or food
-                entity_type = "beverage" if self._is_beverage(item) else "food"
-                
-                entities.append({
-                    "value": item,
-                    "type": entity_type
+        Sizes and items are matched longest-first in one pass over the
+        message's tokens and reported in text order with their character
+        offsets. If no item other than an add-on matched exactly, the words
+        left unmatched are looked up in the fuzzy index, so misspellings
+        like "capuccino" still resolve (such items carry a "distance");
+        messages that name an item skip the index, which costs several
+        times the exact pass. Each value is reported once; every occurrence
+        is kept on `analysis.matches` (exact) and `analysis.fuzzy` for
+        binding.
+        
+        Args:
+            analysis: Tokenized message; its menu (or `snapshot`) is
+                matched against
+            
+        Returns:
+            List of entities with their types (sizes, then items, then
+            at most one quantity)
+        """
+        menu = analysis.menu or self.snapshot
+        sizes = []
+        items = []
+        seen = set()
+        matches = menu.matcher.find(analysis.lower, analysis.tokens)
+        analysis.matches = matches
+        
+        for match in matches:
+            if match.value in seen:
+                continue
+            seen.add(match.value)
+            
+            entity = {
+                "value": match.value,
+                "type": match.type,
+                "start": match.start,
+                "end": match.end
+            }
+            if match.type == "size":
+                sizes.append(entity)
+            else:
+                items.append(entity)
+        
+        free = self._free_tokens(analysis)
+        if self.fuzzy and all(e["type"] == "addon" for e in items):
+            words = [span for i, span in free.items() if i not in analysis.numbers]
+            analysis.fuzzy = self._fuzzy_items(menu, analysis.lower, words)
+            for match, distance in analysis.fuzzy:
+                if match.value in seen:
+                    continue
+                seen.add(match.value)
+                items.append({
+                    "value": match.value,
+                    "type": match.type,
+                    "start": match.start,
+                    "end": match.end,
+                    "distance": distance
                 })
+            items.sort(key=lambda e: e["start"])
+        
+        # Bare numbers win over quantity words, then the lowest priority
+        quantity = None
+        for i in analysis.numbers:
+            if i not in free:
+                continue
+            token, start, end = analysis.tokens[i]
+            priority = 0 if token.isdecimal() else self.quantity_words[token][0]
+            if quantity is None or priority < quantity[0]:
+                quantity = (priority, analysis.numbers[i], start, end)
         
-        # Extract quantities
-        for pattern, converter in self.quantity_patterns:
-            match = re.search(pattern, text_lower)
-            if match:
-                try:
-                    qty = converter(match)
-                    entities.append({
-                        "value": str(qty),
-                        "type": "quantity"
-                    })
-                    break  # Only take first quantity match
-                except:
-                    pass
+        entities = sizes + items
+        if quantity is not None:
+            _, value, start, end = quantity
+            entities.append({
+                "value": str(value),
+                "type": "quantity",
+                "start": start,
+                "end": end
+            })
         
         return entities
     
-    def _is_beverage(self, item: str) -> bool:
-        """Check if an item is a beverage."""
-        beverages = [
-            "coffee", "cappuccino", "iced coffee", "iced capp", "latte",
-            "tea", "hot chocolate", "french vanilla", "white chocolate",
-            "mocha", "espresso", "americano", "double double", "triple triple"
-        ]
-        return any(bev in item.lower() for bev in beverages)
+    def extract_many(
+        self,
+        texts: Iterable[str],
+        menu: Optional[MenuSnapshot] = None
+    ) -> List[List[Dict[str, str]]]:
+        """Extract entities from a batch of messages against one menu snapshot.
+        
+        Args:
+            texts: User messages
+            menu: Snapshot to match against (defaults to `snapshot`)
+            
+        Returns:
+            Entities for each message, in input order
+        """
+        menu = menu or self.snapshot
+        extract = self.extract
+        return [extract(text, menu) for text in texts]
+    
+    def _free_tokens(self, analysis: TextAnalysis) -> Dict[int, Tuple[int, int]]:
+        """Token index -> span for tokens no exact match covers."""
+        # Tokens and matches are both in text order: merge them in one walk
+        free = {}
+        matches = analysis.matches
+        j = 0
+        for i, (_, start, end) in enumerate(analysis.tokens):
+            while j < len(matches) and matches[j].end <= start:
+                j += 1
+            if j == len(matches) or start < matches[j].start:
+                free[i] = (start, end)
+        return free
+    
+    def _fuzzy_items(
+        self,
+        menu: MenuSnapshot,
+        text: str,
+        tokens: List[Tuple[int, int]]
+    ) -> List[Tuple[Match, int]]:
+        """Fuzzy-match word pairs, then single words, not matched exactly.
+        
+        Args:
+            menu: Snapshot whose search index is used
+            text: Lowercased message
+            tokens: Spans of the words not matched exactly (nor numbers)
+            
+        Returns:
+            (item match, edit distance) for every item found, in text order
+        """
+        found = []
+        i = 0
+        
+        while i < len(tokens):
+            start, end = tokens[i]
+            span = None
+            
+            # Two adjacent words first, for multi-word items like "ice capp"
+            if i + 1 < len(tokens) and tokens[i + 1][0] == end + 1 and text[end] == " ":
+                candidates = menu.search_index.search(text[start:tokens[i + 1][1]], limit=1)
+                if candidates:
+                    span = (start, tokens[i + 1][1], 2)
+            
+            if span is None:
+                word = text[start:end]
+                if len(word) >= 4 and word not in FUZZY_STOPWORDS:
+                    candidates = menu.search_index.search(word, limit=1)
+                    if candidates:
+                        span = (start, end, 1)
+            
+            if span is None:
+                i += 1
+                continue
+            
+            item, distance = candidates[0]
+            found.append((Match(item, menu.item_types[item], span[0], span[1]), distance))
+            i += span[2]
+        
+        return found
+    
+    def bind(self, analysis: TextAnalysis) -> List[OrderLine]:
+        """Bind sizes, quantities and add-ons to the items they describe.
+        
+        Run after `extract_analysis`. Every occurrence counts, not just the
+        entities reported: each number or quantity word left free by the
+        matcher, and each mention of an item, so "a large coffee and a
+        small coffee" gives two lines. Add-ons go with the item before
+        them, so "two lattes with an extra shot" is one line of two lattes
+        that each have a shot.
+        
+        Args:
+            analysis: Message with its entities extracted
+            
+        Returns:
+            (item, size or None, quantity, add-ons) for each item, in text
+            order
+        """
+        free = self._free_tokens(analysis)
+        mentions = _mentions(
+            match._asdict() for match in analysis.matches + [m for m, _ in analysis.fuzzy]
+        )
+        mentions.extend(
+            (analysis.tokens[i][1], "quantity", value)
+            for i, value in analysis.numbers.items() if i in free
+        )
+        return _bind(mentions)
     
     def get_items_and_sizes(self, entities: List[Dict[str, str]]) -> List[Tuple[str, str]]:
         """Pair items with their sizes from entity list.
         
+        A size applies to the next item after it in the text (or, if it
+        follows the last item, to that item when it has no size of its own).
+        
         Args:
             entities: List of extracted entities
             
         Returns:
-            List of (item, size) tuples
+            List of (item, size) tuples, in text order
         """
-        items = [e["value"] for e in entities if e["type"] in ["beverage", "food"]]
-        sizes = [e["value"] for e in entities if e["type"] == "size"]
-        
-        # Pair items with sizes (if multiple items, use sizes in order)
-        paired = []
-        for i, item in enumerate(items):
-            size = sizes[i] if i < len(sizes) else None
-            paired.append((item, size))
+        return [(item, size) for item, size, _, _ in _bind(_mentions(entities))]
+
+
+def _mentions(entities: Iterable[Dict[str, str]]) -> List[Tuple[int, str, object]]:
+    """(start, kind, value) for the sizes, add-ons and items in an entity list."""
+    mentions = []
+    for e in entities:
+        if e["type"] in ("size", "addon"):
+            mentions.append((e["start"], e["type"], e["value"]))
+        elif e["type"] in ("beverage", "food"):
+            mentions.append((e["start"], "item", e["value"]))
+    return mentions
+
+
+def _bind(mentions: List[Tuple[int, str, object]]) -> List[OrderLine]:
+    """Attach each size and quantity to the following item, by position.
+    
+    An add-on belongs to the item before it (or the next one, if it comes
+    first) and takes a quantity stated right before it ("two extra shots")
+    as its count per unit. Add-ons in a message with no item are lines of
+    their own.
+    
+    Args:
+        mentions: (start offset, "item" | "size" | "quantity" | "addon", value)
         
-        return paired
+    Returns:
+        (item, size or None, quantity, add-ons) lines; quantity defaults
+        to 1
+    """
+    lines = []
+    size = None
+    quantity = None
+    addons = []
+    for _, kind, value in sorted(mentions, key=lambda m: m[0]):
+        if kind == "item":
+            lines.append([value, size, quantity, addons])
+            size = quantity = None
+            addons = []
+        elif kind == "addon":
+            target = lines[-1][3] if lines else addons
+            target.extend([value] * (quantity or 1))
+            quantity = None
+        elif kind == "size":
+            size = value
+        else:
+            quantity = value
+    
+    if not lines:
+        counts = {}
+        for addon in addons:
+            counts[addon] = counts.get(addon, 0) + 1
+        return [(addon, size, count, ()) for addon, count in counts.items()]
+    
+    # Trailing modifiers ("a coffee, large") describe the last item
+    if size is not None and lines[-1][1] is None:
+        lines[-1][1] = size
+    if quantity is not None and lines[-1][2] is None:
+        lines[-1][2] = quantity
+    
+    return [
+        (item, size, quantity or 1, tuple(addons))
+        for item, size, quantity, addons in lines
+    ]
@@ -0,0 +1,176 @@
+"""Conversation history for LLM prompts: a fixed-capacity ring buffer of turns.
+
+Each entry keeps its role, text and token count, counted once when the turn
+is recorded. Prompts take the newest entries that fit a token budget, so
+neither recording a turn nor trimming history ever re-counts or copies
+older entries.
+"""
+
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+import re
+import sys
+
+try:
+    import tiktoken
+except ImportError:  # Optional: exact counts for OpenAI models
+    tiktoken = None
+
+USER = "user"
+ASSISTANT = "assistant"
+
+# Word pieces and punctuation; English text averages about one GPT token each
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+# Extra token per this many characters of a long word
+_LONG_WORD_CHARS = 8
+
+# Tokens a chat message costs beyond its text (role and separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """Count the tokens of `text` for the chat model.
+
+    Uses tiktoken's cl100k_base encoding when tiktoken is installed, and a
+    word/punctuation estimate otherwise.
+    """
+    global _encoding
+    if tiktoken is not None:
+        if _encoding is None:
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        return len(_encoding.encode(text))
+    return sum(1 + len(piece) // _LONG_WORD_CHARS for piece in _TOKEN_RE.findall(text))
+
+
+class HistoryEntry(NamedTuple):
+    """One message of the conversation."""
+    role: str
+    text: str
+    tokens: int
+
+
+class ConversationHistory:
+    """The last `capacity` messages of a conversation, oldest first.
+
+    Appending is O(1): once full, the newest entry overwrites the oldest.
+    """
+
+    __slots__ = ("capacity", "_entries", "_start", "_size")
+
+    def __init__(self, capacity: int = 20, entries: Sequence[Tuple[str, str, int]] = ()):
+        """Initialize the buffer.
+
+        Args:
+            capacity: Maximum entries kept
+            entries: Initial (role, text, tokens) entries, oldest first;
+                only the last `capacity` are kept
+        """
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self._entries: List[Optional[HistoryEntry]] = [None] * capacity
+        self._start = 0
+        self._size = 0
+        for role, text, tokens in entries:
+            self._push(HistoryEntry(role, text, tokens))
+
+    def append(self, role: str, text: str, tokens: Optional[int] = None) -> HistoryEntry:
+        """Record a message, counting its tokens unless given."""
+        entry = HistoryEntry(role, text, count_tokens(text) if tokens is None else tokens)
+        self._push(entry)
+        return entry
+
+    def add_exchange(self, user_message: str, reply: str):
+        """Record a user message and the reply to it."""
+        self.append(USER, user_message)
+        self.append(ASSISTANT, reply)
+
+    def _push(self, entry: HistoryEntry):
+        if self._size < self.capacity:
+            self._entries[(self._start + self._size) % self.capacity] = entry
+            self._size += 1
+        else:
+            self._entries[self._start] = entry
+            self._start = (self._start + 1) % self.capacity
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[HistoryEntry]:
+        for i in range(self._size):
+            yield self._entries[(self._start + i) % self.capacity]
+
+    def newest(self) -> Iterator[HistoryEntry]:
+        """Iterate entries from the newest back."""
+        for i in range(self._size - 1, -1, -1):
+            yield self._entries[(self._start + i) % self.capacity]
+
+    def within_budget(self, max_tokens: int) -> List[Dict[str, str]]:
+        """The newest messages whose tokens fit `max_tokens`, oldest first.
+
+        Each message is charged its text plus MESSAGE_OVERHEAD_TOKENS. The
+        result never starts with an assistant reply whose user message was
+        cut off.
+
+        Args:
+            max_tokens: Token budget for the history
+
+        Returns:
+            Messages in OpenAI chat format
+        """
+        selected = []
+        used = 0
+        for entry in self.newest():
+            used += entry.tokens + MESSAGE_OVERHEAD_TOKENS
+            if used > max_tokens:
+                break
+            selected.append(entry)
+        while selected and selected[-1].role == ASSISTANT:
+            selected.pop()
+        return [{"role": entry.role, "content": entry.text} for entry in reversed(selected)]
+
+    def resize(self, capacity: int):
+        """Change the capacity, dropping the oldest entries if it shrinks."""
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        if capacity != self.capacity:
+            entries = list(self)[-capacity:]
+            self.capacity = capacity
+            self._entries = entries + [None] * (capacity - len(entries))
+            self._start = 0
+            self._size = len(entries)
+
+    def nbytes(self) -> int:
+        """Approximate memory held by the buffer and its entries."""
+        return sys.getsizeof(self._entries) + sum(
+            sys.getsizeof(entry) + sys.getsizeof(entry.text) for entry in self
+        )
+
+    def to_list(self) -> List[List]:
+        """Entries as [role, text, tokens] lists, oldest first, for JSON."""
+        return [list(entry) for entry in self]
+
+    @classmethod
+    def from_list(cls, entries: Sequence, capacity: Optional[int] = None) -> "ConversationHistory":
+        """Rebuild a buffer from `to_list` output.
+
+        A list of plain strings (the format sessions were stored in before
+        roles were recorded) is read as alternating user and assistant
+        messages, since they were always appended and trimmed in pairs.
+        """
+        parsed = []
+        for i, entry in enumerate(entries):
+            if isinstance(entry, str):
+                parsed.append((USER if i % 2 == 0 else ASSISTANT, entry, count_tokens(entry)))
+            else:
+                role, text, tokens = entry
+                parsed.append((role, text, int(tokens)))
+        return cls(capacity or max(len(parsed), 1), parsed)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, ConversationHistory) and list(self) == list(other)
+
+    def __repr__(self) -> str:
+        return f"ConversationHistory(capacity={self.capacity}, size={self._size})"
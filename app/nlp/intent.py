@@ -1,6 +1,7 @@
 """Intent classification logic."""
 
-from typing import Dict, List
+from typing import Dict, Iterable, List, Tuple
+import os
 import re
 
 
@@ -8,7 +9,8 @@ class IntentClassifier:
     """Simple rule-based intent classifier.
     
     In production, this would use a trained BERT model like in the parent repo,
-    but for MVP we use pattern matching.
+    but for MVP we use pattern matching. A learned linear model with the same
+    interface lives in `app.nlp.intent_model` (see `create_intent_classifier`).
     """
     
     def __init__(self):
@@ -37,34 +39,118 @@ class IntentClassifier:
                 r"\b(bye|goodbye|see you|thanks|thank you)\b",
             ],
         }
+        self._compile()
     
-    def classify(self, text: str) -> str:
-        """Classify the intent of the user's message.
+    def _compile(self):
+        """Compile all patterns into one combined matcher.
+        
+        Each pattern becomes an optional lookahead anchored at the start of
+        the text, so a single match() call searches for every pattern and
+        the named groups that participated say which ones were found. Only
+        the lookahead prefix crosses newlines; the patterns keep the flags
+        (and so the `.` semantics) they have under a plain re.search().
+        """
+        self._pattern_intents = []
+        lookaheads = []
+        
+        for intent, patterns in self.intent_patterns.items():
+            for pattern in patterns:
+                group = f"p{len(self._pattern_intents)}"
+                self._pattern_intents.append((group, intent))
+                lookaheads.append(f"(?=(?:[\\s\\S]*?(?P<{group}>{pattern}))?)")
+        
+        self._matcher = re.compile("".join(lookaheads))
+        self._pattern_counts = {
+            intent: len(patterns) for intent, patterns in self.intent_patterns.items()
+        }
+    
+    def score(self, text: str) -> Dict[str, int]:
+        """Count matching patterns per intent in a single pass.
         
         Args:
             text: User's message
             
         Returns:
-            Intent label (greeting, order, question, etc.)
+            Mapping of intent to number of matching patterns
         """
-        text = text.lower()
+        return self._score_lower(text.lower())
+    
+    def score_analysis(self, analysis) -> Dict[str, int]:
+        """Score a message already normalized by the analysis pipeline.
         
-        # Score each intent
+        Args:
+            analysis: `app.nlp.analysis.TextAnalysis` of the message
+            
+        Returns:
+            Mapping of intent to number of matching patterns
+        """
+        return self._score_lower(analysis.lower)
+    
+    def _score_lower(self, text: str) -> Dict[str, int]:
+        match = self._matcher.match(text)
         scores = {intent: 0 for intent in self.intent_patterns}
         
-        for intent, patterns in self.intent_patterns.items():
-            for pattern in patterns:
-                if re.search(pattern, text, re.IGNORECASE):
-                    scores[intent] += 1
+        for group, intent in self._pattern_intents:
+            if match.group(group) is not None:
+                scores[intent] += 1
+        
+        return scores
+    
+    def score_many(self, texts: Iterable[str]) -> List[Dict[str, int]]:
+        """Score a batch of messages (see `score`)."""
+        score = self.score
+        return [score(text) for text in texts]
+    
+    def predict(self, text: str) -> Tuple[str, float]:
+        """Classify a message and report the winning intent's confidence.
+        
+        Args:
+            text: User's message
+            
+        Returns:
+            Tuple of (intent label, confidence 0-1)
+        """
+        return self.decide(self.score(text))
+    
+    def decide(self, scores: Dict[str, int]) -> Tuple[str, float]:
+        """Pick the winning intent from per-intent pattern counts.
         
-        # Return intent with highest score
+        Args:
+            scores: Output of `score`
+            
+        Returns:
+            Tuple of (intent label, confidence 0-1)
+        """
+        # Highest score wins; ties go to the intent listed first
         max_intent = max(scores, key=scores.get)
         
-        # Default to 'order' if no clear intent and message contains item words
         if scores[max_intent] == 0:
-            return "unknown"
+            return "unknown", 0.0
+        
+        return max_intent, scores[max_intent] / self._pattern_counts[max_intent]
+    
+    def classify(self, text: str) -> str:
+        """Classify the intent of the user's message.
+        
+        Args:
+            text: User's message
+            
+        Returns:
+            Intent label (greeting, order, question, etc.)
+        """
+        return self.predict(text)[0]
+    
+    def classify_many(self, texts: Iterable[str]) -> List[Tuple[str, float]]:
+        """Classify a batch of messages.
         
-        return max_intent
+        Args:
+            texts: User messages
+            
+        Returns:
+            (intent label, confidence) for each message, in input order
+        """
+        predict = self.predict
+        return [predict(text) for text in texts]
     
     def get_confidence(self, text: str, intent: str) -> float:
         """Get confidence score for a specific intent.
@@ -79,12 +165,35 @@ class IntentClassifier:
         if intent not in self.intent_patterns:
             return 0.0
         
-        text = text.lower()
-        matches = 0
-        total_patterns = len(self.intent_patterns[intent])
+        total_patterns = self._pattern_counts[intent]
+        if total_patterns == 0:
+            return 0.0
         
-        for pattern in self.intent_patterns[intent]:
-            if re.search(pattern, text, re.IGNORECASE):
-                matches += 1
+        return self.score(text)[intent] / total_patterns
+
+
+def create_intent_classifier():
+    """Create the intent engine selected by INTENT_ENGINE.
+    
+    "rules" (default) is the pattern classifier; "learned" loads the model
+    at INTENT_MODEL_PATH (default: intent_model.npz), trained with
+    `python -m app.nlp.intent_model train`. If the model cannot be loaded
+    the rules are used instead.
+    
+    Returns:
+        IntentClassifier or LearnedIntentClassifier
+    """
+    engine = os.getenv("INTENT_ENGINE", "rules").lower()
+    if engine == "learned":
+        # NumPy is only imported when the learned engine is selected
+        from app.nlp.intent_model import LearnedIntentClassifier
         
-        return matches / total_patterns if total_patterns > 0 else 0.0
+        path = os.getenv("INTENT_MODEL_PATH", "intent_model.npz")
+        try:
+            return LearnedIntentClassifier.load(path)
+        except (OSError, KeyError, ValueError) as e:
+            print(f"Warning: could not load intent model {path} ({e}); using rules.")
+    elif engine != "rules":
+        raise ValueError(f"Unknown INTENT_ENGINE: {engine}")
+    
+    return IntentClassifier()
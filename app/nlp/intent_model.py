@@ -0,0 +1,363 @@
+"""Learned intent classifier: hashed n-gram TF-IDF features and a linear model.
+
+Training uses scikit-learn; serving needs only NumPy. Features are word
+unigrams and bigrams hashed with CRC32 into a fixed number of buckets, so
+there is no vocabulary to ship, and the trained model is a handful of
+arrays in an .npz file that loads in milliseconds.
+
+    python -m app.nlp.intent_model train --data data/intents.jsonl --out intent_model.npz
+    python -m app.nlp.intent_model evaluate --data data/intents.jsonl --model intent_model.npz
+"""
+
+from typing import Dict, Iterable, List, Sequence, Tuple
+import argparse
+import json
+import random
+import re
+import time
+import zlib
+
+import numpy as np
+
+# Words, numbers and question marks ("?" is a strong question cue)
+_TOKEN = re.compile(r"[a-z0-9']+|\?")
+
+DEFAULT_FEATURES = 2 ** 14
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens plus adjacent-word bigrams."""
+    words = _TOKEN.findall(text.lower())
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def hash_features(
+    texts: Sequence[str],
+    n_features: int
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Hash a batch of texts into sparse term counts.
+
+    Args:
+        texts: Messages
+        n_features: Number of hash buckets
+
+    Returns:
+        CSR arrays (indptr, bucket indices, counts); each row's buckets are
+        unique
+    """
+    indptr = [0]
+    indices: List[int] = []
+    counts: List[int] = []
+    crc32 = zlib.crc32
+
+    for text in texts:
+        row: Dict[int, int] = {}
+        for token in tokenize(text):
+            bucket = crc32(token.encode("utf-8")) % n_features
+            row[bucket] = row.get(bucket, 0) + 1
+        indices.extend(row)
+        counts.extend(row.values())
+        indptr.append(len(indices))
+
+    return (
+        np.asarray(indptr, dtype=np.int64),
+        np.asarray(indices, dtype=np.int64),
+        np.asarray(counts, dtype=np.float32)
+    )
+
+
+def _tfidf(
+    indptr: np.ndarray,
+    indices: np.ndarray,
+    counts: np.ndarray,
+    idf: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Apply sublinear TF, IDF weights and per-row L2 normalisation.
+
+    Returns:
+        (row id of each entry, weighted values)
+    """
+    rows = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+    values = (1.0 + np.log(counts)) * idf[indices]
+    norms = np.sqrt(np.bincount(rows, weights=values * values, minlength=len(indptr) - 1))
+    norms[norms == 0] = 1.0
+    return rows, (values / norms[rows]).astype(np.float32)
+
+
+class LearnedIntentClassifier:
+    """Linear intent model over hashed TF-IDF features.
+
+    Drop-in replacement for `IntentClassifier`: `score` returns class
+    probabilities instead of pattern counts, and `classify_many` scores a
+    whole batch with a few array operations.
+    """
+
+    def __init__(
+        self,
+        labels: Sequence[str],
+        weights: np.ndarray,
+        bias: np.ndarray,
+        idf: np.ndarray
+    ):
+        """Wrap trained parameters.
+
+        Args:
+            labels: Intent label of each class
+            weights: (n_features, n_classes) coefficients
+            bias: (n_classes,) intercepts
+            idf: (n_features,) inverse document frequencies
+        """
+        self.labels = list(labels)
+        self.weights = np.ascontiguousarray(weights, dtype=np.float32)
+        self.bias = np.asarray(bias, dtype=np.float32)
+        self.idf = np.asarray(idf, dtype=np.float32)
+        self.n_features = self.weights.shape[0]
+        self._label_ids = {label: i for i, label in enumerate(self.labels)}
+
+    @classmethod
+    def load(cls, path: str) -> "LearnedIntentClassifier":
+        """Load a model saved by `save`.
+
+        Raises:
+            OSError: If the file cannot be read
+        """
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                [str(label) for label in data["labels"]],
+                data["weights"],
+                data["bias"],
+                data["idf"]
+            )
+
+    def save(self, path: str):
+        """Write the model as an uncompressed .npz (fast to load)."""
+        np.savez(
+            path,
+            labels=np.asarray(self.labels),
+            weights=self.weights,
+            bias=self.bias,
+            idf=self.idf
+        )
+
+    def probabilities(self, texts: Sequence[str]) -> np.ndarray:
+        """Class probabilities for a batch.
+
+        Args:
+            texts: Messages
+
+        Returns:
+            (len(texts), n_classes) array of softmax probabilities
+        """
+        indptr, indices, counts = hash_features(texts, self.n_features)
+        rows, values = _tfidf(indptr, indices, counts, self.idf)
+
+        # Sum each row's weighted feature vectors with one bincount over
+        # (row, class) cells instead of a sparse product per message
+        n_rows, n_classes = len(texts), len(self.labels)
+        contributions = self.weights[indices] * values[:, None]
+        cells = (rows[:, None] * n_classes + np.arange(n_classes)).ravel()
+        logits = np.bincount(
+            cells, weights=contributions.ravel(), minlength=n_rows * n_classes
+        ).reshape(n_rows, n_classes) + self.bias
+
+        logits -= logits.max(axis=1, keepdims=True)
+        exp = np.exp(logits)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def score(self, text: str) -> Dict[str, float]:
+        """Probability of each intent for one message.
+
+        Args:
+            text: User's message
+
+        Returns:
+            Mapping of intent to probability
+        """
+        return dict(zip(self.labels, self.probabilities([text])[0].tolist()))
+
+    def score_analysis(self, analysis) -> Dict[str, float]:
+        """Score a message already normalized by `app.nlp.analysis`.
+
+        The model keeps its own tokens (apostrophes and "?" are features),
+        so only the lowercased text is shared.
+        """
+        return self.score(analysis.lower)
+
+    def score_many(self, texts: Iterable[str]) -> List[Dict[str, float]]:
+        """Intent probabilities for a batch, scored in one vectorized pass."""
+        texts = list(texts)
+        if not texts:
+            return []
+        return [dict(zip(self.labels, row)) for row in self.probabilities(texts).tolist()]
+
+    def decide(self, scores: Dict[str, float]) -> Tuple[str, float]:
+        """Pick the most probable intent.
+
+        Args:
+            scores: Output of `score`
+
+        Returns:
+            Tuple of (intent label, confidence 0-1)
+        """
+        intent = max(scores, key=scores.get)
+        return intent, scores[intent]
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """Classify a message and report the winning intent's confidence."""
+        return self.decide(self.score(text))
+
+    def classify(self, text: str) -> str:
+        """Classify the intent of the user's message."""
+        return self.predict(text)[0]
+
+    def classify_many(self, texts: Iterable[str]) -> List[Tuple[str, float]]:
+        """Classify a batch of messages in one vectorized pass.
+
+        Args:
+            texts: User messages
+
+        Returns:
+            (intent label, confidence) for each message, in input order
+        """
+        texts = list(texts)
+        if not texts:
+            return []
+        probabilities = self.probabilities(texts)
+        best = probabilities.argmax(axis=1)
+        confidence = probabilities[np.arange(len(texts)), best]
+        return [(self.labels[i], float(p)) for i, p in zip(best.tolist(), confidence.tolist())]
+
+    def get_confidence(self, text: str, intent: str) -> float:
+        """Get the probability of a specific intent."""
+        label_id = self._label_ids.get(intent)
+        if label_id is None:
+            return 0.0
+        return float(self.probabilities([text])[0, label_id])
+
+
+def load_examples(path: str) -> List[Tuple[str, str]]:
+    """Read (text, intent) pairs from a JSONL file of {"text", "intent"} rows."""
+    examples = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                examples.append((row["text"], row["intent"]))
+    return examples
+
+
+def train(
+    examples: Sequence[Tuple[str, str]],
+    n_features: int = DEFAULT_FEATURES,
+    c: float = 10.0
+) -> LearnedIntentClassifier:
+    """Fit a multinomial logistic regression on hashed TF-IDF features.
+
+    Args:
+        examples: (text, intent) pairs
+        n_features: Number of hash buckets
+        c: Inverse regularisation strength
+
+    Returns:
+        Trained classifier
+    """
+    from scipy.sparse import csr_matrix
+    from sklearn.linear_model import LogisticRegression
+
+    texts = [text for text, _ in examples]
+    labels = sorted({intent for _, intent in examples})
+    label_ids = {label: i for i, label in enumerate(labels)}
+
+    indptr, indices, counts = hash_features(texts, n_features)
+
+    # Smoothed IDF, as in scikit-learn's TfidfTransformer
+    df = np.bincount(indices, minlength=n_features)
+    idf = (np.log((1 + len(texts)) / (1 + df)) + 1).astype(np.float32)
+
+    _, values = _tfidf(indptr, indices, counts, idf)
+    X = csr_matrix((values, indices, indptr), shape=(len(texts), n_features))
+    y = np.array([label_ids[intent] for _, intent in examples])
+
+    model = LogisticRegression(C=c, max_iter=1000)
+    model.fit(X, y)
+
+    # Binary problems get a single coefficient row; expand to two classes
+    coef, intercept = model.coef_, model.intercept_
+    if len(labels) == 2:
+        coef = np.vstack([-coef, coef]) / 2
+        intercept = np.concatenate([-intercept, intercept]) / 2
+
+    return LearnedIntentClassifier(labels, coef.T, intercept, idf)
+
+
+def _throughput(classify_many, texts: List[str], min_seconds: float = 0.5) -> float:
+    """Messages per second for a batch classifier."""
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        classify_many(texts)
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return calls * len(texts) / elapsed
+
+
+def evaluate(model: LearnedIntentClassifier, examples: Sequence[Tuple[str, str]]):
+    """Print accuracy and throughput of the model next to the rule-based one."""
+    from app.nlp.intent import IntentClassifier
+
+    rules = IntentClassifier()
+    texts = [text for text, _ in examples]
+    gold = [intent for _, intent in examples]
+
+    print(f"{'engine':>8} {'accuracy':>9} {'msg/s single':>13} {'msg/s batch':>12}")
+    for name, engine in (("rules", rules), ("learned", model)):
+        predicted = [label for label, _ in engine.classify_many(texts)]
+        accuracy = sum(p == g for p, g in zip(predicted, gold)) / len(gold)
+        single = _throughput(lambda batch: [engine.predict(t) for t in batch], texts)
+        batch = _throughput(engine.classify_many, texts)
+        print(f"{name:>8} {accuracy:>9.1%} {single:>13,.0f} {batch:>12,.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train or evaluate the learned intent model")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    train_cmd = commands.add_parser("train", help="Fit a model and report held-out accuracy")
+    train_cmd.add_argument("--data", required=True, help="Labeled JSONL ({text, intent} rows)")
+    train_cmd.add_argument("--out", required=True, help="Where to write the .npz model")
+    train_cmd.add_argument("--features", type=int, default=DEFAULT_FEATURES)
+    train_cmd.add_argument("--c", type=float, default=10.0, help="Inverse regularisation strength")
+    train_cmd.add_argument("--holdout", type=float, default=0.2,
+                           help="Fraction held out for evaluation before the final fit")
+    train_cmd.add_argument("--seed", type=int, default=0)
+
+    eval_cmd = commands.add_parser("evaluate", help="Score a saved model on labeled data")
+    eval_cmd.add_argument("--data", required=True)
+    eval_cmd.add_argument("--model", required=True)
+
+    args = parser.parse_args()
+    examples = load_examples(args.data)
+
+    if args.command == "evaluate":
+        start = time.perf_counter()
+        model = LearnedIntentClassifier.load(args.model)
+        print(f"loaded {args.model} in {(time.perf_counter() - start) * 1000:.1f} ms")
+        evaluate(model, examples)
+        return
+
+    if args.holdout > 0:
+        shuffled = list(examples)
+        random.Random(args.seed).shuffle(shuffled)
+        split = int(len(shuffled) * (1 - args.holdout))
+        print(f"held-out evaluation ({len(shuffled) - split} of {len(shuffled)} examples):")
+        evaluate(train(shuffled[:split], args.features, args.c), shuffled[split:])
+
+    # The shipped model is fit on everything
+    model = train(examples, args.features, args.c)
+    model.save(args.out)
+    print(f"wrote {args.out} ({len(model.labels)} intents, {model.n_features} features)")
+
+
+if __name__ == "__main__":
+    main()
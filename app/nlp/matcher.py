@@ -0,0 +1,137 @@
+"""Single-pass phrase matcher for menu items and sizes."""
+
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+import re
+
+# Word tokens; consecutive tokens give the same boundaries as regex \b
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# Quantity words as (priority, value); when several appear in a message,
+# the lowest priority wins and bare numbers (priority 0) beat all of them
+QUANTITY_WORDS = {
+    "a": (1, 1), "an": (1, 1), "one": (1, 1),
+    "two": (2, 2),
+    "three": (3, 3),
+    "four": (4, 4),
+    "five": (5, 5),
+}
+
+# Endings that take "es" rather than "s" in the plural
+_ES_ENDINGS = ("s", "x", "z", "ch", "sh")
+
+# Marks a trie node that ends a phrase (never collides with a token)
+_END = None
+
+
+class Match(NamedTuple):
+    """A phrase found in text, with character offsets into the text."""
+    value: str
+    type: str
+    start: int
+    end: int
+
+
+class PhraseMatcher:
+    """Token trie over menu phrases.
+
+    Built once from a phrase -> type mapping, then finds every phrase in a
+    message with a single left-to-right scan over its word tokens. At each
+    position the longest phrase wins and matching resumes after it, so
+    "chocolate donut" is reported once rather than also as "donut". Words of
+    a multi-word phrase must be separated by exactly one space, as with the
+    literal-phrase regexes this replaces. Regular plurals of every phrase
+    and alias ("lattes", "iced caps") match as the phrase itself, unless
+    the plural is already a phrase of its own. Numbers and quantity words
+    are left to the caller (see `app.nlp.analysis.TextAnalysis`).
+    """
+
+    def __init__(self, phrases: Dict[str, str], aliases: Optional[Dict[str, str]] = None):
+        """Build the trie.
+
+        Args:
+            phrases: Mapping of lowercase phrase to entity type
+            aliases: Mapping of alternative phrase to the phrase it stands
+                for; an alias match is reported as that phrase
+        """
+        self._root: Dict = {}
+        payloads = {phrase: (phrase, entity_type) for phrase, entity_type in phrases.items()}
+        for alias, phrase in (aliases or {}).items():
+            if phrase in phrases:
+                payloads.setdefault(alias, payloads[phrase])
+
+        for phrase, payload in payloads.items():
+            self._insert(phrase, payload)
+
+        # After every explicit phrase, so a plural never shadows one
+        for phrase, payload in payloads.items():
+            self._insert(_plural(phrase), payload)
+
+    def _insert(self, phrase: str, payload: tuple):
+        node = self._root
+        for token in phrase.split():
+            node = node.setdefault(token, {})
+        # The first definition of a phrase wins over later aliases
+        node.setdefault(_END, payload)
+
+    def find(
+        self,
+        text: str,
+        tokens: Optional[Sequence[Tuple[str, int, int]]] = None
+    ) -> List[Match]:
+        """Find all phrases in text.
+
+        Args:
+            text: Lowercased message
+            tokens: Its TOKEN_PATTERN tokens as (token, start, end), if
+                already computed
+
+        Returns:
+            Non-overlapping matches in text order
+        """
+        if tokens is None:
+            tokens = [(m.group(), m.start(), m.end()) for m in TOKEN_PATTERN.finditer(text)]
+        matches = []
+        root = self._root
+        n = len(tokens)
+        i = 0
+
+        while i < n:
+            token, start, _ = tokens[i]
+            node = root.get(token)
+            best: Optional[tuple] = None
+            j = i
+
+            while node is not None:
+                if _END in node:
+                    best = (node[_END], j)
+
+                j += 1
+                if j == n:
+                    break
+
+                # Multi-word phrases only continue across a single space
+                prev_end = tokens[j - 1][2]
+                next_token, next_start, _ = tokens[j]
+                if next_start != prev_end + 1 or text[prev_end] != " ":
+                    break
+
+                node = node.get(next_token)
+
+            if best is not None:
+                (value, entity_type), last = best
+                matches.append(Match(value, entity_type, start, tokens[last][2]))
+                i = last + 1
+                continue
+
+            i += 1
+
+        return matches
+
+
+def _plural(phrase: str) -> str:
+    """Regular English plural of a phrase's last word."""
+    if phrase.endswith(_ES_ENDINGS):
+        return phrase + "es"
+    if len(phrase) > 1 and phrase[-1] == "y" and phrase[-2] not in "aeiou":
+        return phrase[:-1] + "ies"
+    return phrase + "s"
@@ -0,0 +1,260 @@
+"""Single-flight coalescing of identical concurrent LLM calls.
+
+During a rush many kiosks send the same turn within milliseconds of each
+other. `SingleFlight` keys each call on its fully assembled prompt: while a
+call is running, identical calls join it instead of starting their own, and
+every caller gets its result or its error. A key is forgotten as soon as
+its call finishes, so nothing is cached here (that is `ResponseCache`'s
+job); only calls that overlap in time are collapsed.
+
+Streams are shared as well. A `SharedStream` runs the upstream stream in
+its own task and fans the fragments out; a caller that joins late first
+gets the fragments produced so far. The upstream stream is cancelled once
+its last subscriber leaves.
+"""
+
+from concurrent.futures import Future
+from typing import (
+    AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple, TypeVar
+)
+import asyncio
+import threading
+
+T = TypeVar("T")
+
+
+class SharedStream:
+    """One upstream stream of text fragments, read by any number of subscribers."""
+
+    def __init__(self, source: AsyncIterator[str], on_idle: Callable[[], None]):
+        """Start pumping the source.
+
+        Args:
+            source: Upstream fragments
+            on_idle: Called when the stream finishes or loses its last
+                subscriber, so no new subscriber joins it
+        """
+        self.parts: List[str] = []
+        self.error: Optional[BaseException] = None
+        self.done = False
+        self.subscribers = 0
+        self._on_idle = on_idle
+        self._changed = asyncio.Event()
+        self.task = asyncio.ensure_future(self._pump(source))
+
+    async def _pump(self, source: AsyncIterator[str]):
+        try:
+            async for part in source:
+                self.parts.append(part)
+                self._notify()
+        except asyncio.CancelledError:
+            # Subscribers are not cancelled themselves; they see a failure
+            self.error = RuntimeError("shared stream cancelled")
+            raise
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._on_idle()
+            self._notify()
+
+    def _notify(self):
+        # Wake everyone waiting now; later waiters wait on a fresh event
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def subscribe(self) -> "Subscription":
+        """Every fragment of the stream, from the first.
+
+        The subscriber counts from this call on, so a subscription that is
+        closed without being read still releases the stream.
+
+        Raises:
+            Exception: Whatever ended the upstream stream early, once the
+                fragments produced before it are delivered
+        """
+        self.subscribers += 1
+        return Subscription(self)
+
+    async def _read(self) -> AsyncIterator[str]:
+        index = 0
+        while True:
+            if index < len(self.parts):
+                index += 1
+                yield self.parts[index - 1]
+            elif self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            else:
+                await self._changed.wait()
+
+    def _unsubscribe(self):
+        self.subscribers -= 1
+        if not self.subscribers and not self.done:
+            # Nobody is reading; stop the upstream call
+            self._on_idle()
+            self.task.cancel()
+
+
+class Subscription:
+    """One subscriber's read of a `SharedStream`.
+
+    An async iterator like the generator it wraps, except that closing it
+    releases the stream even before the first fragment is read (`aclose()`
+    on an unstarted async generator skips its `finally`).
+    """
+
+    def __init__(self, shared: SharedStream):
+        self._shared = shared
+        self._reader = shared._read()
+        self._released = False
+
+    def __aiter__(self) -> "Subscription":
+        return self
+
+    async def __anext__(self) -> str:
+        try:
+            return await self._reader.__anext__()
+        except BaseException:
+            # Exhausted, failed or cancelled: this subscriber is done
+            self._release()
+            raise
+
+    async def aclose(self):
+        """Stop reading; cancels the upstream stream if nobody else reads it."""
+        await self._reader.aclose()
+        self._release()
+
+    def _release(self):
+        if not self._released:
+            self._released = True
+            self._shared._unsubscribe()
+
+
+class SingleFlight:
+    """Collapses concurrent calls that share a key into one call.
+
+    Attributes:
+        calls: Calls started
+        collapsed: Calls that joined one already running instead
+    """
+
+    def __init__(self):
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+        self._streams: Dict[Hashable, SharedStream] = {}
+        self._futures: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.collapsed = 0
+
+    def task(self, key: Hashable, factory: Callable[[], Awaitable[T]]) -> Tuple[asyncio.Task, bool]:
+        """The running call for `key`, started from `factory()` if there is none.
+
+        Waiters must not cancel the returned task, which other callers may
+        share: await it through `asyncio.shield`.
+
+        Args:
+            key: Identity of the call (the assembled prompt)
+            factory: Starts the call
+
+        Returns:
+            Tuple of (task, whether it was already running)
+        """
+        task = self._tasks.get(key)
+        if task is not None:
+            self.collapsed += 1
+            return task, True
+
+        task = asyncio.ensure_future(factory())
+        self._tasks[key] = task
+        task.add_done_callback(lambda done: self._forget_task(key, done))
+        self.calls += 1
+        return task, False
+
+    def _forget_task(self, key: Hashable, task: asyncio.Task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+
+    def stream(
+        self,
+        key: Hashable,
+        factory: Callable[[], AsyncIterator[str]]
+    ) -> Subscription:
+        """Subscribe to the running stream for `key`, starting it if needed.
+
+        Args:
+            key: Identity of the call (the assembled prompt)
+            factory: Starts the upstream stream
+
+        Returns:
+            Every fragment of the shared stream (see `SharedStream.subscribe`)
+        """
+        shared = self._streams.get(key)
+        if shared is None:
+            shared = SharedStream(factory(), lambda: self._forget_stream(key, shared))
+            self._streams[key] = shared
+            self.calls += 1
+        else:
+            self.collapsed += 1
+        return shared.subscribe()
+
+    def _forget_stream(self, key: Hashable, shared: SharedStream):
+        if self._streams.get(key) is shared:
+            del self._streams[key]
+
+    def call(self, key: Hashable, fn: Callable[[], T]) -> T:
+        """Run `fn` once for concurrent callers from several threads.
+
+        The first caller runs `fn`; callers arriving meanwhile block until it
+        finishes and get the same result or exception.
+
+        Args:
+            key: Identity of the call (the assembled prompt)
+            fn: The call
+
+        Returns:
+            Result of `fn`
+        """
+        with self._lock:
+            future = self._futures.get(key)
+            leader = future is None
+            if leader:
+                future = self._futures[key] = Future()
+                self.calls += 1
+            else:
+                self.collapsed += 1
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._futures[key]
+
+    @property
+    def in_flight(self) -> int:
+        """Calls running now."""
+        return len(self._tasks) + len(self._streams) + len(self._futures)
+
+    def cancel(self):
+        """Cancel running shared streams (unary tasks belong to their caller)."""
+        for shared in list(self._streams.values()):
+            shared.task.cancel()
+
+    def stats(self) -> Dict:
+        """Report calls started, calls collapsed into them and calls running."""
+        requests = self.calls + self.collapsed
+        return {
+            "calls": self.calls,
+            "collapsed": self.collapsed,
+            "in_flight": self.in_flight,
+            "collapse_rate": self.collapsed / requests if requests else 0.0
+        }
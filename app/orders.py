@@ -0,0 +1,608 @@
+"""Append-only order event log with snapshots, crash recovery and idempotent retries.
+
+Every order mutation (items added, an item removed, a session cleared) and
+every reply to a request carrying an idempotency key is appended to
+`orders-<generation>.log` as one JSON line. Appends are buffered and written
+with one fsync per group: `sync()` waits until everything appended so far is
+on disk, and concurrent callers share the same write (group commit).
+
+Once enough events accumulate, the live state is written to a compact binary
+`orders.snapshot` and appends move to a new log generation. On startup
+`recover()` memory-maps the snapshot, reads only its index (session IDs and
+record offsets) and replays the log written since; a session's order is
+decoded from the mapping the first time it is needed.
+"""
+
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple, Union
+import asyncio
+import glob
+import mmap
+import os
+import struct
+import sys
+import time
+
+from app.serialization import dumps, loads
+from app.state import Line, OrderLines
+
+# Event types
+ADD = "add"
+REMOVE = "remove"
+CLEAR = "clear"
+REPLY = "reply"
+
+SNAPSHOT_NAME = "orders.snapshot"
+SNAPSHOT_MAGIC = b"NPORDER1"
+
+# Snapshot layout: header, JSON arrays of the strings, session IDs and
+# idempotency keys, little-endian u64 record offsets for the sessions and
+# then the keys, then the records themselves.
+# magic, generation, sessions, keys, then the three JSON arrays' lengths
+_HEADER = struct.Struct("<8sQIIIII")
+# Session record: last update (epoch seconds), total cents, lines
+_SESSION = struct.Struct("<dqH")
+# Each line: item string, size string (0 = none, else index + 1), quantity, unit cents
+_LINE = struct.Struct("<IIiq")
+# Key record: length of the [session ID, reply] JSON that follows
+_REPLY = struct.Struct("<I")
+
+# fdatasync skips the metadata flush where the platform has it
+_fdatasync = getattr(os, "fdatasync", os.fsync)
+
+
+class SessionOrder:
+    """The order of one session as rebuilt from the log.
+
+    Lines are merged per item exactly as in the session itself, so a
+    logged removal index means the same line in both.
+    """
+
+    __slots__ = ("lines", "total_cents", "updated")
+
+    def __init__(self, lines: Optional[OrderLines] = None, total_cents: int = 0, updated: float = 0.0):
+        self.lines = lines if lines is not None else OrderLines()
+        self.total_cents = total_cents
+        self.updated = updated
+
+
+class OrderLog:
+    """Durable record of order mutations and of replies to retried requests.
+
+    Without a directory nothing is written and the log only deduplicates
+    retries within the process. With one, the state of every session's
+    order survives restarts: call `recover()` before serving.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        ttl: float = 1800.0,
+        fsync_interval: float = 0.05,
+        snapshot_every: int = 50000,
+        max_keys: int = 10000
+    ):
+        """Initialize the log.
+
+        Args:
+            directory: Where the log and snapshot live (None keeps nothing
+                on disk)
+            ttl: Seconds after its last update that an order is forgotten,
+                as sessions are
+            fsync_interval: Seconds between background flushes of appends
+                nobody waits for
+            snapshot_every: Logged events between snapshots
+            max_keys: Idempotency keys remembered, oldest forgotten first
+        """
+        self.directory = directory
+        self.ttl = ttl
+        self.fsync_interval = fsync_interval
+        self.snapshot_every = snapshot_every
+        self.max_keys = max_keys
+
+        # Entries still only in the snapshot are their record offsets
+        self.orders: Dict[str, Union[SessionOrder, int]] = {}
+        # key -> (session ID, reply or None while the turn is in flight)
+        self._keys: "OrderedDict[str, Union[Tuple[str, Optional[dict]], int]]" = OrderedDict()
+        self._snapshot: Optional[mmap.mmap] = None
+        self._strings: List[str] = []
+
+        self.generation = 0
+        self._fd: Optional[int] = None
+        self._pending: List[bytes] = []
+        self._appended = 0
+        self._synced = 0
+        self._lock = asyncio.Lock()
+        self._flusher: Optional[asyncio.Task] = None
+        self.events_since_snapshot = 0
+
+        self.log_bytes = 0
+        self.snapshot_bytes = 0
+        self.bytes_written = 0
+        self.fsyncs = 0
+        self.replays = 0
+
+    @property
+    def persistent(self) -> bool:
+        return self.directory is not None
+
+    # Recovery
+
+    def recover(self) -> Dict:
+        """Rebuild state from the snapshot and the log written since.
+
+        A torn final record (a crash mid-append) is dropped and the log is
+        truncated back to its last complete record.
+
+        Returns:
+            Sessions restored, log events replayed and seconds taken
+        """
+        start = time.perf_counter()
+        replayed = 0
+        if self.persistent:
+            os.makedirs(self.directory, exist_ok=True)
+            self._load_snapshot()
+            replayed = self._replay(self._log_path(self.generation))
+            # Logs older than the snapshot were already folded into it
+            for path in glob.glob(os.path.join(self.directory, "orders-*.log")):
+                if path != self._log_path(self.generation):
+                    os.remove(path)
+            self._fd = os.open(
+                self._log_path(self.generation), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644
+            )
+            self.log_bytes = os.fstat(self._fd).st_size
+            self.events_since_snapshot = replayed
+        return {
+            "sessions": len(self.orders),
+            "events_replayed": replayed,
+            "seconds": time.perf_counter() - start,
+        }
+
+    def _log_path(self, generation: int) -> str:
+        return os.path.join(self.directory, f"orders-{generation}.log")
+
+    def _load_snapshot(self):
+        path = os.path.join(self.directory, SNAPSHOT_NAME)
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            return
+        with f:
+            size = os.fstat(f.fileno()).st_size
+            if size < _HEADER.size:
+                return
+            view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, generation, n_sessions, n_keys,
+         strings_len, ids_len, keys_len) = _HEADER.unpack_from(view, 0)
+        if magic != SNAPSHOT_MAGIC:
+            view.close()
+            raise ValueError(f"{path} is not an order snapshot")
+        offset = _HEADER.size
+        self._strings = loads(view[offset:offset + strings_len])
+        offset += strings_len
+        session_ids = loads(view[offset:offset + ids_len])
+        offset += ids_len
+        keys = loads(view[offset:offset + keys_len])
+        offset += keys_len
+        session_offsets = _offsets(view, offset, n_sessions)
+        key_offsets = _offsets(view, offset + 8 * n_sessions, n_keys)
+
+        self.generation = generation
+        self.orders = dict(zip(session_ids, session_offsets))
+        self._keys = OrderedDict(zip(keys, key_offsets))
+        self._snapshot = view
+        self.snapshot_bytes = size
+
+    def _decode_order(self, offset: int) -> SessionOrder:
+        view = self._snapshot
+        strings = self._strings
+        updated, total_cents, n_lines = _SESSION.unpack_from(view, offset)
+        offset += _SESSION.size
+        lines = OrderLines(
+            (strings[item], strings[size_index - 1] if size_index else None, quantity, unit_cents)
+            for item, size_index, quantity, unit_cents
+            in _LINE.iter_unpack(view[offset:offset + n_lines * _LINE.size])
+        )
+        return SessionOrder(lines, total_cents, updated)
+
+    def _order(self, session_id: str) -> Optional[SessionOrder]:
+        entry = self.orders.get(session_id)
+        if isinstance(entry, int):
+            entry = self.orders[session_id] = self._decode_order(entry)
+        return entry
+
+    def _key(self, key: str) -> Optional[Tuple[str, Optional[dict]]]:
+        entry = self._keys.get(key)
+        if isinstance(entry, int):
+            (length,) = _REPLY.unpack_from(self._snapshot, entry)
+            start = entry + _REPLY.size
+            entry = self._keys[key] = tuple(loads(self._snapshot[start:start + length]))
+        return entry
+
+    def _replay(self, path: str) -> int:
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return 0
+
+        replayed = 0
+        good = 0
+        for line in data.splitlines(keepends=True):
+            if not line.endswith(b"\n"):
+                break
+            try:
+                event = loads(line)
+            except ValueError:
+                break
+            self._apply(event)
+            replayed += 1
+            good += len(line)
+
+        if good < len(data):
+            print(f"Warning: dropping {len(data) - good} bytes of incomplete order log in {path}")
+            with open(path, "r+b") as f:
+                f.truncate(good)
+        return replayed
+
+    # State
+
+    def _apply(self, event: dict):
+        kind = event["e"]
+        session_id = event["s"]
+        if kind == REPLY:
+            self._remember(event["k"], session_id, event["r"])
+        elif kind == ADD and event.get("k") is not None:
+            self._remember(event["k"], session_id, None)
+        if not self.persistent:
+            # Orders are only tracked to be written out
+            return
+
+        if kind == REPLY:
+            order = self._order(session_id)
+            if order is not None:
+                order.updated = event["t"]
+            return
+
+        if kind == CLEAR:
+            self.orders.pop(session_id, None)
+            return
+
+        order = self._order(session_id)
+        if order is None:
+            order = self.orders[session_id] = SessionOrder()
+        order.updated = event["t"]
+        if kind == ADD:
+            for item, size, quantity, unit_cents in event["l"]:
+                order.lines.add(item, size, quantity, unit_cents)
+                order.total_cents += unit_cents * quantity
+        elif kind == REMOVE and 0 <= event["i"] < len(order.lines):
+            # Out of range if the line was added before the log knew the session
+            _, _, quantity, unit_cents = order.lines.remove(event["i"])
+            order.total_cents -= unit_cents * quantity
+
+    def _remember(self, key: str, session_id: str, reply: Optional[dict]):
+        self._keys[key] = (session_id, reply)
+        self._keys.move_to_end(key)
+        while len(self._keys) > self.max_keys:
+            self._keys.popitem(last=False)
+
+    def order(self, session_id: str) -> Optional[SessionOrder]:
+        """The logged order of a session, or None if empty or expired."""
+        order = self._order(session_id)
+        if order is None or not order.lines or order.updated <= time.time() - self.ttl:
+            return None
+        return order
+
+    # Idempotency
+
+    def reply(self, key: str) -> Optional[dict]:
+        """The reply recorded for an idempotency key, if the turn completed."""
+        entry = self._key(key)
+        if entry is None or entry[1] is None:
+            return None
+        self.replays += 1
+        return entry[1]
+
+    def applied(self, key: Optional[str]) -> bool:
+        """Whether the turn with this idempotency key already changed the order."""
+        return key is not None and key in self._keys
+
+    # Appends
+
+    def record_add(self, session_id: str, lines: List[Line], key: Optional[str] = None):
+        """Log priced lines added to a session's order.
+
+        Args:
+            session_id: Session ID
+            lines: (item, size, quantity, unit cents) for each line
+            key: Idempotency key of the request, if any
+        """
+        event = {"e": ADD, "s": session_id, "t": _now(), "l": [list(line) for line in lines]}
+        if key is not None:
+            event["k"] = key
+        self._append(event)
+
+    def record_remove(self, session_id: str, index: int):
+        """Log the removal of one order line by position."""
+        self._append({"e": REMOVE, "s": session_id, "t": _now(), "i": index})
+
+    def record_clear(self, session_id: str):
+        """Log that a session's order was discarded."""
+        self._append({"e": CLEAR, "s": session_id, "t": _now()})
+
+    def record_reply(self, session_id: str, key: str, reply: dict):
+        """Log the reply to a request so a retry can be answered with it."""
+        self._append({"e": REPLY, "s": session_id, "t": _now(), "k": key, "r": reply})
+
+    def _append(self, event: dict):
+        # State changes right away; the record reaches disk with the next flush
+        self._apply(event)
+        if self._fd is None:
+            return
+        self._pending.append(dumps(event) + b"\n")
+        self._appended += 1
+        self.events_since_snapshot += 1
+
+    async def sync(self):
+        """Wait until every event appended so far is on disk.
+
+        Callers that arrive while a write is in flight queue behind it and
+        then share the next write, so fsyncs per event fall as load rises.
+        """
+        target = self._appended
+        if self._synced >= target:
+            return
+        async with self._lock:
+            if self._synced >= target:
+                return
+            await self._flush()
+
+    async def _flush(self):
+        # Called with the lock held
+        batch, self._pending = self._pending, []
+        upto = self._appended
+        if batch:
+            data = b"".join(batch)
+            try:
+                await asyncio.to_thread(self._write, self._fd, data)
+            except BaseException:
+                # Keep the records for the next attempt
+                self._pending[:0] = batch
+                raise
+            self.log_bytes += len(data)
+        self._synced = upto
+
+    def _write(self, fd: int, data: bytes):
+        if not data:
+            return
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+        _fdatasync(fd)
+        self.bytes_written += len(data)
+        self.fsyncs += 1
+
+    # Snapshots
+
+    async def compact(self):
+        """Write a snapshot of the live state and start a new log generation."""
+        if self._fd is None:
+            return
+        async with self._lock:
+            generation = self.generation + 1
+            # Encode and take the unwritten appends together, with no await
+            # in between: those appends are in the snapshot, so they must
+            # not reach the new log, but they go to the old one first in
+            # case the snapshot never lands
+            body, strings, session_offsets, key_offsets = self._encode_snapshot(generation)
+            batch, self._pending = self._pending, []
+            upto = self._appended
+            # Appends during the write below belong to the new generation
+            snapshotted = self.events_since_snapshot
+            try:
+                await asyncio.to_thread(self._checkpoint, b"".join(batch), body)
+            except BaseException:
+                self._pending[:0] = batch
+                raise
+            self._synced = upto
+
+            # Entries not decoded meanwhile now point into the new snapshot
+            with open(os.path.join(self.directory, SNAPSHOT_NAME), "rb") as f:
+                view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            for session_id, offset in session_offsets.items():
+                if isinstance(self.orders.get(session_id), int):
+                    self.orders[session_id] = offset
+            for key, offset in key_offsets.items():
+                if isinstance(self._keys.get(key), int):
+                    self._keys[key] = offset
+            if self._snapshot is not None:
+                self._snapshot.close()
+            self._snapshot = view
+            self._strings = strings
+
+            old_fd, old_path = self._fd, self._log_path(self.generation)
+            self._fd = os.open(
+                self._log_path(generation), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644
+            )
+            self.generation = generation
+            os.close(old_fd)
+            os.remove(old_path)
+            self.log_bytes = 0
+            self.events_since_snapshot -= snapshotted
+
+    def _encode_snapshot(self, generation: int) -> tuple:
+        """Returns (snapshot bytes, its strings, session and key record offsets)."""
+        old = self._snapshot
+        # Expired and emptied orders are dropped here, and from memory
+        cutoff = time.time() - self.ttl
+        # Extending the previous table keeps records copied from it valid
+        strings = {string: i for i, string in enumerate(self._strings)}
+        live = {}
+        records = []
+        positions = []
+        position = 0
+
+        for session_id, entry in self.orders.items():
+            if isinstance(entry, int):
+                updated, _, n_lines = _SESSION.unpack_from(old, entry)
+                if updated <= cutoff or not n_lines:
+                    continue
+                record = old[entry:entry + _SESSION.size + n_lines * _LINE.size]
+            else:
+                if entry.updated <= cutoff or not entry.lines:
+                    continue
+                parts = [_SESSION.pack(entry.updated, entry.total_cents, len(entry.lines))]
+                for item, size, quantity, unit_cents in entry.lines:
+                    item_index = strings.setdefault(item, len(strings))
+                    size_index = 0 if size is None else strings.setdefault(size, len(strings)) + 1
+                    parts.append(_LINE.pack(item_index, size_index, quantity, unit_cents))
+                record = b"".join(parts)
+            live[session_id] = entry
+            records.append(record)
+            positions.append(position)
+            position += len(record)
+        self.orders = live
+
+        key_positions = []
+        for entry in self._keys.values():
+            if isinstance(entry, int):
+                (length,) = _REPLY.unpack_from(old, entry)
+                record = old[entry:entry + _REPLY.size + length]
+            else:
+                body = dumps(list(entry))
+                record = _REPLY.pack(len(body)) + body
+            records.append(record)
+            key_positions.append(position)
+            position += len(record)
+
+        strings_body = dumps(list(strings))
+        ids_body = dumps(list(live))
+        keys_body = dumps(list(self._keys))
+        header = _HEADER.pack(
+            SNAPSHOT_MAGIC, generation, len(live), len(self._keys),
+            len(strings_body), len(ids_body), len(keys_body)
+        )
+        base = len(header) + len(strings_body) + len(ids_body) + len(keys_body)
+        base += 8 * (len(live) + len(self._keys))
+        session_offsets = dict(zip(live, (base + p for p in positions)))
+        key_offsets = dict(zip(self._keys, (base + p for p in key_positions)))
+
+        body = b"".join([
+            header, strings_body, ids_body, keys_body,
+            _offsets_bytes(session_offsets.values()), _offsets_bytes(key_offsets.values()),
+            *records
+        ])
+        return body, list(strings), session_offsets, key_offsets
+
+    def _checkpoint(self, tail: bytes, body: bytes):
+        self._write(self._fd, tail)
+        self.log_bytes += len(tail)
+        self._write_snapshot(body)
+
+    def _write_snapshot(self, body: bytes):
+        path = os.path.join(self.directory, SNAPSHOT_NAME)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(body)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        # Make the rename itself durable
+        dir_fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+        self.snapshot_bytes = len(body)
+        self.bytes_written += len(body)
+        self.fsyncs += 2
+
+    # Lifecycle
+
+    def start(self):
+        """Start flushing appends in the background (and snapshotting)."""
+        if self._fd is not None and self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.fsync_interval)
+            try:
+                await self.sync()
+                if self.events_since_snapshot >= self.snapshot_every:
+                    await self.compact()
+            except OSError as e:
+                print(f"Warning: order log write failed ({e}); retrying.")
+
+    async def close(self):
+        """Flush outstanding appends and close the log."""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        if self._fd is not None:
+            await self.sync()
+            os.close(self._fd)
+            self._fd = None
+        if self._snapshot is not None:
+            # Every order and reply still only in the snapshot goes with it
+            self.orders.clear()
+            self._keys.clear()
+            self._snapshot.close()
+            self._snapshot = None
+
+    def stats(self) -> Dict:
+        """Report log size, snapshot size, writes and idempotent replays."""
+        return {
+            "persistent": self.persistent,
+            "generation": self.generation,
+            "sessions": len(self.orders),
+            "events_since_snapshot": self.events_since_snapshot,
+            "log_bytes": self.log_bytes,
+            "snapshot_bytes": self.snapshot_bytes,
+            "bytes_written": self.bytes_written,
+            "fsyncs": self.fsyncs,
+            "idempotency_keys": len(self._keys),
+            "replays": self.replays,
+        }
+
+
+def _now() -> float:
+    # Millisecond timestamps keep log records short
+    return round(time.time(), 3)
+
+
+def _offsets(view: mmap.mmap, offset: int, count: int) -> List[int]:
+    offsets = array("Q")
+    offsets.frombytes(view[offset:offset + 8 * count])
+    if sys.byteorder != "little":
+        offsets.byteswap()
+    return offsets.tolist()
+
+
+def _offsets_bytes(offsets) -> bytes:
+    packed = array("Q", offsets)
+    if sys.byteorder != "little":
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def create_order_log() -> OrderLog:
+    """Create the order log configured by environment variables.
+
+    ORDER_LOG_DIR enables persistence (unset keeps idempotency keys in
+    memory only); ORDER_LOG_FSYNC_INTERVAL, ORDER_LOG_SNAPSHOT_EVERY,
+    IDEMPOTENCY_MAX_KEYS and SESSION_TTL tune it.
+
+    Returns:
+        Configured order log (not yet recovered)
+    """
+    return OrderLog(
+        directory=os.getenv("ORDER_LOG_DIR") or None,
+        ttl=float(os.getenv("SESSION_TTL", "1800")),
+        fsync_interval=float(os.getenv("ORDER_LOG_FSYNC_INTERVAL", "0.05")),
+        snapshot_every=int(os.getenv("ORDER_LOG_SNAPSHOT_EVERY", "50000")),
+        max_keys=int(os.getenv("IDEMPOTENCY_MAX_KEYS", "10000")),
+    )
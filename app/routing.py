@@ -0,0 +1,98 @@
+"""Decide whether a turn is answered from a template or by the LLM."""
+
+from typing import Dict, Iterable, Optional
+import os
+
+TEMPLATE = "template"
+LLM = "llm"
+# Reported when the LLM path was chosen but no chatbot is configured, or
+# the LLM was shed, failed or missed its reply deadline
+FALLBACK = "fallback"
+
+# Intents answered from templates unless configured otherwise
+DEFAULT_TEMPLATE_INTENTS = ("greeting", "order", "add_item", "farewell")
+
+# Intents that place items on the order
+ORDER_INTENTS = ("order", "add_item")
+
+
+class ResponseRouter:
+    """Route clear-cut turns to templates and everything else to the LLM.
+
+    A turn takes the template path only when its intent is enabled, the
+    classifier's confidence meets the intent's threshold, no other intent
+    scored as high, and its entities are fully resolved: every mentioned
+    item was priced for order intents, and no items were mentioned for
+    the others.
+    """
+
+    def __init__(
+        self,
+        template_intents: Optional[Iterable[str]] = None,
+        min_confidence: Optional[float] = None,
+        thresholds: Optional[Dict[str, float]] = None
+    ):
+        """Initialize the router.
+
+        Args:
+            template_intents: Intents allowed on the template path (if None,
+                reads comma-separated ROUTER_TEMPLATE_INTENTS)
+            min_confidence: Default confidence threshold (if None, reads
+                ROUTER_MIN_CONFIDENCE)
+            thresholds: Per-intent thresholds (if None, reads
+                ROUTER_MIN_CONFIDENCE_<INTENT> for each template intent)
+        """
+        if template_intents is None:
+            configured = os.getenv("ROUTER_TEMPLATE_INTENTS", ",".join(DEFAULT_TEMPLATE_INTENTS))
+            template_intents = [i.strip() for i in configured.split(",") if i.strip()]
+        self.template_intents = set(template_intents)
+
+        if min_confidence is None:
+            min_confidence = float(os.getenv("ROUTER_MIN_CONFIDENCE", "0.5"))
+        self.min_confidence = min_confidence
+
+        if thresholds is None:
+            thresholds = {}
+            for intent in self.template_intents:
+                value = os.getenv(f"ROUTER_MIN_CONFIDENCE_{intent.upper()}")
+                if value is not None:
+                    thresholds[intent] = float(value)
+        self.thresholds = thresholds
+
+    def route(
+        self,
+        intent: str,
+        confidence: float,
+        scores: Dict[str, int],
+        items_mentioned: int,
+        items_added: int
+    ) -> str:
+        """Choose the response path for a turn.
+
+        Args:
+            intent: Classified intent
+            confidence: Classifier confidence for the intent
+            scores: Per-intent pattern counts from the classifier
+            items_mentioned: Menu items extracted from the message
+            items_added: Items priced and added to the order this turn
+
+        Returns:
+            TEMPLATE or LLM
+        """
+        if intent not in self.template_intents:
+            return LLM
+
+        if confidence < self.thresholds.get(intent, self.min_confidence):
+            return LLM
+
+        # Another intent matched as strongly, so the turn is ambiguous
+        top = scores.get(intent, 0)
+        if any(score >= top for other, score in scores.items() if other != intent):
+            return LLM
+
+        if intent in ORDER_INTENTS:
+            resolved = items_mentioned > 0 and items_added == items_mentioned
+        else:
+            resolved = items_mentioned == 0
+
+        return TEMPLATE if resolved else LLM
@@ -0,0 +1,193 @@
+"""Typo-tolerant search over menu names and aliases."""
+
+from typing import Dict, List, Optional, Set, Tuple
+import re
+
+_NON_WORD = re.compile(r"[^\w\s]+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace."""
+    return _WHITESPACE.sub(" ", _NON_WORD.sub("", text.lower())).strip()
+
+
+def max_distance_for(text: str) -> int:
+    """Edit distance tolerated for a query of this length.
+
+    Short words get no slack, otherwise "tea" would match "the".
+    """
+    if len(text) < 4:
+        return 0
+    if len(text) < 6:
+        return 1
+    return 2
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance, capped at limit + 1.
+
+    Counts insertions, deletions, substitutions and adjacent
+    transpositions. Stops early once every path exceeds `limit`.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+
+    previous2: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        row_min = i
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, previous2[j - 2] + 1)
+            current[j] = value
+            row_min = min(row_min, value)
+        if row_min > limit:
+            return limit + 1
+        previous2, previous = previous, current
+
+    return min(previous[-1], limit + 1)
+
+
+class FuzzyIndex:
+    """SymSpell-style deletion index over menu names and aliases.
+
+    Every term is indexed under all strings obtained by deleting up to
+    `max_distance` characters from its first `prefix_length` characters,
+    and likewise from its last `prefix_length` characters. A query generates
+    the same deletions; a term can only be within the edit distance if both
+    its prefix and its suffix are reached, so candidates are found with a
+    handful of dict lookups whatever the menu size, and only those few are
+    verified with a full distance check. Word postings additionally resolve
+    partial names like "chicken".
+    """
+
+    def __init__(
+        self,
+        terms: Dict[str, str],
+        max_distance: int = 2,
+        prefix_length: int = 7
+    ):
+        """Build the index.
+
+        Args:
+            terms: Mapping of searchable term (name or alias) to menu item
+            max_distance: Largest edit distance searched
+            prefix_length: Characters of each term used for deletions
+        """
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.source: Dict[str, str] = dict(terms)
+        self.terms: Dict[str, str] = {}
+        self._prefix_deletes: Dict[str, Set[str]] = {}
+        self._suffix_deletes: Dict[str, Set[str]] = {}
+        self._postings: Dict[str, Set[str]] = {}
+
+        for term, item in terms.items():
+            term = normalize(term)
+            self.terms[term] = item
+            for key in self._deletions(term[:prefix_length], max_distance):
+                self._prefix_deletes.setdefault(key, set()).add(term)
+            for key in self._deletions(term[-prefix_length:], max_distance):
+                self._suffix_deletes.setdefault(key, set()).add(term)
+            for word in term.split():
+                self._postings.setdefault(word, set()).add(item)
+
+    @staticmethod
+    def menu_terms(menu: Dict) -> Dict[str, str]:
+        """A menu's item names and "aliases", as searchable term -> item."""
+        terms = {item: item for item in menu["prices"]}
+        for alias, item in menu.get("aliases", {}).items():
+            if item in menu["prices"]:
+                terms[alias] = item
+        return terms
+
+    @classmethod
+    def from_menu(cls, menu: Dict, **options) -> "FuzzyIndex":
+        """Index a menu's item names and its "aliases" mapping."""
+        return cls(cls.menu_terms(menu), **options)
+
+    @staticmethod
+    def _deletions(word: str, distance: int) -> Set[str]:
+        results = {word}
+        frontier = {word}
+        for _ in range(distance):
+            frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+            results |= frontier
+        return results
+
+    def _candidates(self, index: Dict[str, Set[str]], fragment: str, distance: int) -> Set[str]:
+        found: Set[str] = set()
+        for key in self._deletions(fragment, distance):
+            found.update(index.get(key, ()))
+        return found
+
+    def search(
+        self,
+        query: str,
+        limit: int = 5,
+        max_distance: Optional[int] = None
+    ) -> List[Tuple[str, int]]:
+        """Find menu items whose name or alias is close to the query.
+
+        Args:
+            query: Search text
+            limit: Maximum candidates returned
+            max_distance: Edit distance allowed (defaults by query length)
+
+        Returns:
+            (menu item, edit distance) pairs, best first
+        """
+        query = normalize(query)
+        if max_distance is None:
+            max_distance = max_distance_for(query)
+        max_distance = min(max_distance, self.max_distance)
+
+        item = self.terms.get(query)
+        if item is not None:
+            return [(item, 0)]
+
+        candidates = self._candidates(self._prefix_deletes, query[:self.prefix_length], max_distance)
+        if candidates:
+            candidates &= self._candidates(
+                self._suffix_deletes, query[-self.prefix_length:], max_distance
+            )
+
+        best: Dict[str, int] = {}
+        for term in candidates:
+            distance = edit_distance(query, term, max_distance)
+            if distance <= max_distance:
+                item = self.terms[term]
+                if distance < best.get(item, max_distance + 1):
+                    best[item] = distance
+
+        ranked = sorted(best.items(), key=lambda pair: (pair[1], len(pair[0]), pair[0]))
+        return ranked[:limit]
+
+    def lookup(self, query: str) -> Optional[str]:
+        """Resolve a query to the single best menu item.
+
+        Tries exact names and aliases, then typo-tolerant matches, then
+        items sharing the most words with the query (shortest name first).
+
+        Args:
+            query: Search text
+
+        Returns:
+            Menu item, or None if nothing is close
+        """
+        candidates = self.search(query, limit=1)
+        if candidates:
+            return candidates[0][0]
+
+        overlap: Dict[str, int] = {}
+        for word in normalize(query).split():
+            for item in self._postings.get(word, ()):
+                overlap[item] = overlap.get(item, 0) + 1
+        if not overlap:
+            return None
+
+        return min(overlap, key=lambda item: (-overlap[item], len(item), item))
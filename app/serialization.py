@@ -0,0 +1,243 @@
+"""Fast JSON encoding and pre-encoded, cacheable response bodies.
+
+orjson is used when installed and the standard library otherwise; both
+produce compact UTF-8 JSON.
+"""
+
+from typing import Any, Dict, Mapping, Optional
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import stat
+
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+from fastapi.staticfiles import StaticFiles
+
+try:
+    import orjson
+except ImportError:  # Optional: faster encoding
+    orjson = None
+
+# Bodies smaller than this are not worth compressing
+GZIP_MIN_BYTES = 512
+
+# Static files cached in memory (and gzipped) up to this size
+STATIC_CACHE_MAX_BYTES = 1 << 20
+
+
+def dumps(obj: Any) -> bytes:
+    """Encode `obj` as compact UTF-8 JSON."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads(data: bytes) -> Any:
+    """Decode UTF-8 JSON; raises ValueError if malformed."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with `dumps`."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class EncodedBody:
+    """A response body encoded once, with its gzip variant and ETag.
+
+    Attributes:
+        body: Encoded bytes
+        gzipped: Gzip-compressed body, or None if compression does not pay
+        etag: Quoted strong ETag (a content hash unless given)
+        media_type: Content type
+    """
+
+    __slots__ = ("body", "gzipped", "etag", "media_type")
+
+    def __init__(self, body: bytes, media_type: str, etag: Optional[str] = None):
+        self.body = body
+        self.media_type = media_type
+        self.etag = etag or f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+        self.gzipped = None
+        if len(body) >= GZIP_MIN_BYTES:
+            # mtime=0 keeps the compressed bytes reproducible
+            compressed = gzip.compress(body, compresslevel=9, mtime=0)
+            if len(compressed) < len(body):
+                self.gzipped = compressed
+
+    @property
+    def version(self) -> str:
+        """The ETag without quotes, for cache-busting URLs."""
+        return self.etag.strip('"')
+
+    def response(
+        self,
+        request: Request,
+        cache_control: str,
+        headers: Optional[Mapping[str, str]] = None
+    ) -> Response:
+        """Serve the body, gzipped if the client accepts it, or a 304.
+
+        Args:
+            request: Incoming request (for If-None-Match and Accept-Encoding)
+            cache_control: Cache-Control header value
+            headers: Extra response headers
+
+        Returns:
+            200 response with the body, or 304 if the client's copy is current
+        """
+        out: Dict[str, str] = {"ETag": self.etag, "Cache-Control": cache_control}
+        if self.gzipped is not None:
+            out["Vary"] = "Accept-Encoding"
+        if headers:
+            out.update(headers)
+
+        if _etag_matches(request.headers.get("if-none-match"), self.etag):
+            return Response(status_code=304, headers=out)
+
+        body = self.body
+        if self.gzipped is not None and _accepts_gzip(request.headers.get("accept-encoding")):
+            body = self.gzipped
+            out["Content-Encoding"] = "gzip"
+        return Response(content=body, media_type=self.media_type, headers=out)
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Compression does not change the representation's ETag, but proxies may
+    # mark it weak
+    return etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+
+
+def _accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    if not accept_encoding:
+        return False
+    for coding in accept_encoding.split(","):
+        name, _, params = coding.strip().partition(";")
+        if name.strip().lower() in ("gzip", "*"):
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles that serves small files from memory, gzipped once.
+
+    Each file is read and compressed the first time it is served and again
+    only when its mtime or size changes. Requests whose `v` query parameter
+    matches the file's content version (see `versioned_page`) are cacheable
+    for a year as immutable; others get `max_age` and revalidate by ETag.
+    """
+
+    def __init__(self, *args, max_age: Optional[int] = None, **kwargs):
+        """Initialize the static app.
+
+        Args:
+            *args, **kwargs: As for StaticFiles
+            max_age: Cache lifetime in seconds for unversioned URLs (if
+                None, reads STATIC_MAX_AGE, default 3600)
+        """
+        super().__init__(*args, **kwargs)
+        if max_age is None:
+            max_age = int(os.getenv("STATIC_MAX_AGE", "3600"))
+        self.max_age = max_age
+        # full path -> ((mtime_ns, size), EncodedBody)
+        self._assets: Dict[str, tuple] = {}
+        # page name -> (stamps, names stamped, EncodedBody or None)
+        self._pages: Dict[str, tuple] = {}
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope, status_code: int = 200) -> Response:
+        if status_code != 200 or stat_result.st_size > STATIC_CACHE_MAX_BYTES:
+            return super().file_response(full_path, stat_result, scope, status_code)
+
+        asset = self._asset(str(full_path), stat_result)
+        request = Request(scope)
+        if request.query_params.get("v") == asset.version:
+            cache_control = "public, max-age=31536000, immutable"
+        else:
+            cache_control = f"public, max-age={self.max_age}"
+        return asset.response(request, cache_control)
+
+    def _asset(self, full_path: str, stat_result: os.stat_result) -> EncodedBody:
+        stamp = (stat_result.st_mtime_ns, stat_result.st_size)
+        cached = self._assets.get(full_path)
+        if cached is None or cached[0] != stamp:
+            with open(full_path, "rb") as f:
+                body = f.read()
+            cached = self._assets[full_path] = (stamp, EncodedBody(body, _media_type(full_path)))
+        return cached[1]
+
+    def versioned_page(self, request: Request, name: str, mount_path: str = "/static") -> Response:
+        """Serve an HTML page with its static asset URLs pinned to content versions.
+
+        References like `/static/style.css` get `?v=<version>` appended, so
+        the assets can be cached as immutable while the page itself is
+        always revalidated. The page is rebuilt only when it or one of its
+        assets changes on disk.
+
+        Args:
+            request: Incoming request
+            name: Page file name within the static directory
+            mount_path: Where this app is mounted
+
+        Returns:
+            The rewritten page (gzipped if accepted), or a 304
+        """
+        cached = self._pages.get(name)
+        if cached is None or cached[0] != self._stamps(cached[1]):
+            cached = self._pages[name] = self._build_page(name, mount_path)
+        if cached[2] is None:
+            return Response(status_code=404)
+        return cached[2].response(request, "no-cache")
+
+    def _stamps(self, names) -> list:
+        stamps = []
+        for name in names:
+            _, stat_result = self.lookup_path(name)
+            stamps.append(None if stat_result is None else (stat_result.st_mtime_ns, stat_result.st_size))
+        return stamps
+
+    def _build_page(self, name: str, mount_path: str) -> tuple:
+        """Returns (stamps, names the stamps cover, EncodedBody or None)."""
+        full_path, stat_result = self.lookup_path(name)
+        if stat_result is None or not stat.S_ISREG(stat_result.st_mode):
+            return self._stamps([name]), [name], None
+
+        with open(full_path, "rb") as f:
+            html = f.read()
+        prefix = mount_path.encode() + b"/"
+        pattern = re.compile(rb'(["\'])' + re.escape(prefix) + rb'([^"\'?#]+)\1')
+
+        versions = {}
+        for match in pattern.finditer(html):
+            asset_name = match.group(2).decode()
+            asset_path, asset_stat = self.lookup_path(asset_name)
+            if asset_stat is not None and stat.S_ISREG(asset_stat.st_mode):
+                versions[asset_name] = self._asset(str(asset_path), asset_stat).version
+
+        def pin(match):
+            version = versions.get(match.group(2).decode())
+            if version is None:
+                return match.group(0)
+            quote = match.group(1)
+            return quote + prefix + match.group(2) + b"?v=" + version.encode() + quote
+
+        names = [name, *versions]
+        page = EncodedBody(pattern.sub(pin, html), "text/html")
+        return self._stamps(names), names, page
+
+
+def _media_type(path: str) -> str:
+    # Starlette adds the charset to text/* types itself
+    media_type, _ = mimetypes.guess_type(path)
+    return media_type or "application/octet-stream"
@@ -0,0 +1,391 @@
+"""Session storage with idle-TTL and LRU eviction."""
+
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+import os
+import sqlite3
+import threading
+import time
+
+from app.nlp.history import ConversationHistory
+from app.orders import OrderLog
+from app.state import SessionState
+
+# SQLite saves between max-entries checks
+OVERFLOW_CHECK_INTERVAL = 64
+
+# Seconds a worker waits for another worker's write lock
+SQLITE_BUSY_TIMEOUT = 5.0
+
+
+def estimate_session_bytes(session: SessionState) -> int:
+    """Estimate the in-memory footprint of a session.
+
+    Args:
+        session: Session to measure
+
+    Returns:
+        Approximate size in bytes
+    """
+    return session.nbytes()
+
+
+class SessionStore:
+    """Base class for session stores.
+
+    Sessions idle for longer than `ttl` seconds are evicted, and once more
+    than `max_entries` sessions exist the least recently used ones go first.
+    `save` must be called after a session is modified. Each session's
+    history is a ring buffer holding the last `max_history` messages.
+    A session created for an ID the order log still knows starts with
+    the logged order, so orders outlive restarts and evictions.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 1800.0,
+        max_entries: int = 10000,
+        max_history: int = 20,
+        order_log: Optional[OrderLog] = None
+    ):
+        """Initialize the store.
+
+        Args:
+            ttl: Idle seconds before a session is evicted
+            max_entries: Maximum number of sessions kept
+            max_history: Maximum messages kept per session
+            order_log: Order log to restore orders from
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_history = max_history
+        self.order_log = order_log
+        self.evictions = 0
+
+    def get(self, session_id: str) -> Optional[SessionState]:
+        """Get a live session, or None if unknown or expired."""
+        raise NotImplementedError
+
+    def save(self, session: SessionState):
+        """Store a session after it was created or modified."""
+        raise NotImplementedError
+
+    def delete(self, session_id: str) -> bool:
+        """Delete a session. Returns True if it existed."""
+        raise NotImplementedError
+
+    def stats(self) -> Dict:
+        """Report session count, estimated memory and evictions."""
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def close(self):
+        """Release any resources held by the store."""
+
+    def get_or_create(self, session_id: str) -> SessionState:
+        """Get a live session, creating an empty one if needed.
+
+        Args:
+            session_id: Session ID
+
+        Returns:
+            Existing or new session
+        """
+        session = self.get(session_id)
+        if session is None:
+            session = self._new_session(session_id)
+            self.save(session)
+        return session
+
+    @contextmanager
+    def transaction(self, session_id: str) -> Iterator[SessionState]:
+        """Atomically read, modify and save a session.
+
+        Stores shared between processes hold a write lock for the duration,
+        so the body must not await anything.
+
+        Args:
+            session_id: Session ID (created if missing)
+
+        Yields:
+            Session to modify in place
+        """
+        session = self.get_or_create(session_id)
+        yield session
+        self.save(session)
+
+    def _new_session(self, session_id: str) -> SessionState:
+        session = SessionState(session_id, ConversationHistory(self.max_history))
+        order = self.order_log.order(session_id) if self.order_log else None
+        if order is not None:
+            session.lines = order.lines.copy()
+            session.total_cents = order.total_cents
+        return session
+
+    def _trim_history(self, session: SessionState):
+        # No-op unless the session was built elsewhere with another capacity
+        session.history.resize(self.max_history)
+
+
+class InMemorySessionStore(SessionStore):
+    """Process-local session store.
+
+    Sessions are kept in last-access order, so both TTL and LRU eviction
+    only ever look at the oldest entries.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 1800.0,
+        max_entries: int = 10000,
+        max_history: int = 20,
+        order_log: Optional[OrderLog] = None
+    ):
+        super().__init__(ttl, max_entries, max_history, order_log)
+        self._sessions: "OrderedDict[str, SessionState]" = OrderedDict()
+        self._last_access: Dict[str, float] = {}
+        self._sizes: Dict[str, int] = {}
+        self._total_bytes = 0
+
+    def get(self, session_id: str) -> Optional[SessionState]:
+        now = time.monotonic()
+        self._evict_expired(now)
+
+        session = self._sessions.get(session_id)
+        if session is not None:
+            self._sessions.move_to_end(session_id)
+            self._last_access[session_id] = now
+        return session
+
+    def save(self, session: SessionState):
+        session_id = session.session_id
+        self._trim_history(session)
+
+        size = estimate_session_bytes(session)
+        self._total_bytes += size - self._sizes.get(session_id, 0)
+        self._sizes[session_id] = size
+
+        self._sessions[session_id] = session
+        self._sessions.move_to_end(session_id)
+        self._last_access[session_id] = time.monotonic()
+
+        while len(self._sessions) > self.max_entries:
+            self._pop_oldest()
+
+    def delete(self, session_id: str) -> bool:
+        if session_id not in self._sessions:
+            return False
+        self._remove(session_id)
+        return True
+
+    def stats(self) -> Dict:
+        self._evict_expired(time.monotonic())
+        return {
+            "backend": "memory",
+            "sessions": len(self._sessions),
+            "estimated_bytes": self._total_bytes,
+            "evictions": self.evictions
+        }
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _evict_expired(self, now: float):
+        cutoff = now - self.ttl
+        while self._sessions:
+            oldest = next(iter(self._sessions))
+            if self._last_access[oldest] > cutoff:
+                break
+            self._pop_oldest()
+
+    def _pop_oldest(self):
+        self._remove(next(iter(self._sessions)))
+        self.evictions += 1
+
+    def _remove(self, session_id: str):
+        del self._sessions[session_id]
+        del self._last_access[session_id]
+        self._total_bytes -= self._sizes.pop(session_id)
+
+
+class SQLiteSessionStore(SessionStore):
+    """Session store backed by a SQLite file, so sessions survive restarts.
+
+    Sessions are stored as JSON; every `get` returns a fresh copy, so
+    changes are only persisted by `save` or `transaction`. The database runs
+    in WAL mode, so several worker processes can share one file and a
+    session stays consistent when requests hop between workers.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        ttl: float = 1800.0,
+        max_entries: int = 10000,
+        max_history: int = 20,
+        order_log: Optional[OrderLog] = None
+    ):
+        """Open (or create) the session database.
+
+        Args:
+            path: SQLite database file
+            ttl: Idle seconds before a session is evicted
+            max_entries: Maximum number of sessions kept
+            max_history: Maximum messages kept per session
+            order_log: Order log to restore orders from
+        """
+        super().__init__(ttl, max_entries, max_history, order_log)
+        self.path = path
+        self._saves = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path,
+            timeout=SQLITE_BUSY_TIMEOUT,
+            check_same_thread=False,
+            isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " session_id TEXT PRIMARY KEY,"
+            " data TEXT NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS sessions_last_access ON sessions (last_access)"
+        )
+
+    def get(self, session_id: str) -> Optional[SessionState]:
+        # Wall-clock time, since entries outlive the process
+        now = time.time()
+        with self._lock:
+            self._evict_expired(now)
+            row = self._conn.execute(
+                "SELECT data FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE sessions SET last_access = ? WHERE session_id = ?", (now, session_id)
+            )
+        return self._load(row[0])
+
+    def save(self, session: SessionState):
+        with self._lock:
+            self._write(session, time.time())
+
+    @contextmanager
+    def transaction(self, session_id: str) -> Iterator[SessionState]:
+        now = time.time()
+        with self._lock:
+            # Take the write lock up front so no other worker can interleave
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._evict_expired(now)
+                row = self._conn.execute(
+                    "SELECT data FROM sessions WHERE session_id = ?", (session_id,)
+                ).fetchone()
+                if row is None:
+                    session = self._new_session(session_id)
+                else:
+                    session = self._load(row[0])
+
+                yield session
+
+                self._write(session, now)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM sessions WHERE session_id = ?", (session_id,)
+            )
+        return cursor.rowcount > 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            self._evict_expired(time.time())
+            count, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM sessions"
+            ).fetchone()
+        return {
+            "backend": "sqlite",
+            "sessions": count,
+            "stored_bytes": size,
+            "evictions": self.evictions
+        }
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+    def _load(self, data: str) -> SessionState:
+        session = SessionState.from_json(data)
+        # Stored history holds only its entries; restore the full capacity
+        self._trim_history(session)
+        return session
+
+    def _write(self, session: SessionState, now: float):
+        self._trim_history(session)
+        self._conn.execute(
+            "INSERT INTO sessions (session_id, data, last_access) VALUES (?, ?, ?)"
+            " ON CONFLICT(session_id) DO UPDATE SET"
+            " data = excluded.data, last_access = excluded.last_access",
+            (session.session_id, session.to_json().decode(), now)
+        )
+        # The LRU overflow check scans the index, so amortize it
+        self._saves += 1
+        if self._saves % OVERFLOW_CHECK_INTERVAL == 0:
+            self._evict_overflow()
+
+    def _evict_expired(self, now: float):
+        cursor = self._conn.execute(
+            "DELETE FROM sessions WHERE last_access <= ?", (now - self.ttl,)
+        )
+        self.evictions += max(cursor.rowcount, 0)
+
+    def _evict_overflow(self):
+        cursor = self._conn.execute(
+            "DELETE FROM sessions WHERE session_id IN ("
+            " SELECT session_id FROM sessions ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+        self.evictions += max(cursor.rowcount, 0)
+
+
+def create_session_store(order_log: Optional[OrderLog] = None) -> SessionStore:
+    """Create the session store configured by environment variables.
+
+    SESSION_BACKEND selects "memory" (default) or "sqlite"; SESSION_DB_PATH,
+    SESSION_TTL, SESSION_MAX_ENTRIES and SESSION_MAX_HISTORY tune it.
+
+    Args:
+        order_log: Order log new sessions restore their order from
+
+    Returns:
+        Configured session store
+    """
+    backend = os.getenv("SESSION_BACKEND", "memory").lower()
+    options = {
+        "ttl": float(os.getenv("SESSION_TTL", "1800")),
+        "max_entries": int(os.getenv("SESSION_MAX_ENTRIES", "10000")),
+        "max_history": int(os.getenv("SESSION_MAX_HISTORY", "20")),
+        "order_log": order_log,
+    }
+
+    if backend == "sqlite":
+        return SQLiteSessionStore(os.getenv("SESSION_DB_PATH", "sessions.db"), **options)
+    if backend == "memory":
+        return InMemorySessionStore(**options)
+
+    raise ValueError(f"Unknown session backend: {backend}")
@@ -0,0 +1,120 @@
+"""Cold-start accounting: time and resident memory per startup phase."""
+
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+import os
+import resource
+import time
+
+
+def rss_bytes() -> int:
+    """Current resident set size of this process.
+
+    Reads /proc on Linux; elsewhere falls back to the peak RSS.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Kilobytes on Linux, bytes on macOS
+        return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+
+def process_age() -> Optional[float]:
+    """Seconds since this process started (Linux only), else None."""
+    try:
+        with open("/proc/self/stat") as f:
+            # Field 22, counted after the parenthesised command name
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    return uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+
+
+class StartupReport:
+    """Records how long each startup phase took and how much RSS it added.
+
+    The first phase, "interpreter", covers everything from process start
+    until the report is created (interpreter start-up and what the server
+    imported before the app, at clock-tick resolution). Phases timed with
+    `phase()` before `begin()` are the app's own imports, one per
+    subsystem; `begin()` adds a "server" phase for the time between the
+    last of them and startup, and the service phases follow.
+    """
+
+    def __init__(self, budget_ms: Optional[float] = None):
+        """Initialize the report.
+
+        Args:
+            budget_ms: Cold-start budget (if None, reads STARTUP_BUDGET_MS,
+                default 2000); exceeding it prints a warning
+        """
+        if budget_ms is None:
+            budget_ms = float(os.getenv("STARTUP_BUDGET_MS", "2000"))
+        self.budget_ms = budget_ms
+        age = process_age()
+        self.phases: List[Dict] = [{
+            "phase": "interpreter",
+            "ms": round(age * 1000, 1) if age is not None else None,
+            "rss_mb": round(rss_bytes() / 2 ** 20, 1)
+        }]
+        self._imports: Optional[List[Dict]] = None
+
+    def begin(self):
+        """Close the import phases; call first thing during startup.
+
+        If the app is started again in the same process (e.g. by repeated
+        in-process batch runs), the original import phases are kept.
+        """
+        if self._imports is None:
+            age = process_age()
+            if age is not None and self.phases[0]["ms"] is not None:
+                self.phases.append({
+                    "phase": "server",
+                    "ms": round(max(age * 1000 - self.total_ms, 0.0), 1),
+                    "rss_mb": round(
+                        rss_bytes() / 2 ** 20 - sum(p["rss_mb"] for p in self.phases), 1
+                    )
+                })
+            self._imports = self.phases
+        self.phases = list(self._imports)
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time a startup phase and the RSS it adds."""
+        rss = rss_bytes()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append({
+                "phase": name,
+                "ms": round((time.perf_counter() - start) * 1000, 1),
+                "rss_mb": round((rss_bytes() - rss) / 2 ** 20, 1)
+            })
+
+    @property
+    def total_ms(self) -> float:
+        return round(sum(p["ms"] or 0.0 for p in self.phases), 1)
+
+    def as_dict(self) -> Dict:
+        """Report for /health."""
+        return {
+            "total_ms": self.total_ms,
+            "budget_ms": self.budget_ms,
+            "rss_mb": round(rss_bytes() / 2 ** 20, 1),
+            "phases": self.phases
+        }
+
+    def log(self):
+        """Print the report, warning if the budget was exceeded."""
+        parts = ", ".join(
+            f"{p['phase']} {p['ms']} ms/{p['rss_mb']:+} MB" for p in self.phases
+        )
+        print(f"Startup: {self.total_ms} ms, {rss_bytes() / 2 ** 20:.1f} MB RSS ({parts})")
+        if self.budget_ms and self.total_ms > self.budget_ms:
+            print(f"Warning: startup took {self.total_ms} ms, over the "
+                  f"{self.budget_ms:.0f} ms budget (STARTUP_BUDGET_MS).")
@@ -0,0 +1,256 @@
+"""Compact in-memory session and order state.
+
+A worker can hold tens of thousands of live sessions, so they are slotted
+objects rather than Pydantic models (those stay at the API boundary, in
+`app.models`). Item and size names are interned to small integer ids, and
+an order is one flat integer array with a row of (item id, size id,
+quantity, unit cents) per line. Ordering the same item again, at the same
+size and price, raises that line's quantity instead of adding a row.
+"""
+
+from array import array
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import sys
+import threading
+import time
+
+from app.nlp.history import ConversationHistory
+from app.serialization import dumps, loads
+
+# (item, size or None, quantity, unit cents)
+Line = Tuple[str, Optional[str], int, int]
+
+# Array slots per order line
+_ROW = 4
+
+
+class Interner:
+    """Maps names to dense integer ids for the life of the process.
+
+    Id 0 stands for None. Ids never change, so they stay valid when the
+    menu is reloaded; the table only grows by the names ever ordered.
+    """
+
+    __slots__ = ("_ids", "_names", "_lock")
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._names: List[Optional[str]] = [None]
+        self._lock = threading.Lock()
+
+    def id(self, name: Optional[str]) -> int:
+        """Id of a name, assigning the next one on first sight."""
+        if name is None:
+            return 0
+        name_id = self._ids.get(name)
+        if name_id is None:
+            with self._lock:
+                name_id = self._ids.get(name)
+                if name_id is None:
+                    name_id = len(self._names)
+                    self._names.append(sys.intern(name))
+                    self._ids[name] = name_id
+        return name_id
+
+    def name(self, name_id: int) -> Optional[str]:
+        """Name of an id returned by `id`."""
+        return self._names[name_id]
+
+    def __len__(self) -> int:
+        return len(self._names) - 1
+
+
+NAMES = Interner()
+
+
+class OrderLines:
+    """Order lines packed into one array of interned ids and integers."""
+
+    __slots__ = ("_rows",)
+
+    def __init__(self, lines: Iterable[Line] = ()):
+        """Initialize the lines.
+
+        Args:
+            lines: Initial (item, size, quantity, unit cents) lines, kept
+                as given (not merged)
+        """
+        self._rows = array("q")
+        for item, size, quantity, unit_cents in lines:
+            self._rows.extend((NAMES.id(item), NAMES.id(size), quantity, unit_cents))
+
+    def add(self, item: str, size: Optional[str], quantity: int, unit_cents: int) -> int:
+        """Add a line, merging it into an existing one for the same item.
+
+        Args:
+            item: Item name
+            size: Size, or None
+            quantity: Units ordered
+            unit_cents: Price of one unit
+
+        Returns:
+            Index of the line that now holds the units
+        """
+        rows = self._rows
+        item_id = NAMES.id(item)
+        size_id = NAMES.id(size)
+        for offset in range(0, len(rows), _ROW):
+            if (
+                rows[offset] == item_id
+                and rows[offset + 1] == size_id
+                and rows[offset + 3] == unit_cents
+            ):
+                rows[offset + 2] += quantity
+                return offset // _ROW
+        rows.extend((item_id, size_id, quantity, unit_cents))
+        return len(rows) // _ROW - 1
+
+    def remove(self, index: int) -> Line:
+        """Remove the line at `index` and return it.
+
+        Raises:
+            IndexError: If there is no such line
+        """
+        line = self[index]
+        offset = index * _ROW
+        del self._rows[offset:offset + _ROW]
+        return line
+
+    def __getitem__(self, index: int) -> Line:
+        if not 0 <= index < len(self):
+            raise IndexError("order line index out of range")
+        offset = index * _ROW
+        item_id, size_id, quantity, unit_cents = self._rows[offset:offset + _ROW]
+        return NAMES.name(item_id), NAMES.name(size_id), quantity, unit_cents
+
+    def __len__(self) -> int:
+        return len(self._rows) // _ROW
+
+    def __iter__(self) -> Iterator[Line]:
+        rows = self._rows
+        name = NAMES.name
+        for offset in range(0, len(rows), _ROW):
+            yield name(rows[offset]), name(rows[offset + 1]), rows[offset + 2], rows[offset + 3]
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, OrderLines):
+            return NotImplemented
+        return self._rows == other._rows
+
+    def __repr__(self) -> str:
+        return f"OrderLines({list(self)!r})"
+
+    def copy(self) -> "OrderLines":
+        lines = OrderLines()
+        lines._rows = array("q", self._rows)
+        return lines
+
+    def total_cents(self) -> int:
+        """Sum of quantity x unit price over all lines."""
+        rows = self._rows
+        return sum(rows[i + 2] * rows[i + 3] for i in range(0, len(rows), _ROW))
+
+    def nbytes(self) -> int:
+        """Memory held by the lines (names are shared through the interner)."""
+        return sys.getsizeof(self) + sys.getsizeof(self._rows)
+
+
+class SessionState:
+    """One user's conversation history and order.
+
+    Attributes:
+        session_id: Session ID
+        history: Ring buffer of recent messages
+        lines: Order lines, merged per item
+        total_cents: Order total in integer cents
+        created_at: Creation time (epoch seconds)
+    """
+
+    __slots__ = ("session_id", "history", "lines", "total_cents", "created_at")
+
+    def __init__(
+        self,
+        session_id: str,
+        history: Optional[ConversationHistory] = None,
+        lines: Optional[OrderLines] = None,
+        total_cents: int = 0,
+        created_at: Optional[float] = None
+    ):
+        self.session_id = session_id
+        self.history = history if history is not None else ConversationHistory()
+        self.lines = lines if lines is not None else OrderLines()
+        self.total_cents = total_cents
+        self.created_at = created_at if created_at is not None else time.time()
+
+    @property
+    def total_price(self) -> float:
+        """Order total in currency units."""
+        return self.total_cents / 100
+
+    def add(self, item: str, size: Optional[str], quantity: int, unit_cents: int):
+        """Add units of an item to the order (see `OrderLines.add`)."""
+        self.lines.add(item, size, quantity, unit_cents)
+        self.total_cents += unit_cents * quantity
+
+    def remove(self, index: int) -> Line:
+        """Remove an order line by position.
+
+        Raises:
+            IndexError: If there is no such line
+        """
+        line = self.lines.remove(index)
+        self.total_cents -= line[2] * line[3]
+        return line
+
+    def nbytes(self) -> int:
+        """Approximate memory held by the session."""
+        return (
+            sys.getsizeof(self)
+            + sys.getsizeof(self.session_id)
+            + self.history.nbytes()
+            + self.lines.nbytes()
+        )
+
+    def to_json(self) -> bytes:
+        """Serialize for the SQLite session store."""
+        return dumps({
+            "session_id": self.session_id,
+            "history": self.history.to_list(),
+            "lines": [list(line) for line in self.lines],
+            "total_cents": self.total_cents,
+            "created_at": self.created_at,
+        })
+
+    @classmethod
+    def from_json(cls, data) -> "SessionState":
+        """Rebuild a session from `to_json` output.
+
+        Also reads sessions stored as the earlier Pydantic model, with
+        `order_items` priced in floats and, before history kept roles, a
+        `messages` list.
+        """
+        data = loads(data)
+        history = data.get("history", data.get("messages", []))
+
+        if "lines" in data:
+            lines = OrderLines(tuple(line) for line in data["lines"])
+        else:
+            lines = OrderLines(
+                (item["name"], item.get("size"), item.get("quantity", 1), round(item["price"] * 100))
+                for item in data.get("order_items", ())
+            )
+        total_cents = data.get("total_cents")
+        if total_cents is None:
+            total_cents = round(data.get("total_price", 0) * 100)
+        created_at = data.get("created_at")
+        if isinstance(created_at, str):
+            created_at = datetime.fromisoformat(created_at).timestamp()
+
+        return cls(
+            data["session_id"],
+            ConversationHistory.from_list(history),
+            lines,
+            total_cents,
+            created_at
+        )
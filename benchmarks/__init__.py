@@ -0,0 +1 @@
+"""Benchmarks and load tools for NoPickles.ai MVP."""
@@ -0,0 +1,88 @@
+"""Per-turn message analysis: separate scans vs the shared single-pass pipeline.
+
+    python -m benchmarks.bench_analysis
+
+The "separate" mode is the /chat path before the analysis pipeline: the
+intent classifier and the entity extractor each lowercase and scan the
+message, items are paired with sizes in list order, and a quantity is
+applied only when one item is named. The "pipeline" mode tokenizes once
+and binds sizes, quantities and add-ons to items by position. Reports
+microseconds per message on the transcripts and exact-line accuracy on
+multi-item orders.
+"""
+
+import argparse
+import time
+
+from app.menu import MENU_STORE
+from app.nlp.analysis import create_analysis_pipeline
+from app.nlp.entities import EntityExtractor
+from app.nlp.intent import IntentClassifier
+from benchmarks.transcripts import TRANSCRIPTS
+
+MESSAGES = [message for transcript in TRANSCRIPTS for message in transcript]
+
+# Message -> expected (item, size, quantity, add-ons) lines
+ORDERS = {
+    "two large coffees and a small tea": [("coffee", "large", 2, ()), ("tea", "small", 1, ())],
+    "a small tea and two large coffees": [("tea", "small", 1, ()), ("coffee", "large", 2, ())],
+    "3 bagels and 2 large teas": [("bagel", None, 3, ()), ("tea", "large", 2, ())],
+    "a coffee and a medium latte": [("coffee", None, 1, ()), ("latte", "medium", 1, ())],
+    "can i get a large coffee and a chocolate donut": [
+        ("coffee", "large", 1, ()), ("chocolate donut", None, 1, ())
+    ],
+    "i'd like two medium iced capps please": [("iced capp", "medium", 2, ())],
+    "one muffin, a large hot chocolate and 4 timbits": [
+        ("muffin", None, 1, ()), ("hot chocolate", "large", 1, ()), ("timbits", None, 4, ())
+    ],
+    "coffee, large": [("coffee", "large", 1, ())],
+    "a large coffee and a small coffee": [("coffee", "large", 1, ()), ("coffee", "small", 1, ())],
+    "a latte with an extra shot and soy milk": [("latte", None, 1, ("extra shot", "soy milk"))],
+    "two lattes with extra shot": [("latte", None, 2, ("extra shot",))],
+}
+
+
+def separate(classifier: IntentClassifier, extractor: EntityExtractor, text: str, menu):
+    """The former per-turn path: two scans, list-order pairing."""
+    classifier.score(text)
+    entities = extractor.extract(text, menu)
+    items = [e["value"] for e in entities if e["type"] in ("beverage", "food", "addon")]
+    sizes = [e["value"] for e in entities if e["type"] == "size"]
+    quantity = 1
+    if len(items) == 1:
+        quantity = next((int(e["value"]) for e in entities if e["type"] == "quantity"), 1) or 1
+    return [
+        (item, sizes[i] if i < len(sizes) else None, quantity, ())
+        for i, item in enumerate(items)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+
+    classifier = IntentClassifier()
+    extractor = EntityExtractor()
+    pipeline = create_analysis_pipeline(classifier, extractor)
+    menu = MENU_STORE.current
+    modes = {
+        "separate": lambda text: separate(classifier, extractor, text, menu),
+        "pipeline": lambda text: pipeline.analyze(text, menu).lines,
+    }
+
+    print(f"{'mode':>9} {'us/msg':>8} {'orders right':>13}")
+    for name, analyze in modes.items():
+        for message in MESSAGES:
+            analyze(message)  # warm up
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            for message in MESSAGES:
+                analyze(message)
+        us = (time.perf_counter() - start) / (args.rounds * len(MESSAGES)) * 1e6
+        right = sum(analyze(text) == lines for text, lines in ORDERS.items())
+        print(f"{name:>9} {us:>8.1f} {right:>6}/{len(ORDERS)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Cost of order analytics: incremental counters vs scanning every session.
+
+    python -m benchmarks.bench_analytics --sessions 1000 10000 100000
+
+For each session count, fills an in-memory session store with orders from
+the transcripts and feeds the same lines to `OrderAnalytics`. Reports the
+time to build the report both ways (a scan of all sessions, which is what
+/analytics would otherwise do on the event loop, vs `report()`), and the
+per-turn cost of `record()`.
+
+Then streams `--lines` transcript turns through the offline aggregator
+twice, at two input sizes, and reports the peak memory of each: it should
+not grow with the input.
+"""
+
+import argparse
+import random
+import time
+import tracemalloc
+import uuid
+from typing import Dict, Iterator, Tuple
+
+from app.analytics import OrderAnalytics, aggregate_transcripts
+from app.menu import MENU_STORE
+from app.sessions import InMemorySessionStore
+from benchmarks.transcripts import TRANSCRIPTS
+
+MESSAGES = [message for transcript in TRANSCRIPTS for message in transcript]
+
+
+def scan(store: InMemorySessionStore) -> Dict:
+    """Aggregates computed by iterating over every session's order."""
+    units: Dict[str, int] = {}
+    revenue: Dict[str, int] = {}
+    baskets = 0
+    for session in store._sessions.values():
+        if session.lines:
+            baskets += 1
+        for item, _, quantity, unit_cents in session.lines:
+            units[item] = units.get(item, 0) + quantity
+            revenue[item] = revenue.get(item, 0) + unit_cents * quantity
+    total_units = sum(units.values())
+    return {
+        "baskets": baskets,
+        "units": total_units,
+        "revenue": sum(revenue.values()) / 100,
+        "average_basket_units": total_units / baskets if baskets else 0.0,
+        "items": sorted(units.items(), key=lambda entry: -entry[1]),
+    }
+
+
+def timed(fn, repeat: int = 5) -> float:
+    """Best of `repeat` runs, in milliseconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def run_sessions(n: int) -> dict:
+    menu = MENU_STORE.current
+    items = menu.price_table.items
+    store = InMemorySessionStore(max_entries=n)
+    analytics = OrderAnalytics(items)
+    rng = random.Random(n)
+    recording = 0.0
+    turns = 0
+    for _ in range(n):
+        session = store.get_or_create(str(uuid.uuid4()))
+        for _ in range(rng.randint(1, 3)):
+            wanted = [(rng.choice(items), rng.choice(("small", "large", None)), rng.randint(1, 3))]
+            lines, _ = menu.price_order(wanted)
+            new_basket = not session.lines
+            for line in lines:
+                session.add(*line)
+            start = time.perf_counter()
+            analytics.record(lines, new_basket)
+            recording += time.perf_counter() - start
+            turns += 1
+        store.save(session)
+
+    scanned = scan(store)
+    reported = analytics.report()
+    assert scanned["units"] == reported["units"] and scanned["baskets"] == reported["baskets"]
+    return {
+        "scan_ms": timed(lambda: scan(store)),
+        "report_ms": timed(analytics.report),
+        "record_us": recording / turns * 1e6,
+    }
+
+
+def transcript_turns(n: int) -> Iterator[Tuple[str, str, float]]:
+    """`n` turns of distinct kiosk sessions, one second apart, generated lazily."""
+    start = time.time() - n
+    i = 0
+    while i < n:
+        for t, transcript in enumerate(TRANSCRIPTS):
+            for message in transcript:
+                if i == n:
+                    return
+                yield message, f"kiosk-{i // 40}-{t}", start + i
+                i += 1
+
+
+def offline_peak(n: int) -> Tuple[float, float]:
+    """(seconds, peak traced MB) to aggregate `n` streamed turns."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    aggregate_transcripts(transcript_turns(n), max_sessions=1000)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--lines", type=int, default=20000,
+                        help="Transcript turns for the larger offline run")
+    args = parser.parse_args()
+
+    print(f"{'sessions':>9} {'scan ms':>9} {'report ms':>10} {'record us':>10}")
+    for n in args.sessions:
+        result = run_sessions(n)
+        print(f"{n:>9} {result['scan_ms']:>9.2f} {result['report_ms']:>10.3f} "
+              f"{result['record_us']:>10.2f}")
+
+    print()
+    print(f"{'turns':>9} {'seconds':>9} {'peak MB':>8}")
+    for n in (args.lines // 10, args.lines):
+        seconds, peak = offline_peak(n)
+        print(f"{n:>9} {seconds:>9.2f} {peak:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Replay kiosk transcripts via per-turn /chat calls vs one /chat/batch request.
+
+    python -m benchmarks.bench_batch --sessions 200 --llm-latency 0.3
+
+Both modes replay the same sessions against a fresh server with a stub LLM.
+The per-turn mode uses `--clients` concurrent clients, each replaying one
+session at a time, which is how replays were done before the batch
+endpoint existed. Reports wall time, messages/s and whether both modes
+produced the same final totals.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+import httpx
+
+from benchmarks.common import start_server
+from benchmarks.stub_llm import StubServer
+from benchmarks.transcripts import TRANSCRIPTS
+
+
+def build_batch(sessions: int, prefix: str) -> list:
+    """Interleave turns of many sessions, as a fleet export would."""
+    transcripts = [
+        (f"{prefix}-{n}-{uuid.uuid4().hex[:8]}", TRANSCRIPTS[n % len(TRANSCRIPTS)])
+        for n in range(sessions)
+    ]
+    messages = []
+    for turn in range(max(len(t) for _, t in transcripts)):
+        for session_id, transcript in transcripts:
+            if turn < len(transcript):
+                messages.append({"message": transcript[turn], "session_id": session_id})
+    return messages
+
+
+async def per_turn(url: str, messages: list, clients: int) -> dict:
+    by_session = {}
+    for message in messages:
+        by_session.setdefault(message["session_id"], []).append(message)
+    queue = list(by_session.values())
+    totals = {}
+
+    async def client_loop(client):
+        while queue:
+            turns = queue.pop()
+            for message in turns:
+                response = await client.post(f"{url}/chat", json=message)
+                response.raise_for_status()
+                totals[message["session_id"]] = response.json()["total_price"]
+
+    async with httpx.AsyncClient(timeout=60) as client:
+        await asyncio.gather(*(client_loop(client) for _ in range(clients)))
+    return totals
+
+
+async def batched(url: str, messages: list) -> dict:
+    totals = {}
+    body = "\n".join(json.dumps(message) for message in messages)
+    async with httpx.AsyncClient(timeout=None) as client:
+        async with client.stream(
+            "POST", f"{url}/chat/batch", content=body,
+            headers={"Content-Type": "application/x-ndjson"}
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line:
+                    result = json.loads(line)
+                    totals[result["session_id"]] = result["total_price"]
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--clients", type=int, default=8,
+                        help="Concurrent clients in per-turn mode, and the batch's LLM cap")
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    url = f"http://127.0.0.1:{args.port}"
+    print(f"{'mode':>9} {'messages':>9} {'seconds':>8} {'msg/s':>8}")
+    results = {}
+    with StubServer(latency=args.llm_latency, port=args.port + 1) as stub:
+        for mode in ("per-turn", "batch"):
+            messages = build_batch(args.sessions, mode)
+            server = start_server(
+                args.port,
+                llm_url=stub.base_url,
+                LLM_CACHE_SIZE="0",
+                CHAT_BATCH_MAX_CONCURRENCY=str(args.clients)
+            )
+            try:
+                start = time.perf_counter()
+                if mode == "batch":
+                    totals = asyncio.run(batched(url, messages))
+                else:
+                    totals = asyncio.run(per_turn(url, messages, args.clients))
+                elapsed = time.perf_counter() - start
+            finally:
+                server.terminate()
+                server.wait()
+            # Compare totals by position, since session IDs differ per mode
+            results[mode] = sorted(totals.values())
+            print(f"{mode:>9} {len(messages):>9} {elapsed:>8.2f} {len(messages) / elapsed:>8.1f}")
+
+    same = results["per-turn"] == results["batch"]
+    print(f"final totals {'match' if same else 'DIFFER'} between modes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""Single-flight coalescing of identical concurrent LLM prompts, against the stub server.
+
+    python -m benchmarks.bench_coalescing --kiosks 64 --waves 5 --latency 0.3
+
+Each wave, every kiosk sends an opening turn drawn from a few popular lines
+within `--jitter` seconds of the others, as kiosks do in a rush. The reply
+cache is bypassed, so only calls that overlap in time can be shared. Runs
+the unary (`acomplete`) and streaming (`astream_reply`) paths with
+coalescing on and off, and reports upstream calls, collapsed requests and
+request latency.
+
+Then checks the edge cases under the same load: a failing upstream call
+reaches every joined caller as LLMUnavailable, stream readers that leave
+early do not cut the stream short for the others, and a stream every
+reader leaves is cancelled upstream with its admission slot released, even
+when readers close their subscriptions without reading a fragment. Exits
+non-zero if coalescing does not collapse the waves to one upstream call
+per distinct turn, or if any of these checks fails.
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import time
+
+from app.nlp.admission import AdmissionController, LLMUnavailable
+from app.nlp.chatbot import Chatbot
+from benchmarks.stub_llm import STUB_REPLY, StubServer
+
+OPENING_TURNS = ["hi", "a large double double", "can i get a medium iced capp", "what's good today?"]
+
+
+def make_chatbot(stub: StubServer, kiosks: int, coalesce: bool) -> Chatbot:
+    chatbot = Chatbot(
+        api_key="stub",
+        base_url=stub.base_url,
+        max_concurrency=kiosks,
+        reply_deadline=10,
+        # Queue every request: this measures upstream calls, not shedding
+        admission=AdmissionController(max_in_flight=kiosks, max_queue=kiosks, queue_timeout=60)
+    )
+    if not coalesce:
+        # Every request gets a key of its own
+        chatbot._prompt_key = lambda messages, stream=False: object()
+    return chatbot
+
+
+async def ask(chatbot: Chatbot, message: str, stream: bool, delay: float) -> tuple:
+    """Send one turn after `delay`; returns (reply or None on failure, seconds)."""
+    await asyncio.sleep(delay)
+    start = time.perf_counter()
+    try:
+        if stream:
+            reply = "".join([part async for part in chatbot.astream_reply(message, use_cache=False)])
+        else:
+            reply = await chatbot.acomplete(message, use_cache=False)
+    except LLMUnavailable:
+        reply = None
+    return reply, time.perf_counter() - start
+
+
+async def run_load(stub: StubServer, args, stream: bool, coalesce: bool) -> dict:
+    chatbot = make_chatbot(stub, args.kiosks, coalesce)
+    rng = random.Random(0)
+    calls_before = stub.app.state.calls
+    latencies = []
+    failures = 0
+    for _ in range(args.waves):
+        results = await asyncio.gather(*(
+            ask(chatbot, rng.choice(OPENING_TURNS), stream, rng.uniform(0, args.jitter))
+            for _ in range(args.kiosks)
+        ))
+        for reply, seconds in results:
+            failures += reply != STUB_REPLY
+            latencies.append(seconds)
+    await chatbot.aclose()
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "upstream_calls": stub.app.state.calls - calls_before,
+        "collapsed": chatbot.single_flight.collapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(0.99 * (len(latencies) - 1))] * 1000,
+        "failures": failures,
+    }
+
+
+def check_load(result: dict, args, coalesce: bool) -> bool:
+    """Every request succeeded, and upstream calls are what coalescing allows."""
+    if result["failures"]:
+        return False
+    if not coalesce:
+        return result["upstream_calls"] == result["requests"]
+    if args.jitter < args.latency:
+        # A wave's turns all overlap: one call per distinct turn
+        return result["upstream_calls"] <= args.waves * len(OPENING_TURNS)
+    return result["upstream_calls"] < result["requests"]
+
+
+async def check_errors(stub: StubServer, kiosks: int) -> tuple:
+    chatbot = make_chatbot(stub, kiosks, coalesce=True)
+    stub.app.state.fail = True
+    calls_before = stub.app.state.calls
+    try:
+        results = await asyncio.gather(
+            *(chatbot.acomplete("hi", use_cache=False) for _ in range(kiosks)),
+            *(
+                chatbot.astream_reply("hi", use_cache=False).__anext__()
+                for _ in range(kiosks)
+            ),
+            return_exceptions=True
+        )
+    finally:
+        stub.app.state.fail = False
+    await chatbot.aclose()
+    calls = stub.app.state.calls - calls_before
+    unavailable = sum(isinstance(r, LLMUnavailable) for r in results)
+    # One unary and one streaming call, each failing for all who joined it
+    ok = unavailable == len(results) and calls == 2
+    return ok, f"{unavailable}/{len(results)} callers got LLMUnavailable from {calls} upstream calls"
+
+
+async def check_cancellation(stub: StubServer, kiosks: int) -> tuple:
+    chatbot = make_chatbot(stub, kiosks, coalesce=True)
+
+    async def read(leave_after=None):
+        parts = []
+        fragments = chatbot.astream_reply("hi", use_cache=False)
+        async for part in fragments:
+            parts.append(part)
+            if leave_after is not None and len(parts) >= leave_after:
+                await fragments.aclose()
+                return None
+        return "".join(parts)
+
+    # Half the readers leave after two fragments; the rest read to the end
+    calls_before = stub.app.state.calls
+    results = await asyncio.gather(*(read(2 if i % 2 else None) for i in range(kiosks)))
+    complete = sum(r == STUB_REPLY for r in results)
+    shared_calls = stub.app.state.calls - calls_before
+
+    # Every reader leaves after the first fragment: the stream is cancelled
+    await asyncio.gather(*(read(1) for _ in range(kiosks)))
+    await asyncio.sleep(0.05)
+    released = chatbot.admission.in_flight == 0 and chatbot.single_flight.in_flight == 0
+    await chatbot.aclose()
+    ok = complete == kiosks - kiosks // 2 and shared_calls == 1 and released
+    return ok, (f"{complete}/{kiosks - kiosks // 2} remaining readers got the full reply "
+                f"from {shared_calls} upstream call(s); abandoned stream released: {released}")
+
+
+async def check_unread_close(stub: StubServer, kiosks: int) -> tuple:
+    """Subscriptions closed before their first fragment still release the stream."""
+    chatbot = make_chatbot(stub, kiosks, coalesce=True)
+    subscriptions = [
+        chatbot.single_flight.stream("unread", lambda: chatbot._stream_completion(
+            [{"role": "user", "content": "hi"}], None, asyncio.get_running_loop().time() + 10
+        ))
+        for _ in range(kiosks)
+    ]
+    await asyncio.sleep(0.05)
+    for subscription in subscriptions:
+        await subscription.aclose()
+    await asyncio.sleep(0.05)
+    released = chatbot.admission.in_flight == 0 and chatbot.single_flight.in_flight == 0
+    await chatbot.aclose()
+    return released, f"{kiosks} subscriptions closed unread; stream released: {released}"
+
+
+async def run(args) -> bool:
+    ok = True
+    with StubServer(latency=args.latency, port=args.port) as stub:
+        print(f"{'path':>7} {'coalesce':>9} {'requests':>9} {'upstream':>9} {'collapsed':>10} "
+              f"{'p50 ms':>8} {'p99 ms':>8} {'failures':>9}")
+        for stream in (False, True):
+            for coalesce in (False, True):
+                result = await run_load(stub, args, stream, coalesce)
+                ok &= check_load(result, args, coalesce)
+                print(f"{'stream' if stream else 'unary':>7} {'on' if coalesce else 'off':>9} "
+                      f"{result['requests']:>9} {result['upstream_calls']:>9} "
+                      f"{result['collapsed']:>10} {result['p50_ms']:>8.0f} "
+                      f"{result['p99_ms']:>8.0f} {result['failures']:>9}")
+        print()
+        for name, check in (("errors", check_errors), ("cancellation", check_cancellation),
+                            ("unread close", check_unread_close)):
+            passed, summary = await check(stub, args.kiosks)
+            ok &= passed
+            print(f"{name + ':':<14}{summary}{'' if passed else '  FAILED'}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--kiosks", type=int, default=64)
+    parser.add_argument("--waves", type=int, default=5)
+    parser.add_argument("--jitter", type=float, default=0.05,
+                        help="Seconds over which a wave's turns arrive")
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--port", type=int, default=8900)
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(run(args)) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Micro-benchmark the entity extractor against the per-item regex scan.
+
+    python -m benchmarks.bench_entities
+
+Times both extractors on the real menu and on synthetic menus of 1,000
+and 10,000 items.
+"""
+
+import argparse
+import re
+import time
+from typing import Dict, List
+
+from app.menu import DEFAULT_MENU_PATH, load_menu
+from app.nlp.entities import EntityExtractor
+
+# The bundled menu, as the fixed base of the synthetic menus
+MENU = load_menu(DEFAULT_MENU_PATH)
+
+MESSAGES = [
+    "hi, can i get a large coffee and a chocolate donut",
+    "i'd like two medium iced capps please",
+    "add an extra large hot chocolate with soy milk",
+    "what soups do you have today?",
+    "that's all, thanks",
+]
+
+
+class RegexExtractor:
+    """The original extractor: one uncompiled re.search per menu item."""
+    
+    def __init__(self, menu: Dict):
+        self.sizes = list(menu["size_multiplier"].keys())
+        self.menu_items = list(menu["prices"].keys())
+        self.quantity_patterns = [
+            (r"\b(\d+)\b", lambda m: int(m.group(1))),
+            (r"\b(a|an|one)\b", lambda m: 1),
+            (r"\btwo\b", lambda m: 2),
+            (r"\bthree\b", lambda m: 3),
+            (r"\bfour\b", lambda m: 4),
+            (r"\bfive\b", lambda m: 5),
+        ]
+    
+    def extract(self, text: str) -> List[Dict[str, str]]:
+        entities = []
+        text_lower = text.lower()
+        
+        for size in self.sizes:
+            if size in text_lower:
+                entities.append({"value": size, "type": "size"})
+        
+        for item in sorted(self.menu_items, key=len, reverse=True):
+            if re.search(r"\b" + re.escape(item) + r"\b", text_lower):
+                entities.append({"value": item, "type": "item"})
+        
+        for pattern, converter in self.quantity_patterns:
+            match = re.search(pattern, text_lower)
+            if match:
+                entities.append({"value": str(converter(match)), "type": "quantity"})
+                break
+        
+        return entities
+
+
+def synthetic_menu(size: int) -> Dict:
+    """Pad the real menu with generated multi-word items up to `size`."""
+    prices = dict(MENU["prices"])
+    flavours = ["maple", "honey", "berry", "caramel", "hazelnut", "matcha", "pumpkin"]
+    n = 0
+    while len(prices) < size:
+        prices[f"{flavours[n % len(flavours)]} special {n}"] = 2.0
+        n += 1
+    return {
+        "prices": prices,
+        "size_multiplier": MENU["size_multiplier"],
+        "beverages": MENU["beverages"]
+    }
+
+
+def time_per_call(extract, rounds: int) -> float:
+    """Return mean microseconds per extract() call."""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for message in MESSAGES:
+            extract(message)
+    return (time.perf_counter() - start) / (rounds * len(MESSAGES)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[len(MENU["prices"]), 1000, 10000])
+    parser.add_argument("--budget", type=float, default=1.0,
+                        help="Approximate seconds to spend per extractor and menu")
+    args = parser.parse_args()
+    
+    print(f"{'items':>7} {'regex us/msg':>14} {'matcher us/msg':>15} {'speedup':>8}")
+    for size in args.sizes:
+        menu = synthetic_menu(size)
+        regex = RegexExtractor(menu)
+        matcher = EntityExtractor(menu)
+        
+        # Calibrate rounds from one pass of the slower extractor
+        probe = time_per_call(regex.extract, 1)
+        rounds = max(1, int(args.budget * 1e6 / (probe * len(MESSAGES))))
+        
+        regex_us = time_per_call(regex.extract, rounds)
+        matcher_us = time_per_call(matcher.extract, max(rounds, 1000))
+        print(f"{size:>7} {regex_us:>14.1f} {matcher_us:>15.1f} {regex_us / matcher_us:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
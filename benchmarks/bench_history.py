@@ -0,0 +1,131 @@
+"""Prompt size and per-turn cost of conversation history: message list vs ring buffer.
+
+    python -m benchmarks.bench_history --turns 40
+
+Replays transcripts as long sessions with canned replies of varying length.
+The "list" mode is how history was kept before: a flat list of strings
+trimmed by `del` to SESSION_MAX_HISTORY, roles guessed by parity, the last
+six messages sent. The "ring" mode is the session ring buffer with a token
+budget. Reports mean and worst-case prompt tokens, wrong roles per prompt,
+and microseconds per turn to record the exchange and assemble the prompt.
+"""
+
+import argparse
+import time
+
+from app.nlp.chatbot import Chatbot
+from app.nlp.history import (
+    ASSISTANT, MESSAGE_OVERHEAD_TOKENS, USER, ConversationHistory, count_tokens
+)
+from benchmarks.transcripts import TRANSCRIPTS
+
+MESSAGES = [message for transcript in TRANSCRIPTS for message in transcript]
+
+REPLIES = [
+    "Sure!",
+    "Got it, I've added that to your order. Anything else?",
+    "That'll be $4.35. Would you like a donut or a muffin with your drink today? "
+    "We also have fresh bagels and croissants this morning.",
+]
+
+# The system prompt as it was hard-coded before
+LEGACY_SYSTEM_PROMPT = """You are a friendly AI assistant for a fast food ordering kiosk.
+Your role is to help customers order food and beverages in a natural, conversational way.
+
+Guidelines:
+- Be friendly, warm, and helpful
+- Keep responses concise (1-2 sentences)
+- Confirm orders clearly
+- Suggest items when appropriate
+- Use casual, conversational language
+- When mentioning prices, use format like "That'll be $X.XX"
+- Always be polite and patient
+
+Menu items include: coffee, cappuccino, latte, tea, donuts, bagels, sandwiches, wraps, and more.
+Available sizes: small, medium, large, extra large.
+"""
+
+
+def legacy_turn(bot: Chatbot, messages: list, user_message: str, reply, max_history: int):
+    """Build the prompt the old way, then record the exchange (reply may be None)."""
+    history = []
+    for msg in messages[-6:]:
+        role = "user" if len(history) % 2 == 0 else "assistant"
+        history.append({"role": role, "content": msg})
+    prompt = [{"role": "system", "content": LEGACY_SYSTEM_PROMPT}]
+    prompt.extend(history[-6:])
+    prompt.append({"role": "user", "content": user_message})
+
+    messages.append(user_message)
+    if reply is not None:
+        messages.append(reply)
+    if len(messages) > max_history:
+        del messages[:-max_history]
+    return prompt
+
+
+def ring_turn(bot: Chatbot, history: ConversationHistory, user_message: str, reply):
+    prompt = bot._build_messages(user_message, history)
+    history.append(USER, user_message)
+    if reply is not None:
+        history.append(ASSISTANT, reply)
+    return prompt
+
+
+def run(mode: str, bot: Chatbot, turns: int, sessions: int, max_history: int, skip_every: int):
+    user_lines = set(MESSAGES)
+    tokens = 0
+    max_tokens = 0
+    wrong_roles = 0
+    prompts = 0
+    elapsed = 0.0
+    for s in range(sessions):
+        messages = []
+        history = ConversationHistory(max_history)
+        for t in range(turns):
+            user_message = MESSAGES[(s + t) % len(MESSAGES)]
+            reply = REPLIES[(s * 7 + t) % len(REPLIES)]
+            # A turn whose reply was never recorded: only the user line lands
+            if skip_every and t % skip_every == skip_every - 1:
+                reply = None
+            start = time.perf_counter()
+            if mode == "list":
+                prompt = legacy_turn(bot, messages, user_message, reply, max_history)
+            else:
+                prompt = ring_turn(bot, history, user_message, reply)
+            elapsed += time.perf_counter() - start
+            prompt_tokens = sum(count_tokens(m["content"]) + MESSAGE_OVERHEAD_TOKENS for m in prompt)
+            tokens += prompt_tokens
+            max_tokens = max(max_tokens, prompt_tokens)
+            prompts += 1
+            for m in prompt[1:-1]:
+                expected = USER if m["content"] in user_lines else ASSISTANT
+                wrong_roles += m["role"] != expected
+    return {
+        "prompt_tokens": tokens / prompts,
+        "max_prompt_tokens": max_tokens,
+        "wrong_roles": wrong_roles / prompts,
+        "us_per_turn": elapsed / prompts * 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--max-history", type=int, default=20)
+    parser.add_argument("--skip-every", type=int, default=7,
+                        help="Drop the reply of every Nth turn, as a failed turn would (0 never)")
+    args = parser.parse_args()
+
+    bot = Chatbot(api_key="stub")
+    print(f"{'mode':>5} {'mean tokens':>12} {'max tokens':>11} {'wrong roles':>12} {'us/turn':>9}")
+    for mode in ("list", "ring"):
+        result = run(mode, bot, args.turns, args.sessions, args.max_history, args.skip_every)
+        print(f"{mode:>5} {result['prompt_tokens']:>12.1f} {result['max_prompt_tokens']:>11} "
+              f"{result['wrong_roles']:>12.2f} "
+              f"{result['us_per_turn']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
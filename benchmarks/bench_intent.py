@@ -0,0 +1,89 @@
+"""Check IntentClassifier parity with the per-pattern rules and time it.
+
+    python -m benchmarks.bench_intent
+
+Messages are fragments joined by spaces and by newlines. Exits non-zero if
+any score vector (and so any label or confidence) differs from the original
+re.search loop.
+"""
+
+import argparse
+import itertools
+import re
+import sys
+import time
+from typing import Dict, List
+
+from app.nlp.intent import IntentClassifier
+
+FRAGMENTS = [
+    "hi", "hello there", "good morning", "hey",
+    "i want", "i'd like", "can i get", "give me", "i'll have", "let me order",
+    "a large coffee", "two teas", "a chocolate donut", "an everything bagel",
+    "add", "also", "and another", "plus a", "another coffee",
+    "what", "how much is", "do you have", "is there", "which soups", "?",
+    "yes", "yeah sure", "okay", "that's right",
+    "no", "nope", "that's all", "i'm good", "nothing else",
+    "bye", "thanks", "thank you", "see you",
+    "", "um", "Large COFFEE!!", "muffin\nplease",
+]
+
+
+SEPARATORS = [" ", "\n"]
+
+
+def legacy_scores(intent_patterns: dict, text: str) -> Dict[str, int]:
+    """The original classifier's scores: re.search per raw pattern string."""
+    text = text.lower()
+    scores = {intent: 0 for intent in intent_patterns}
+    for intent, patterns in intent_patterns.items():
+        for pattern in patterns:
+            if re.search(pattern, text, re.IGNORECASE):
+                scores[intent] += 1
+    return scores
+
+
+def corpus(max_fragments: int) -> List[str]:
+    """All ordered combinations of up to `max_fragments` fragments, per separator."""
+    texts = []
+    for n in range(1, max_fragments + 1):
+        for combo in itertools.permutations(FRAGMENTS, n):
+            for separator in SEPARATORS if n > 1 else SEPARATORS[:1]:
+                texts.append(separator.join(combo))
+    return texts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fragments", type=int, default=2,
+                        help="Maximum fragments joined per synthetic message")
+    args = parser.parse_args()
+    
+    classifier = IntentClassifier()
+    texts = corpus(args.fragments)
+    
+    start = time.perf_counter()
+    expected = [legacy_scores(classifier.intent_patterns, text) for text in texts]
+    legacy_s = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    actual = classifier.score_many(texts)
+    batch_s = time.perf_counter() - start
+    
+    mismatches = [
+        (text, want, got) for text, want, got in zip(texts, expected, actual) if want != got
+    ]
+    
+    print(f"messages:  {len(texts)}")
+    print(f"legacy:    {len(texts) / legacy_s:,.0f} msg/s")
+    print(f"combined:  {len(texts) / batch_s:,.0f} msg/s ({legacy_s / batch_s:.1f}x)")
+    print(f"parity:    {len(texts) - len(mismatches)}/{len(texts)} score vectors match")
+    
+    for text, want, got in mismatches[:20]:
+        print(f"  {text!r}: expected {want}, got {got}")
+    
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Throughput of the rule-based and learned intent engines by batch size.
+
+    python -m benchmarks.bench_intent_engines --model intent_model.npz
+
+Classifies batches of the labeled examples, cycled to each `--batch-sizes`
+size, with both engines' `classify_many`, and reports the best msg/s of
+`--repeat` timed runs. Without `--model`, fits one on `--data` first (needs
+scikit-learn). The rules classify a batch one message at a time, so their
+rate barely moves with batch size; the model's fixed per-batch NumPy cost
+is amortized only over larger batches.
+"""
+
+import argparse
+import itertools
+import time
+from typing import Callable, List
+
+from app.nlp.intent import IntentClassifier
+from app.nlp.intent_model import LearnedIntentClassifier, load_examples, train
+
+
+def msg_per_second(classify_many: Callable, texts: List[str], repeat: int,
+                   min_seconds: float = 0.2) -> float:
+    """Best rate over `repeat` runs of at least `min_seconds` each."""
+    best = 0.0
+    for _ in range(repeat):
+        calls = 0
+        start = time.perf_counter()
+        while True:
+            classify_many(texts)
+            calls += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_seconds:
+                break
+        best = max(best, calls * len(texts) / elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data", default="data/intents.jsonl")
+    parser.add_argument("--model", help="Saved .npz model (default: fit one on --data)")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 43, 256, 1024, 4096])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    examples = load_examples(args.data)
+    model = LearnedIntentClassifier.load(args.model) if args.model else train(examples)
+    rules = IntentClassifier()
+    texts = [text for text, _ in examples]
+
+    print(f"{'batch':>6} {'rules msg/s':>12} {'learned msg/s':>14} {'ratio':>6}")
+    for size in args.batch_sizes:
+        batch = list(itertools.islice(itertools.cycle(texts), size))
+        rules_rate = msg_per_second(rules.classify_many, batch, args.repeat)
+        learned_rate = msg_per_second(model.classify_many, batch, args.repeat)
+        print(f"{size:>6} {rules_rate:>12,.0f} {learned_rate:>14,.0f} "
+              f"{learned_rate / rules_rate:>5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Compare sequential vs concurrent LLM throughput against the stub server.
+
+    python -m benchmarks.bench_llm_concurrency --requests 32 --latency 0.2
+
+The async path should finish N requests in roughly one stub latency
+(bounded by max concurrency) instead of N latencies. Exits non-zero unless
+the concurrent run takes under half the sequential time and the stub saw
+`--concurrency` calls in flight at once.
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+
+from app.nlp.admission import AdmissionController
+from app.nlp.chatbot import Chatbot, ERROR_RESPONSE
+from benchmarks.stub_llm import StubServer
+
+
+def run_sequential(chatbot: Chatbot, n: int) -> float:
+    start = time.perf_counter()
+    for i in range(n):
+        reply = chatbot.generate_response(f"a large coffee #{i}", use_cache=False)
+        assert reply != ERROR_RESPONSE, "stub call failed"
+    return time.perf_counter() - start
+
+
+async def run_concurrent(chatbot: Chatbot, n: int) -> float:
+    start = time.perf_counter()
+    replies = await asyncio.gather(*(
+        chatbot.agenerate_response(f"a large coffee #{i}", use_cache=False) for i in range(n)
+    ))
+    elapsed = time.perf_counter() - start
+    assert ERROR_RESPONSE not in replies, "stub call failed"
+    await chatbot.aclose()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--port", type=int, default=8900)
+    args = parser.parse_args()
+    
+    with StubServer(latency=args.latency, port=args.port) as stub:
+        chatbot = Chatbot(
+            api_key="stub",
+            base_url=stub.base_url,
+            max_concurrency=args.concurrency,
+            # Queue every request: this measures throughput, not shedding
+            admission=AdmissionController(
+                max_in_flight=args.concurrency,
+                max_queue=args.requests,
+                queue_timeout=60
+            )
+        )
+        seq = run_sequential(chatbot, args.requests)
+        stub.app.state.peak_in_flight = 0
+        conc = asyncio.run(run_concurrent(chatbot, args.requests))
+        peak = stub.app.state.peak_in_flight
+    
+    expected_peak = min(args.concurrency, args.requests)
+    print(f"requests={args.requests} latency={args.latency}s concurrency={args.concurrency}")
+    print(f"sequential: {seq:.2f}s  {args.requests / seq:.1f} req/s")
+    print(f"concurrent: {conc:.2f}s  {args.requests / conc:.1f} req/s")
+    print(f"speedup:    {seq / conc:.1f}x")
+    print(f"in flight:  {peak} at peak (expected {expected_peak})")
+    
+    failed = []
+    if conc >= seq / 2:
+        failed.append("concurrent run not under half the sequential time")
+    if peak < expected_peak:
+        failed.append("configured concurrency not reached")
+    for reason in failed:
+        print(f"FAILED: {reason}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Order log write cost, write amplification and recovery time.
+
+    python -m benchmarks.bench_order_log --sessions 100000
+
+Appends `--events` order additions per session (one in four carrying an
+idempotency key and a logged reply), syncing every `--group` appends as
+concurrent requests would. Write amplification is bytes written to disk
+(log plus snapshots) per byte of event payload; "rewrite" is what a store
+that saves the whole session on every change (the SQLite backend) would
+write for the same changes, with an empty history. Recovery is timed from
+the log alone, and from a snapshot plus a `--tail` of events logged after it.
+"""
+
+import argparse
+import asyncio
+import shutil
+import tempfile
+import time
+
+from app.orders import OrderLog
+from app.state import SessionState
+
+ITEMS = [("coffee", "large", 2, 210), ("tea", "small", 1, 150), ("bagel", None, 1, 300),
+         ("iced capp", "medium", 1, 330), ("chocolate donut", None, 3, 150)]
+
+REPLY = {
+    "response": "Got it! Added coffee to your order. Total: $4.20. Anything else?",
+    "intent": "order", "entities": [{"value": "coffee", "type": "beverage"}],
+    "total_price": 4.2, "session_id": "", "route": "template",
+}
+
+
+async def write(log: OrderLog, sessions: int, events: int, group: int, offset: int = 0) -> dict:
+    """Append the workload; returns seconds, events and the rewrite-model bytes."""
+    rewrite_bytes = 0
+    orders = {}
+    n = 0
+    start = time.perf_counter()
+    for e in range(events):
+        for s in range(sessions):
+            session_id = f"kiosk-{s:06d}-{offset}"
+            line = ITEMS[(s + e) % len(ITEMS)]
+            key = f"req-{offset}-{s}-{e}" if (s + e) % 4 == 0 else None
+            log.record_add(session_id, [line], key)
+            if key is not None:
+                log.record_reply(session_id, key, REPLY)
+
+            session = orders.get(session_id)
+            if session is None:
+                session = orders[session_id] = SessionState(session_id)
+            session.add(*line)
+            rewrite_bytes += len(session.to_json())
+
+            n += 1
+            if n % group == 0:
+                await log.sync()
+    await log.sync()
+    return {"seconds": time.perf_counter() - start, "events": n, "rewrite_bytes": rewrite_bytes}
+
+
+async def run(args) -> None:
+    directory = tempfile.mkdtemp(prefix="order-log-")
+    try:
+        # Log only: no snapshot during the write
+        log = OrderLog(directory, ttl=86400, snapshot_every=10 ** 12)
+        log.recover()
+        written = await write(log, args.sessions, args.events, args.group)
+        payload = log.log_bytes
+        await log.close()
+
+        print(f"{'sessions':>9} {'events':>8} {'events/s':>9} {'fsyncs':>7} {'B/event':>8}")
+        print(f"{args.sessions:>9} {written['events']:>8} "
+              f"{written['events'] / written['seconds']:>9.0f} {log.fsyncs:>7} "
+              f"{payload / written['events']:>8.1f}")
+
+        replay = OrderLog(directory, ttl=86400)
+        from_log = replay.recover()
+
+        # Snapshot, then log a tail on top of it
+        await replay.compact()
+        snapshot_bytes = replay.snapshot_bytes
+        await write(replay, args.tail, 1, args.group, offset=1)
+        tail_payload = replay.log_bytes
+        total_written = payload + replay.bytes_written
+        await replay.close()
+
+        from_snapshot = OrderLog(directory, ttl=86400).recover()
+
+        print()
+        print(f"{'write amplification':<24} {total_written / (payload + tail_payload):>8.2f}x"
+              f"  (log {payload / 1e6:.1f} MB + snapshot {snapshot_bytes / 1e6:.1f} MB)")
+        print(f"{'rewrite per change':<24} {written['rewrite_bytes'] / payload:>8.2f}x")
+        print()
+        print(f"{'recovery':<24} {'seconds':>8} {'sessions':>9} {'replayed':>9}")
+        print(f"{'log only':<24} {from_log['seconds']:>8.3f} {from_log['sessions']:>9} "
+              f"{from_log['events_replayed']:>9}")
+        print(f"{'snapshot + tail':<24} {from_snapshot['seconds']:>8.3f} {from_snapshot['sessions']:>9} "
+              f"{from_snapshot['events_replayed']:>9}")
+    finally:
+        shutil.rmtree(directory)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=100000)
+    parser.add_argument("--events", type=int, default=3, help="Order additions per session")
+    parser.add_argument("--group", type=int, default=64, help="Appends per fsync")
+    parser.add_argument("--tail", type=int, default=10000, help="Events logged after the snapshot")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
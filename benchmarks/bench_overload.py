@@ -0,0 +1,98 @@
+"""Drive /chat through an LLM latency spike and show admission control at work.
+
+    python -m benchmarks.bench_overload --kiosks 32 --phase 8 --spike-latency 6
+
+Three phases of `--phase` seconds each against a stub LLM: healthy
+(`--llm-latency`), spiking (`--spike-latency`), and healthy again. For each
+phase reports kiosk latency percentiles and the share of replies that fell
+back to a template, then the server's shed, deadline-miss and breaker
+counters from /metrics.
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+
+import httpx
+
+from benchmarks.common import percentiles, start_server
+from benchmarks.stub_llm import StubServer
+from benchmarks.transcripts import TRANSCRIPTS
+
+
+async def kiosk(client: httpx.AsyncClient, url: str, offset: int, stop_at: float, stats: dict):
+    """Replay transcripts back to back until the deadline."""
+    turn = offset
+    while time.monotonic() < stop_at:
+        session_id = str(uuid.uuid4())
+        for message in TRANSCRIPTS[turn % len(TRANSCRIPTS)]:
+            start = time.perf_counter()
+            try:
+                response = await client.post(url, json={"message": message, "session_id": session_id})
+                response.raise_for_status()
+            except httpx.HTTPError:
+                stats["errors"] += 1
+                continue
+            stats["latencies"].append(time.perf_counter() - start)
+            route = response.json()["route"]
+            stats["routes"][route] = stats["routes"].get(route, 0) + 1
+        turn += 1
+
+
+async def run_phase(url: str, kiosks: int, seconds: float) -> dict:
+    stats = {"latencies": [], "routes": {}, "errors": 0}
+    stop_at = time.monotonic() + seconds
+    async with httpx.AsyncClient(timeout=60) as client:
+        await asyncio.gather(*(
+            kiosk(client, f"{url}/chat", n, stop_at, stats) for n in range(kiosks)
+        ))
+    return stats
+
+
+def scrape(url: str, prefixes=("nopickles_llm_shed", "nopickles_llm_deadline", "nopickles_llm_breaker")):
+    text = httpx.get(f"{url}/metrics").text
+    return [line for line in text.splitlines() if line.startswith(prefixes)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--kiosks", type=int, default=32)
+    parser.add_argument("--phase", type=float, default=8.0, help="Seconds per phase")
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--spike-latency", type=float, default=6.0)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    url = f"http://127.0.0.1:{args.port}"
+    with StubServer(latency=args.llm_latency, port=args.port + 1) as stub:
+        server = start_server(
+            args.port,
+            llm_url=stub.base_url,
+            LLM_CACHE_SIZE="0",
+            LLM_BREAKER_COOLDOWN=str(args.phase / 2)
+        )
+        try:
+            print(f"{'phase':>8} {'turns':>6} {'p50 ms':>8} {'p99 ms':>8} {'fallback':>9} {'errors':>7}")
+            for name, latency in (
+                ("healthy", args.llm_latency),
+                ("spike", args.spike_latency),
+                ("recover", args.llm_latency)
+            ):
+                stub.app.state.latency = latency
+                stats = asyncio.run(run_phase(url, args.kiosks, args.phase))
+                pct = percentiles(stats["latencies"], points=(50, 99))
+                llm_turns = stats["routes"].get("llm", 0) + stats["routes"].get("fallback", 0)
+                share = stats["routes"].get("fallback", 0) / llm_turns if llm_turns else 0.0
+                print(f"{name:>8} {len(stats['latencies']):>6} {pct['p50_ms']:>8.1f} "
+                      f"{pct['p99_ms']:>8.1f} {share:>9.1%} {stats['errors']:>7}")
+            print()
+            for line in scrape(url):
+                print(line)
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
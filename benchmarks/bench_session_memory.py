@@ -0,0 +1,159 @@
+"""Memory per live session and per-turn order update cost: Pydantic models vs compact state.
+
+    python -m benchmarks.bench_session_memory --sessions 20000
+
+Builds `--sessions` sessions the way /chat does: `--turns` exchanges of
+history and an order update on each turn, with items repeated across turns.
+The "pydantic" mode is how sessions were kept before: a `Session` model with
+a list of `OrderItem` models, a datetime, and `Entity` models built on every
+turn. The "compact" mode is `app.state.SessionState`. Reports bytes per
+session measured with tracemalloc (with and without history, since history
+text is the same in both), the store's own estimate, and microseconds per
+order update.
+"""
+
+import argparse
+import time
+import tracemalloc
+import uuid
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel, ConfigDict, Field
+
+from app.nlp.history import ConversationHistory
+from app.state import SessionState
+from benchmarks.transcripts import TRANSCRIPTS
+
+MESSAGES = [message for transcript in TRANSCRIPTS for message in transcript]
+
+REPLY = "Got it, I've added that to your order. Anything else?"
+
+# (item, size, quantity, unit cents), as priced by the menu
+ITEMS = [("coffee", "large", 1, 210), ("tea", "small", 2, 150), ("bagel", None, 1, 300),
+         ("iced capp", "medium", 1, 330), ("chocolate donut", None, 3, 150)]
+
+ENTITY_TYPES = {"coffee": "beverage", "tea": "beverage", "iced capp": "beverage"}
+
+
+class LegacyEntity(BaseModel):
+    value: str
+    type: str
+
+
+class LegacyOrderItem(BaseModel):
+    name: str
+    size: Optional[str] = None
+    quantity: int = 1
+    price: float
+
+
+class LegacySession(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    session_id: str
+    history: ConversationHistory = Field(default_factory=ConversationHistory)
+    order_items: List[LegacyOrderItem] = Field(default_factory=list)
+    total_cents: int = 0
+    total_price: float = 0.0
+    created_at: datetime = Field(default_factory=datetime.now)
+
+
+def turn_lines(s: int, t: int) -> list:
+    """One or two lines per turn; sessions reorder the same few items."""
+    lines = [ITEMS[(s + t) % 3]]
+    if t % 2:
+        lines.append(ITEMS[3 + s % 2])
+    return lines
+
+
+def entities_of(lines: list) -> List[dict]:
+    entities = []
+    for item, size, _, _ in lines:
+        if size:
+            entities.append({"value": size, "type": "size"})
+        entities.append({"value": item, "type": ENTITY_TYPES.get(item, "food")})
+    return entities
+
+
+def legacy_update(session: LegacySession, lines: list, entities: List[dict]):
+    [LegacyEntity(**e) for e in entities]
+    for item, size, quantity, unit_cents in lines:
+        session.order_items.append(LegacyOrderItem(
+            name=item, size=size, quantity=quantity, price=unit_cents / 100
+        ))
+        session.total_cents += unit_cents * quantity
+    session.total_price = session.total_cents / 100
+
+
+def compact_update(session: SessionState, lines: list, entities: List[dict]):
+    for item, size, quantity, unit_cents in lines:
+        session.add(item, size, quantity, unit_cents)
+
+
+def build(mode: str, sessions: int, turns: int, with_history: bool) -> tuple:
+    """Returns (live sessions, seconds spent in order updates, updates)."""
+    live = []
+    elapsed = 0.0
+    updates = 0
+    for s in range(sessions):
+        session_id = str(uuid.uuid4())
+        history = ConversationHistory(20)
+        if mode == "pydantic":
+            session = LegacySession(session_id=session_id, history=history)
+            update = legacy_update
+        else:
+            session = SessionState(session_id, history)
+            update = compact_update
+        for t in range(turns):
+            lines = turn_lines(s, t)
+            entities = entities_of(lines)
+            start = time.perf_counter()
+            update(session, lines, entities)
+            elapsed += time.perf_counter() - start
+            updates += 1
+            if with_history:
+                # Distinct strings per session, as received
+                message = MESSAGES[(s + t) % len(MESSAGES)]
+                session.history.add_exchange(f"{message} #{s}", f"{REPLY} #{s}")
+        live.append(session)
+    return live, elapsed, updates
+
+
+def measure(mode: str, sessions: int, turns: int, with_history: bool) -> dict:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    live, elapsed, updates = build(mode, sessions, turns, with_history)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    result = {"bytes_per_session": (after - before) / sessions}
+    if mode == "compact":
+        result["estimate"] = sum(session.nbytes() for session in live) / sessions
+        result["lines"] = sum(len(session.lines) for session in live) / sessions
+    else:
+        result["lines"] = sum(len(session.order_items) for session in live) / sessions
+    # Timed again without tracemalloc, which slows allocation
+    _, elapsed, updates = build(mode, min(sessions, 5000), turns, False)
+    result["us_per_update"] = elapsed / updates * 1e6
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=20000)
+    parser.add_argument("--turns", type=int, default=6)
+    args = parser.parse_args()
+
+    print(f"{'mode':>9} {'history':>8} {'lines':>6} {'B/session':>10} {'estimate':>9} {'us/update':>10}")
+    for with_history in (False, True):
+        for mode in ("pydantic", "compact"):
+            result = measure(mode, args.sessions, args.turns, with_history)
+            estimate = f"{result['estimate']:.0f}" if "estimate" in result else "-"
+            print(f"{mode:>9} {'yes' if with_history else 'no':>8} {result['lines']:>6.1f} "
+                  f"{result['bytes_per_session']:>10.0f} {estimate:>9} "
+                  f"{result['us_per_update']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
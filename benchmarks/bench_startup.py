@@ -0,0 +1,91 @@
+"""Measure API cold start: import time and RSS per subsystem, then time to healthy.
+
+    python -m benchmarks.bench_startup --budget-ms 2000
+
+Imports each subsystem in a fresh interpreter, in dependency order, and
+reports the time and resident memory each one adds. Then starts the server
+(with a stub LLM key, so the chatbot is built too) and reads its startup
+report from /health. Exits non-zero if the server's startup exceeds the budget.
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.common import start_server
+
+# (subsystem, import statement), each adding to the ones before it
+SUBSYSTEMS = [
+    ("fastapi", "import fastapi, fastapi.staticfiles, fastapi.responses"),
+    ("pydantic models", "import app.models"),
+    ("menu", "import app.menu"),
+    ("nlp rules", "import app.nlp.intent, app.nlp.entities"),
+    ("sessions", "import app.sessions"),
+    ("api", "import app.api"),
+    ("openai chatbot", "import app.nlp.chatbot"),
+    ("numpy intent model", "import app.nlp.intent_model"),
+]
+
+# Runs in the child interpreter; prints one JSON line per subsystem
+_PROBE = """
+import json, sys, time
+from app.startup import rss_bytes
+for name, statement in json.loads(sys.argv[1]):
+    rss = rss_bytes()
+    start = time.perf_counter()
+    exec(statement)
+    print(json.dumps([name, time.perf_counter() - start, rss_bytes() - rss]))
+"""
+
+
+def import_costs() -> list:
+    """Import every subsystem in a fresh process and return (name, s, bytes)."""
+    output = subprocess.run(
+        [sys.executable, "-c", _PROBE, json.dumps(SUBSYSTEMS)],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return [json.loads(line) for line in output.splitlines() if line.startswith("[")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=2000.0)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    print(f"{'subsystem':<20} {'import ms':>10} {'rss MB':>8}")
+    for name, seconds, rss in import_costs():
+        print(f"{name:<20} {seconds * 1000:>10.1f} {rss / 2 ** 20:>+8.1f}")
+
+    start = time.monotonic()
+    server = start_server(
+        args.port,
+        llm_url="http://127.0.0.1:9/v1",
+        STARTUP_BUDGET_MS=str(args.budget_ms),
+        MENU_RELOAD_INTERVAL="0"
+    )
+    try:
+        healthy_s = time.monotonic() - start
+        report = httpx.get(f"http://127.0.0.1:{args.port}/health").json()["startup"]
+    finally:
+        server.terminate()
+        server.wait()
+
+    print()
+    print(f"{'phase':<20} {'ms':>10} {'rss MB':>8}")
+    for phase in report["phases"]:
+        print(f"{phase['phase']:<20} {phase['ms']:>10} {phase['rss_mb']:>+8.1f}")
+    print(f"{'total':<20} {report['total_ms']:>10} {report['rss_mb']:>8.1f}")
+    print(f"healthy after {healthy_s * 1000:.0f} ms (includes polling)")
+
+    if report["total_ms"] > args.budget_ms:
+        print(f"over budget: {report['total_ms']} ms > {args.budget_ms:.0f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
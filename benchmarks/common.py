@@ -0,0 +1,109 @@
+"""Shared helpers for benchmarks: server startup, percentiles and results."""
+
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+
+def start_server(
+    port: int,
+    workers: int = 1,
+    llm_url: Optional[str] = None,
+    **env_overrides: str
+) -> subprocess.Popen:
+    """Start `main.py` in production mode and wait until it is healthy.
+
+    Args:
+        port: Port to listen on
+        workers: Worker processes
+        llm_url: Stub completion base URL (None serves template replies)
+        **env_overrides: Extra environment variables for the server
+
+    Returns:
+        Running server process
+    """
+    env = dict(
+        os.environ,
+        PORT=str(port),
+        HOST="127.0.0.1",
+        DEBUG="False",
+        WORKERS=str(workers),
+        LOG_LEVEL="warning",
+        OPENAI_API_KEY="stub" if llm_url else "",
+        OPENAI_BASE_URL=llm_url or "",
+    )
+    env.update(env_overrides)
+    process = subprocess.Popen([sys.executable, "main.py"], env=env)
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health").status_code == 200:
+                return process
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+
+    process.terminate()
+    raise RuntimeError("server did not become healthy")
+
+
+def rss_mb(pid: int) -> Optional[float]:
+    """Resident set size of a process in MiB (Linux only)."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def percentiles(samples: List[float], points=(50, 95, 99)) -> Dict[str, float]:
+    """Nearest-rank percentiles of latency samples, in milliseconds."""
+    if not samples:
+        return {f"p{p}_ms": None for p in points}
+    ordered = sorted(samples)
+    return {
+        f"p{p}_ms": ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))] * 1000
+        for p in points
+    }
+
+
+def git_commit() -> Optional[str]:
+    """Current git commit, if run inside the repository."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(path: str, benchmark: str, results: Dict, config: Dict):
+    """Save benchmark results as JSON for later comparison.
+
+    Args:
+        path: Output file
+        benchmark: Benchmark name
+        results: Mapping of case name to metric values
+        config: Parameters the benchmark ran with
+    """
+    with open(path, "w") as f:
+        json.dump({
+            "benchmark": benchmark,
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "config": config,
+            "results": results,
+        }, f, indent=2)
+    print(f"wrote {path}")
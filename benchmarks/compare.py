@@ -0,0 +1,63 @@
+"""Compare two benchmark result files and flag regressions.
+
+    python -m benchmarks.compare results/base.json results/head.json --threshold 10
+
+Exits non-zero if any metric got worse by more than the threshold percent.
+"""
+
+import argparse
+import json
+import sys
+from typing import Optional
+
+# Metric name suffixes where a larger value is better; all others
+# (latencies, memory) are better when smaller
+HIGHER_IS_BETTER = ("ops_per_sec", "rps")
+
+# Metrics that are reported for context but never gate
+INFORMATIONAL = ("requests", "errors", "rss_start_mb", "rss_end_mb")
+
+
+def change_pct(metric: str, base: float, head: float) -> Optional[float]:
+    """Percent change where positive always means worse."""
+    if not base:
+        return None
+    delta = (head - base) / abs(base) * 100
+    return -delta if metric.endswith(HIGHER_IS_BETTER) else delta
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="Percent worsening that counts as a regression")
+    args = parser.parse_args()
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.head) as f:
+        head = json.load(f)
+
+    print(f"{base['benchmark']}: {base.get('commit')} -> {head.get('commit')}")
+    regressions = 0
+    for case, metrics in head["results"].items():
+        base_metrics = base["results"].get(case)
+        if base_metrics is None:
+            continue
+        for metric, value in metrics.items():
+            if metric in INFORMATIONAL or value is None or base_metrics.get(metric) is None:
+                continue
+            worse = change_pct(metric, base_metrics[metric], value)
+            if worse is None:
+                continue
+            flag = "REGRESSION" if worse > args.threshold else ""
+            regressions += bool(flag)
+            print(f"  {case:<30} {metric:<14} {base_metrics[metric]:>12.2f} -> {value:>12.2f} "
+                  f"({-worse:+.1f}%) {flag}")
+
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
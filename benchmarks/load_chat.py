@@ -0,0 +1,101 @@
+"""End-to-end /chat load generator against a stub LLM.
+
+    python -m benchmarks.load_chat --kiosks 32 --duration 20 --llm-latency 0.3 \
+        --json results/load.json
+
+Starts the stub completion server and `main.py`, then has concurrent kiosks
+replay multi-turn transcripts in fresh sessions. Reports throughput,
+latency percentiles and server memory growth.
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+
+import httpx
+
+from benchmarks.common import percentiles, rss_mb, start_server, write_results
+from benchmarks.stub_llm import StubServer
+from benchmarks.transcripts import TRANSCRIPTS
+
+
+async def kiosk(client: httpx.AsyncClient, url: str, offset: int, stop_at: float, stats: dict):
+    """Replay transcripts back to back until the deadline."""
+    turn = offset
+    while time.monotonic() < stop_at:
+        session_id = str(uuid.uuid4())
+        for message in TRANSCRIPTS[turn % len(TRANSCRIPTS)]:
+            start = time.perf_counter()
+            try:
+                response = await client.post(url, json={"message": message, "session_id": session_id})
+                response.raise_for_status()
+            except httpx.HTTPError:
+                stats["errors"] += 1
+                continue
+            stats["latencies"].append(time.perf_counter() - start)
+        turn += 1
+
+
+async def drive(url: str, kiosks: int, duration: float) -> dict:
+    stats = {"latencies": [], "errors": 0}
+    async with httpx.AsyncClient(timeout=60) as client:
+        start = time.monotonic()
+        stop_at = start + duration
+        await asyncio.gather(*(kiosk(client, url, i, stop_at, stats) for i in range(kiosks)))
+        stats["elapsed"] = time.monotonic() - start
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--kiosks", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--llm-latency", type=float, default=0.3,
+                        help="Stub LLM latency in seconds (0 = no LLM, template replies)")
+    parser.add_argument("--endpoint", default="/chat")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    stub = StubServer(latency=args.llm_latency, port=args.port + 1) if args.llm_latency else None
+    if stub:
+        stub.__enter__()
+
+    try:
+        server = start_server(args.port, llm_url=stub.base_url if stub else None)
+        url = f"http://127.0.0.1:{args.port}{args.endpoint}"
+        try:
+            if args.warmup:
+                asyncio.run(drive(url, args.kiosks, args.warmup))
+            rss_start = rss_mb(server.pid)
+            stats = asyncio.run(drive(url, args.kiosks, args.duration))
+            rss_end = rss_mb(server.pid)
+        finally:
+            server.terminate()
+            server.wait()
+    finally:
+        if stub:
+            stub.__exit__(None, None, None)
+
+    requests = len(stats["latencies"])
+    result = {
+        "requests": requests,
+        "errors": stats["errors"],
+        "rps": requests / stats["elapsed"],
+        **percentiles(stats["latencies"]),
+        "rss_start_mb": rss_start,
+        "rss_end_mb": rss_end,
+        "rss_growth_mb": rss_end - rss_start if rss_start and rss_end else None,
+    }
+
+    for key, value in result.items():
+        print(f"{key:<14} {value:.2f}" if isinstance(value, float) else f"{key:<14} {value}")
+
+    if args.json:
+        write_results(args.json, "load_chat", {args.endpoint: result}, vars(args))
+
+
+if __name__ == "__main__":
+    main()
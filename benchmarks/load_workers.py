@@ -0,0 +1,106 @@
+"""Load-test /chat across worker counts with shared SQLite sessions.
+
+    python -m benchmarks.load_workers --workers 1 2 4 --kiosks 32 --duration 10
+
+Starts `main.py` in production mode for each worker count, drives it with
+concurrent kiosks replaying a multi-turn order on new connections (so turns
+hop between workers), and checks every kiosk's final total.
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import uuid
+
+import httpx
+
+from app.menu import MenuService
+from benchmarks.common import start_server
+from benchmarks.stub_llm import StubServer
+
+# (message, [(item, size)] it adds)
+TRANSCRIPT = [
+    ("hi there", []),
+    ("i'd like a large coffee", [("coffee", "large")]),
+    ("can i get a chocolate donut", [("chocolate donut", None)]),
+    ("i want a medium latte", [("latte", "medium")]),
+    ("that's all, thanks", []),
+]
+
+EXPECTED_TOTAL = sum(
+    MenuService.get_item_price(item, size) for _, items in TRANSCRIPT for item, size in items
+)
+
+
+async def kiosk(client: httpx.AsyncClient, url: str, stop_at: float, stats: dict):
+    """Replay the transcript in fresh sessions until the deadline."""
+    while time.monotonic() < stop_at:
+        session_id = str(uuid.uuid4())
+        total = 0.0
+        for message, _ in TRANSCRIPT:
+            response = await client.post(url, json={"message": message, "session_id": session_id})
+            response.raise_for_status()
+            total = response.json()["total_price"]
+            stats["requests"] += 1
+
+        if abs(total - EXPECTED_TOTAL) > 1e-6:
+            stats["inconsistent"] += 1
+        stats["orders"] += 1
+
+
+async def drive(port: int, kiosks: int, duration: float) -> dict:
+    # No keep-alive, so consecutive turns land on different workers
+    limits = httpx.Limits(max_keepalive_connections=0)
+    stats = {"requests": 0, "orders": 0, "inconsistent": 0}
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        stop_at = time.monotonic() + duration
+        start = time.monotonic()
+        await asyncio.gather(*(
+            kiosk(client, f"http://127.0.0.1:{port}/chat", stop_at, stats) for _ in range(kiosks)
+        ))
+        stats["elapsed"] = time.monotonic() - start
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--kiosks", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--llm-latency", type=float, default=0.0,
+                        help="Serve replies from a stub LLM with this latency (0 = templates)")
+    args = parser.parse_args()
+
+    stub = StubServer(latency=args.llm_latency, port=args.port + 1) if args.llm_latency else None
+    if stub:
+        stub.__enter__()
+
+    print(f"{'workers':>7} {'req/s':>9} {'orders':>7} {'inconsistent':>13}")
+    try:
+        for workers in args.workers:
+            with tempfile.TemporaryDirectory() as tmp:
+                server = start_server(
+                    args.port,
+                    workers=workers,
+                    llm_url=stub.base_url if stub else None,
+                    SESSION_BACKEND="sqlite",
+                    SESSION_DB_PATH=os.path.join(tmp, "sessions.db")
+                )
+                try:
+                    stats = asyncio.run(drive(args.port, args.kiosks, args.duration))
+                finally:
+                    server.terminate()
+                    server.wait()
+
+            rps = stats["requests"] / stats["elapsed"]
+            print(f"{workers:>7} {rps:>9.1f} {stats['orders']:>7} {stats['inconsistent']:>13}")
+    finally:
+        if stub:
+            stub.__exit__(None, None, None)
+
+
+if __name__ == "__main__":
+    main()
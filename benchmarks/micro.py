@@ -0,0 +1,114 @@
+"""Micro-benchmarks for the NLP and menu hot paths.
+
+    python -m benchmarks.micro --json results/micro.json
+
+Each case reports operations per second and microseconds per operation.
+"""
+
+import argparse
+import time
+from typing import Callable, Dict
+
+from app.menu import MENU_STORE, MenuService
+from app.nlp.analysis import create_analysis_pipeline
+from app.nlp.entities import EntityExtractor
+from app.nlp.intent import IntentClassifier
+from benchmarks.common import write_results
+from benchmarks.transcripts import TRANSCRIPTS
+
+MESSAGES = [message for transcript in TRANSCRIPTS for message in transcript]
+
+
+def measure(fn: Callable[[], None], ops_per_call: int, budget: float) -> Dict[str, float]:
+    """Call fn repeatedly for about `budget` seconds.
+
+    Args:
+        fn: Benchmark body
+        ops_per_call: Operations performed by one fn() call
+        budget: Seconds to run
+
+    Returns:
+        ops_per_sec and us_per_op
+    """
+    fn()  # warm up
+    calls = 0
+    start = time.perf_counter()
+    deadline = start + budget
+    while time.perf_counter() < deadline:
+        fn()
+        calls += 1
+    elapsed = time.perf_counter() - start
+    ops = calls * ops_per_call
+    return {"ops_per_sec": ops / elapsed, "us_per_op": elapsed / ops * 1e6}
+
+
+def cases() -> Dict[str, tuple]:
+    classifier = IntentClassifier()
+    extractor = EntityExtractor()
+    pipeline = create_analysis_pipeline(classifier, extractor)
+    entities = [extractor.extract(message) for message in MESSAGES]
+    lookups = [("coffee", "large"), ("Iced Capp ", "medium"), ("blt", None), ("unknown", "small")]
+
+    def classify():
+        for message in MESSAGES:
+            classifier.classify(message)
+
+    def classify_many():
+        classifier.classify_many(MESSAGES)
+
+    def extract():
+        for message in MESSAGES:
+            extractor.extract(message)
+
+    def items_and_sizes():
+        for found in entities:
+            extractor.get_items_and_sizes(found)
+
+    def analyze():
+        menu = MENU_STORE.current
+        for message in MESSAGES:
+            pipeline.analyze(message, menu)
+
+    def get_item_price():
+        for item, size in lookups:
+            MenuService.get_item_price(item, size)
+
+    def price_order():
+        MenuService.price_order(
+            (item, size, 1) for item, size in lookups
+        )
+
+    def search_item():
+        for query in ("capp", "donut", "chicken", "pizza"):
+            MenuService.search_item(query)
+
+    return {
+        "intent.classify": (classify, len(MESSAGES)),
+        "intent.classify_many": (classify_many, len(MESSAGES)),
+        "entities.extract": (extract, len(MESSAGES)),
+        "entities.get_items_and_sizes": (items_and_sizes, len(MESSAGES)),
+        "analysis.analyze": (analyze, len(MESSAGES)),
+        "menu.get_item_price": (get_item_price, len(lookups)),
+        "menu.price_order": (price_order, len(lookups)),
+        "menu.search_item": (search_item, 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget", type=float, default=1.0, help="Seconds per case")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'case':<30} {'ops/s':>12} {'us/op':>9}")
+    for name, (fn, ops) in cases().items():
+        results[name] = measure(fn, ops, args.budget)
+        print(f"{name:<30} {results[name]['ops_per_sec']:>12,.0f} {results[name]['us_per_op']:>9.2f}")
+
+    if args.json:
+        write_results(args.json, "micro", results, vars(args))
+
+
+if __name__ == "__main__":
+    main()
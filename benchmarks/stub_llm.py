@@ -0,0 +1,134 @@
+"""Local stub of the OpenAI chat completions API with configurable latency.
+
+Run standalone:
+    python -m benchmarks.stub_llm --port 8900 --latency 0.2
+
+Then point the app at it with OPENAI_BASE_URL=http://127.0.0.1:8900/v1.
+"""
+
+import argparse
+import asyncio
+import json
+import threading
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+STUB_REPLY = "Sure thing! Anything else I can get for you?"
+
+
+def create_app(latency: float = 0.2) -> FastAPI:
+    """Build a stub completion app.
+    
+    Args:
+        latency: Seconds to wait before answering each completion; streamed
+            completions spread it evenly across their chunks
+        
+    Returns:
+        FastAPI application serving /v1/chat/completions; set
+        `state.fail` to answer every call with a 500 after the latency.
+        `state.peak_in_flight` is the most unary calls seen at once
+    """
+    stub = FastAPI(title="Stub LLM")
+    stub.state.latency = latency
+    stub.state.calls = 0
+    stub.state.fail = False
+    stub.state.in_flight = 0
+    stub.state.peak_in_flight = 0
+    
+    @stub.post("/v1/chat/completions")
+    async def completions(request: Request):
+        body = await request.json()
+        stub.state.calls += 1
+        completion_id = f"chatcmpl-stub-{stub.state.calls}"
+        
+        if stub.state.fail:
+            await asyncio.sleep(stub.state.latency)
+            return JSONResponse({"error": {"message": "stub failure"}}, status_code=500)
+        
+        if body.get("stream"):
+            return StreamingResponse(
+                _stream_chunks(completion_id, body.get("model", "stub"), stub.state.latency),
+                media_type="text/event-stream"
+            )
+        
+        stub.state.in_flight += 1
+        stub.state.peak_in_flight = max(stub.state.peak_in_flight, stub.state.in_flight)
+        try:
+            await asyncio.sleep(stub.state.latency)
+        finally:
+            stub.state.in_flight -= 1
+        
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": STUB_REPLY},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        }
+    
+    return stub
+
+
+async def _stream_chunks(completion_id: str, model: str, latency: float):
+    """Yield the stub reply word by word as OpenAI SSE chunks."""
+    words = STUB_REPLY.split(" ")
+    for i, word in enumerate(words):
+        await asyncio.sleep(latency / len(words))
+        chunk = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "delta": {"content": word if i == 0 else " " + word},
+                "finish_reason": None
+            }]
+        }
+        yield f"data: {json.dumps(chunk)}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+class StubServer:
+    """Run the stub completion server in a background thread."""
+    
+    def __init__(self, latency: float = 0.2, host: str = "127.0.0.1", port: int = 8900):
+        self.app = create_app(latency)
+        self.host = host
+        self.port = port
+        self._server = uvicorn.Server(
+            uvicorn.Config(self.app, host=host, port=port, log_level="warning")
+        )
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+    
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+    
+    def __enter__(self):
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        return self
+    
+    def __exit__(self, *exc):
+        self._server.should_exit = True
+        self._thread.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.2)
+    args = parser.parse_args()
+    
+    uvicorn.run(create_app(args.latency), host=args.host, port=args.port, log_level="warning")
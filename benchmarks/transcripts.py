@@ -0,0 +1,39 @@
+"""Realistic multi-turn kiosk transcripts for load tests."""
+
+TRANSCRIPTS = [
+    [
+        "hi there",
+        "i'd like a large coffee",
+        "can i get a chocolate donut",
+        "that's all, thanks",
+    ],
+    [
+        "good morning",
+        "can i get a medium double double and a bagel",
+        "what muffins do you have?",
+        "ok, a muffin too",
+        "no that's it",
+        "bye",
+    ],
+    [
+        "hey",
+        "two small teas please",
+        "add a blt",
+        "how much is that?",
+        "yes",
+        "thank you",
+    ],
+    [
+        "i want an extra large iced capp",
+        "and a grilled cheese",
+        "is there soy milk?",
+        "add soy milk",
+        "nope, that's all",
+    ],
+    [
+        "hello",
+        "do you have soup today?",
+        "i'll have a soup and a small latte",
+        "thanks, see you",
+    ],
+]
@@ -10,10 +10,33 @@ load_dotenv()
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 8000))
     host = os.getenv("HOST", "0.0.0.0")
-    
-    uvicorn.run(
-        "app.api:app",
-        host=host,
-        port=port,
-        reload=True
-    )
+    debug = os.getenv("DEBUG", "False").lower() in ("1", "true", "yes")
+    workers = int(os.getenv("WORKERS", 1))
+
+    if debug and workers == 1:
+        # Development: single process with auto-reload
+        uvicorn.run(
+            "app.api:app",
+            host=host,
+            port=port,
+            reload=True
+        )
+    else:
+        # Production: N worker processes, no reload, drain in-flight
+        # requests for up to GRACEFUL_TIMEOUT seconds on shutdown
+        if workers > 1 and os.getenv("SESSION_BACKEND", "memory").lower() == "memory":
+            print("Warning: in-memory sessions are not shared between workers. "
+                  "Set SESSION_BACKEND=sqlite when WORKERS > 1.")
+        if workers > 1 and os.getenv("ORDER_LOG_DIR"):
+            print("Warning: the order log belongs to a single process. "
+                  "Unset ORDER_LOG_DIR or run with WORKERS=1.")
+
+        uvicorn.run(
+            "app.api:app",
+            host=host,
+            port=port,
+            workers=workers,
+            reload=False,
+            timeout_graceful_shutdown=int(os.getenv("GRACEFUL_TIMEOUT", 30)),
+            log_level=os.getenv("LOG_LEVEL", "info")
+        )
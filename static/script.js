@@ -1,6 +1,5 @@
 // Session management
 let sessionId = null;
-let orderItems = [];
 
 // DOM elements
 const chatMessages = document.getElementById('chatMessages');
@@ -33,36 +32,15 @@ async function handleSubmit(e) {
     messageInput.value = '';
     
     try {
-        // Send message to API
-        const response = await fetch('/chat', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({
-                message: message,
-                session_id: sessionId
-            })
-        });
-        
-        if (!response.ok) {
-            throw new Error('Network response was not ok');
+        // Send over the kiosk WebSocket, or stream over HTTP if unavailable
+        const turn = createTurn();
+        try {
+            await sendOverSocket(message, turn.onEvent);
+        } catch (socketError) {
+            if (turn.started()) throw socketError;
+            await sendOverHttp(message, turn.onEvent);
         }
         
-        const data = await response.json();
-        
-        // Update session ID
-        sessionId = data.session_id;
-        
-        // Add bot response to chat
-        addMessage(data.response, 'bot');
-        
-        // Update order summary
-        updateOrderSummary(data.entities, data.total_price);
-        
-        // Show debug info (optional)
-        showDebugInfo(data);
-        
     } catch (error) {
         console.error('Error:', error);
         addMessage('Sorry, I encountered an error. Please try again.', 'bot');
@@ -74,55 +52,181 @@ async function handleSubmit(e) {
     }
 }
 
-// Add message to chat
+// Track the bot reply for one turn across meta/token/done events
+function createTurn() {
+    let botContent = null;
+    let replyText = '';
+    
+    return {
+        started: () => botContent !== null,
+        onEvent: (event, data) => {
+            if (event === 'meta') {
+                // Update session ID
+                sessionId = data.session_id;
+                
+                // Update order summary before the reply arrives
+                updateOrderSummary(data.order, data.total_price);
+                
+                // Show debug info (optional)
+                showDebugInfo(data);
+                
+                botContent = addMessage('', 'bot');
+            } else if (event === 'token') {
+                replyText += data.text;
+                setMessageText(botContent, replyText, 'bot');
+                chatMessages.scrollTop = chatMessages.scrollHeight;
+            } else if (event === 'done') {
+                setMessageText(botContent, data.response, 'bot');
+            }
+        }
+    };
+}
+
+// Persistent kiosk connection, opened on first use and after idle close
+let socket = null;
+let socketReady = null;
+let socketHandler = null;
+
+function openSocket() {
+    if (socket && socket.readyState <= WebSocket.OPEN) return socketReady;
+    
+    const protocol = location.protocol === 'https:' ? 'wss:' : 'ws:';
+    const query = sessionId ? `?session_id=${encodeURIComponent(sessionId)}` : '';
+    socket = new WebSocket(`${protocol}//${location.host}/ws/chat${query}`);
+    
+    socketReady = new Promise((resolve, reject) => {
+        socket.onopen = () => resolve();
+        socket.onerror = () => reject(new Error('WebSocket unavailable'));
+    });
+    
+    socket.onmessage = (msg) => {
+        const data = JSON.parse(msg.data);
+        if (data.type === 'session') {
+            sessionId = data.session_id;
+        } else if (socketHandler) {
+            socketHandler(data.type, data);
+        }
+    };
+    socket.onclose = () => {
+        if (socketHandler) socketHandler('closed', {});
+        socket = null;
+    };
+    
+    return socketReady;
+}
+
+// Send one message over the WebSocket, resolving when its reply is done
+async function sendOverSocket(message, onEvent) {
+    await openSocket();
+    
+    return new Promise((resolve, reject) => {
+        socketHandler = (event, data) => {
+            if (event === 'done') {
+                socketHandler = null;
+                onEvent(event, data);
+                resolve();
+            } else if (event === 'error' || event === 'closed') {
+                socketHandler = null;
+                reject(new Error(data.detail || 'WebSocket closed'));
+            } else {
+                onEvent(event, data);
+            }
+        };
+        socket.send(JSON.stringify({ message: message }));
+    });
+}
+
+// Send one message to /chat/stream and read the streamed reply
+async function sendOverHttp(message, onEvent) {
+    const response = await fetch('/chat/stream', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+            message: message,
+            session_id: sessionId
+        })
+    });
+    
+    if (!response.ok) {
+        throw new Error('Network response was not ok');
+    }
+    
+    await readEventStream(response, onEvent);
+}
+
+// Read a Server-Sent Events response body, calling onEvent per event
+async function readEventStream(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        
+        buffer += decoder.decode(value, { stream: true });
+        
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const raw = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            
+            let event = 'message';
+            let data = '';
+            raw.split('\n').forEach(line => {
+                if (line.startsWith('event: ')) event = line.slice(7);
+                else if (line.startsWith('data: ')) data += line.slice(6);
+            });
+            
+            if (data) onEvent(event, JSON.parse(data));
+        }
+    }
+}
+
+// Add message to chat, returning its content element
 function addMessage(text, sender) {
     const messageDiv = document.createElement('div');
     messageDiv.className = `message ${sender}-message`;
     
     const contentDiv = document.createElement('div');
     contentDiv.className = 'message-content';
-    
-    const label = sender === 'user' ? 'You' : 'Assistant';
-    contentDiv.innerHTML = `<strong>${label}:</strong> ${escapeHtml(text)}`;
+    setMessageText(contentDiv, text, sender);
     
     messageDiv.appendChild(contentDiv);
     chatMessages.appendChild(messageDiv);
     
     // Scroll to bottom
     chatMessages.scrollTop = chatMessages.scrollHeight;
+    
+    return contentDiv;
 }
 
-// Update order summary
-function updateOrderSummary(entities, totalPrice) {
-    // Extract items from entities
-    const items = entities.filter(e => e.type === 'beverage' || e.type === 'food');
-    const sizes = entities.filter(e => e.type === 'size');
-    
-    // Add new items to order
-    items.forEach((item, index) => {
-        const size = sizes[index] ? sizes[index].value : null;
-        orderItems.push({
-            name: item.value,
-            size: size
-        });
-    });
-    
-    // Update display
-    if (orderItems.length === 0) {
+// Replace the text of a message content element
+function setMessageText(contentDiv, text, sender) {
+    const label = sender === 'user' ? 'You' : 'Assistant';
+    contentDiv.innerHTML = `<strong>${label}:</strong> ${escapeHtml(text)}`;
+}
+
+// Render the order summary from the server's order lines
+function updateOrderSummary(lines, totalPrice) {
+    if (lines.length === 0) {
         orderItemsContainer.innerHTML = '<p class="empty-order">No items yet</p>';
     } else {
         orderItemsContainer.innerHTML = '';
-        orderItems.forEach((item, index) => {
+        lines.forEach(line => {
             const itemDiv = document.createElement('div');
             itemDiv.className = 'order-item';
             
             const itemName = document.createElement('div');
             itemName.className = 'item-name';
-            itemName.textContent = item.name;
+            itemName.textContent = line.quantity > 1 ? `${line.quantity} x ${line.item}` : line.item;
             
             const itemDetails = document.createElement('div');
             itemDetails.className = 'item-details';
-            itemDetails.textContent = item.size ? `Size: ${item.size}` : 'Regular';
+            const size = line.size ? `Size: ${line.size}` : 'Regular';
+            itemDetails.textContent = `${size} - $${(line.unit_price * line.quantity).toFixed(2)}`;
             
             itemDiv.appendChild(itemName);
             itemDiv.appendChild(itemDetails);